@@ -3,9 +3,18 @@ import os
 # functions
 from .help_functions import remove_ext
 from .help_functions import create_dir
+from .time_step import TimeStep
 from .caes import CAES
 from .icaes import ICAES
 from .icaes2 import ICAES2
+from .batch import BatchCAES
+from .batch import BatchICAES2
+from .batch import default_inputs
+from .sizing import size_system
+from .sizing import WarmStarts
+from .surrogate import Surrogate
+from .sensitivity import Sensitivity
+from .runner import Runner
 from .compressor_sizing import size_caes_cmp
 from .turbine_sizing import size_caes_trb
 from .plot_functions import plot_series
@@ -15,8 +24,10 @@ from .pressure_drop import pipe_grav_dp
 from .pressure_drop import friction_coeff
 from .monte_carlo_inputs import monteCarloInputs
 from .monte_carlo_inputs import baselineInputs
+from .monte_carlo_inputs import Sampler
 from .heat_transfer import pipe_heat_transfer_subsurface
 from .heat_transfer import pipe_heat_transfer_ocean
+from .fluid_properties import property_backend
 
 # storing where resources folder is
 resource_path = os.path.join(os.path.split(__file__)[0], "resources")
\ No newline at end of file
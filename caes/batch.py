@@ -0,0 +1,402 @@
+import pandas as pd
+import numpy as np
+from .caes import CAES
+from .time_step import time_step_class
+from .icaes2 import ICAES2
+
+
+# batch versions of the CAES architectures, N systems (one per row of a DataFrame of inputs) are solved together with
+# every attribute that differs between rows stored as a numpy array, so that each time step is computed for all rows
+# with array operations (see CAES.compute_steps)
+#
+# example:
+#   df = pd.DataFrame({'depth': [1000.0, 1500.0], 'k': [38.67, 100.0]})  # other inputs from get_default_inputs
+#   batch = BatchICAES2(inputs=df)
+#   batch.single_cycle()
+#   results = batch.analyze_performance()  # one row per row of df, same columns as ICAES2.analyze_performance
+#
+# inputs that set options or the machine layout (e.g. include_* options, steps, number of stages) must be the same
+# for all rows
+
+# entries of analyze_performance, in the same order as CAES.analyze_performance
+performance_entries = ['RTE', 'kWh_in', 'kWh_out', 'kW_in_avg', 'kW_out_avg',
+                       'kg_water_per_kWh', 'kg_CO2_per_kWh', 'kg_fuel_per_kWh',
+                       'dp_well_avg', 'dp_pipe_f_avg',
+                       'T_aquifer', 'T_cmp_out',
+                       'errors',
+                       'MWh_cushion_gas', 'T_store_init', 'T_cmp_out_avg', 'T_exp_out_avg', 'p_store_min',
+                       'p_store_max']
+
+
+class LayoutError(ValueError):
+    """
+    raised when batch rows do not share the same options and machine layout, the rows can still be run one at a time
+    """
+    pass
+
+
+class RowArray(np.ndarray):
+    """
+    numpy array with one input value per batch row, used while the system is initialized so that conditions on
+    inputs (e.g. if inputs['n_cmp2'] < 0) can be used as long as they are the same for every row
+    """
+
+    def __bool__(self):
+        values = self.view(np.ndarray)
+        if values.all():
+            return True
+        elif not values.any():
+            return False
+        raise LayoutError('condition differs between batch rows, rows must share the same options and machine layout')
+
+
+templates = {}  # default inputs of each model class built by this process, see default_inputs
+
+
+def default_inputs(model):
+    """
+    returns the default inputs of model, built the first time they are requested in this process and then reused
+    (get_default_inputs builds a new Series on every call), copy before changing entries
+
+    :param model: CAES class, e.g. ICAES2
+    :return: pandas Series of default inputs
+    """
+    if model not in templates:
+        templates[model] = model.get_default_inputs()
+    return templates[model]
+
+
+def batch_inputs(defaults, df):
+    """
+    combines default inputs with a DataFrame of inputs, one row per system
+
+    :param defaults: pandas Series of default inputs (e.g. ICAES2.get_default_inputs())
+    :param df: pandas DataFrame, columns are entries of defaults
+    :return: dictionary of inputs, entries that differ between rows are RowArrays
+    """
+    inputs = {entry: defaults[entry] for entry in defaults.index}
+    for entry in df.columns:
+        if entry not in inputs:
+            raise ValueError(str(entry) + ' is not an input')
+        values = df[entry].values
+        if all(value == values[0] for value in values[1:]):  # same for all rows
+            inputs[entry] = values[0]
+        elif values.dtype.kind in 'iuf':
+            inputs[entry] = np.asarray(values, dtype=float).view(RowArray)
+        else:
+            raise LayoutError(str(entry) + ' must be the same for all rows')
+    return inputs
+
+
+def plain_arrays(value):
+    # converts RowArrays (also within lists and tuples) to numpy arrays once initialization is complete
+    if isinstance(value, RowArray):
+        return value.view(np.ndarray)
+    elif isinstance(value, (list, tuple)):
+        return type(value)(plain_arrays(item) for item in value)
+    return value
+
+
+class BatchCAES(CAES):
+    """
+    N CAES systems solved together, one per row of a pandas DataFrame of inputs
+
+    single_cycle gives the same results as CAES.single_cycle for each row (within floating point rounding). Only the
+    totals used by analyze_performance are stored, not the time series of each row
+    """
+
+    def __init__(self, inputs):
+        """
+        :param inputs: pandas DataFrame, one row per system, columns are entries of get_default_inputs (missing
+                       columns use the default value)
+        """
+        self.index = inputs.index  # row labels of the results
+        self.n_rows = len(inputs)  # number of systems [-]
+
+        # initialize all systems, inputs that differ between rows become arrays
+        super(BatchCAES, self).__init__(batch_inputs(default_inputs(type(self)), inputs))
+        for name, value in list(vars(self).items()):
+            vars(self)[name] = plain_arrays(value)  # same values, cached derived parameters are kept
+        self.inputs = inputs.copy()  # used by reset
+
+        # storage state of each row
+        for name in ['time', 'T_store', 'p_store', 'm_store']:
+            setattr(self, name, np.full(self.n_rows, 1.0) * getattr(self, name))
+
+        # rows with error messages, e.g. Mach limit
+        self.errors = np.zeros(self.n_rows, dtype=bool)
+        self.errors[:] = self.m_dot > self.m_dot_max
+
+    def reset(self, **changed_inputs):
+        """
+        returns all systems to the start of a cycle, see CAES.reset. Only the storage and design point of the rows are
+        recomputed if all changed inputs are in reset_inputs, otherwise the batch is initialized again
+
+        :param changed_inputs: inputs that differ from the current ones, floats (all rows) or arrays (one value per row)
+        """
+        for key in changed_inputs:
+            self.inputs[key] = changed_inputs[key]
+
+        if any(key not in self.reset_inputs for key in changed_inputs):
+            inputs = self.inputs
+            vars(self).clear()  # cached derived parameters may depend on any of the inputs
+            self.__init__(inputs)
+            return
+
+        # inputs that are unchanged keep their derived parameters (see parameters.py)
+        inputs = batch_inputs(default_inputs(type(self)), self.inputs)
+        self.init_storage(inputs)
+        self.init_state()
+        self.init_design(inputs)
+        for name, value in list(vars(self).items()):
+            vars(self)[name] = plain_arrays(value)
+        for name in ['time', 'T_store', 'p_store', 'm_store']:
+            setattr(self, name, np.full(self.n_rows, 1.0) * getattr(self, name))
+        self.errors[:] = self.m_dot > self.m_dot_max
+
+        # empty the totals
+        self.init_time_series()
+
+    def init_time_series(self):
+        """
+        creates the totals used by analyze_performance (replaces the time series buffer of CAES)
+        """
+        self.time_step = time_step_class(self.attributes_time_series)  # holds the state of all rows for a time step
+        self.rows = np.arange(self.n_rows)  # rows that are cycled, see single_cycle
+        self.totals = {entry: np.zeros(self.n_rows) for entry in ['energy_in', 'energy_out', 'm_water', 'm_fuel',
+                                                                   'pwr_in', 'pwr_out', 'dp_well', 'dp_pipe_f',
+                                                                   'T1_in', 'T1_out']}
+        self.steps_in = 0  # charge time steps [-]
+        self.steps_out = 0  # discharge time steps [-]
+        self.steps_total = 0  # time steps, including no flow [-]
+
+    def calc_losses(self, m_dot):
+        # pipe pressure losses, pipe heat transfer and aquifer pressure losses of all rows at the current states
+        if np.all(m_dot > 0.0):  # injection
+            losses = self.calc_losses_array(m_dot, self.T1, self.p1, self.T2, self.p2)
+        else:  # withdrawl / no movement
+            losses = self.calc_losses_array(m_dot, self.T2, self.p2, self.T3, self.p3)
+        self.dp_pipe_f, self.f, self.dp_pipe_g, self.dT_pipe_ocean, self.dT_pipe_sub, self.dp_aquifer = losses
+
+    def calc_aquifer_dp(self, m_dot):
+        self.calc_losses(m_dot)
+
+    def calc_pipe_dp(self, m_dot):
+        self.calc_losses(m_dot)
+
+    def calc_pipe_dT(self, m_dot):
+        self.calc_losses(m_dot)
+
+    def select_rows(self, keep):
+        """
+        removes rows from the batch, e.g. rows that are not cycled
+        :param keep: boolean numpy array, one entry per row
+        """
+        n_rows = self.n_rows
+        for name, value in list(vars(self).items()):  # inputs and derived parameters are sliced alike
+            if isinstance(value, np.ndarray) and value.shape == (n_rows,):
+                vars(self)[name] = value[keep]
+            elif isinstance(value, (list, tuple)):
+                vars(self)[name] = type(value)(item[keep] if np.shape(item) == (n_rows,) else item for item in value)
+        for entry in self.totals:
+            self.totals[entry] = self.totals[entry][keep]
+        self.n_rows = int(np.sum(keep))
+
+    def update(self, m_dot=50.0, delta_t=1.0):
+        """
+        Updates all systems for one time step, same as CAES.update for each row
+
+        :param m_dot: mass flow rate, injection (+) or release (-) [kg/s], float or numpy array (one per row) with the
+                      same flow direction for all rows
+        :param delta_t: time step [hr], float or numpy array (one per row)
+        :return:
+        """
+        # states of the previous time step
+        prev = {state: getattr(self, state) for state in ['p1', 'p2', 'p3', 'T1', 'T2', 'T3']}
+        s, self.f = self.compute_steps(m_dot, delta_t, self.p_store, prev)
+
+        # update time
+        self.time = self.time + delta_t  # [hr]
+        s.time = self.time
+        self.finish_steps(s, delta_t)
+
+        # store pressure losses, pressure and temperature states
+        self.dp_pipe_f = s.dp_pipe_f
+        self.dp_pipe_g = s.dp_pipe_g
+        self.dT_pipe_ocean = s.dT_pipe_ocean
+        self.dT_pipe_sub = s.dT_pipe_sub
+        self.dp_aquifer = s.dp_well
+        for state in ['p0', 'p1', 'p2', 'p3', 'T0', 'T1', 'T2', 'T3']:
+            setattr(self, state, getattr(s, state))
+
+        # update storage mass and pressure
+        self.m_store = self.m_store + s.m_air - s.m_air_leakage
+        self.p_store = self.m_store * self.R * self.T_store / (self.V * self.M) * 1e-3  # storage pressure
+        for i in self.storage_pressure_errors(self.p2, self.p3):
+            self.errors[i] = True
+
+        # add to totals
+        totals = self.totals
+        totals['energy_in'] = totals['energy_in'] + s.energy_in  # [kWh]
+        totals['energy_out'] = totals['energy_out'] + s.energy_out  # [kWh]
+        totals['m_water'] = totals['m_water'] + s.m_water  # [kg]
+        totals['m_fuel'] = totals['m_fuel'] + s.m_fuel  # [kg]
+        if np.all(s.m_air != 0.0):
+            totals['dp_well'] = totals['dp_well'] + s.dp_well  # [MPa]
+            totals['dp_pipe_f'] = totals['dp_pipe_f'] + s.dp_pipe_f  # [MPa]
+        if np.all(s.m_air > 0.0):  # (charge)
+            totals['pwr_in'] = totals['pwr_in'] + s.pwr  # [kW]
+            totals['T1_in'] = totals['T1_in'] + s.T1  # [K]
+            self.steps_in = self.steps_in + 1
+        elif np.all(s.m_air < 0.0):  # (discharge)
+            totals['pwr_out'] = totals['pwr_out'] + s.pwr  # [kW]
+            totals['T1_out'] = totals['T1_out'] + s.T1  # [K]
+            self.steps_out = self.steps_out + 1
+        self.steps_total = self.steps_total + 1
+
+        # clear warning messages for subsequent time step
+        self.error_msg = ''
+
+    def single_cycle(self):
+        """
+        runs a single cycle for all rows, charging and discharge in the number of steps specified in self.steps
+        :return:
+        """
+        # calculate aquifer pressure loss based on m_dot
+        self.calc_aquifer_dp(self.m_dot)  # aquifer pressure losses
+
+        # update m_store_max_actual based on aquifer pressure losses
+        self.p_store_max_actual = self.p_store_max - self.dp_aquifer
+        self.m_store_max_actual = self.p_store_max_actual * 1e3 * self.V * self.M / (
+                self.R * self.T_store_init)  # maximum [kg]
+
+        # save initial state
+        self.update(m_dot=0.0 * self.m_dot, delta_t=1e-6)
+
+        # rows where aquifer pressure losses are greater than well range are not cycled (as in CAES.single_cycle)
+        cycled = np.broadcast_to(self.m_store_max_actual > self.m_store_min, (self.n_rows,))
+        if not np.all(cycled):
+            self.select_rows(cycled)
+        if self.n_rows == 0:
+            return
+
+        # mass injection/release per timestep (mass leakage compensated for during injection)
+        m_air_in = (self.m_store_max_actual - self.m_store_min) / self.steps / (1 - self.loss_m_air)
+        m_air_out = (self.m_store_max_actual - self.m_store_min) / self.steps
+
+        # timestep duration
+        delta_t_in = m_air_in / (self.m_dot * 3600)  # [hr]
+        delta_t_out = m_air_out / (self.m_dot * 3600)  # [hr]
+
+        # charging
+        for i in range(int(self.steps)):
+            self.update(m_dot=self.m_dot, delta_t=delta_t_in)
+
+        # discharging
+        for i in range(int(self.steps)):
+            self.update(m_dot=-1.0 * self.m_dot, delta_t=delta_t_out)
+
+    def analyze_performance(self):
+        """
+
+        analyzes system performance of all rows - meant to be performed after completing a full cycle of
+        charging/discharging
+
+        :return: results - Pandas DataFrame with one row per input row and the same entries as
+                 CAES.analyze_performance, rows that were not cycled only have errors = 'true'
+        """
+        results = pd.DataFrame(index=self.index, columns=performance_entries, dtype=float)
+        results['errors'] = 'true'
+        if self.steps_total <= 1:  # insufficient data
+            return results
+
+        totals = self.totals
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # compute performance
+            energy_input_total = totals['energy_in']  # [kWh]
+            energy_output_total = totals['energy_out']  # [kWh]
+            water_input_total = totals['m_water']  # [kg]
+            fuel_input_total = totals['m_fuel']  # [kg]
+            CO2_fuel = fuel_input_total * self.fuel_CO2  # [ton]
+            heat_input_total = fuel_input_total * self.fuel_HHV  # [kWh]
+            RTE = energy_output_total / (energy_input_total + heat_input_total)
+
+            values = {'RTE': RTE,
+                      'kWh_in': energy_input_total,
+                      'kWh_out': energy_output_total,
+                      'kW_in_avg': totals['pwr_in'] / self.steps_in,
+                      'kW_out_avg': totals['pwr_out'] / self.steps_out,
+                      'kg_water_per_kWh': water_input_total / energy_output_total,
+                      'kg_CO2_per_kWh': CO2_fuel / energy_output_total,
+                      'kg_fuel_per_kWh': fuel_input_total / energy_output_total,
+                      'dp_well_avg': totals['dp_well'] / (self.steps_in + self.steps_out),
+                      'dp_pipe_f_avg': totals['dp_pipe_f'] / (self.steps_in + self.steps_out),
+                      'T_store_init': self.T_store_init,
+                      'T_cmp_out_avg': totals['T1_in'] / self.steps_in,
+                      'T_exp_out_avg': totals['T1_out'] / self.steps_out,
+                      'p_store_min': self.p_store_min,
+                      'p_store_max': self.p_store_max}
+            values['MWh_cushion_gas'] = self.m_store_min / self.m_dot / 3600 * values['kW_in_avg'] / 1000.0
+
+        # store results of the rows that were cycled
+        rows = results.index[self.rows]
+        for entry, value in values.items():
+            results.loc[rows, entry] = np.broadcast_to(value, (self.n_rows,))
+
+        # check for errors
+        errors = self.errors | (energy_input_total == 0) | (energy_output_total == 0) | (RTE <= 0)
+        results.loc[rows, 'errors'] = np.where(errors, 'true', 'false')
+
+        return results
+
+
+class BatchICAES2(BatchCAES, ICAES2):
+    """
+    N ICAES2 systems solved together, one per row of a pandas DataFrame of inputs (see BatchCAES). The number of
+    compression/expansion stages and the interstage pressure drops that are used must be the same for all rows
+    """
+    pass
+
+
+# batch version of each CAES architecture that has one
+batch_classes = {CAES: BatchCAES, ICAES2: BatchICAES2}
+
+
+def run_single_cycles(df, model=ICAES2, mode='step'):
+    """
+    runs a single cycle for each row of a DataFrame of inputs, all rows together with the batch version of model if
+    there is one (see batch_classes), otherwise (or if the rows do not share the same options and machine layout) one
+    row at a time
+
+    :param df: pandas DataFrame, one row per system, columns are entries of model.get_default_inputs()
+    :param model: CAES class, e.g. ICAES2
+    :param mode: single_cycle mode of the rows run one at a time
+    :return: results - Pandas DataFrame with one row per input row and the entries of analyze_performance, rows that
+             fail only have errors = 'true'. Rows run one at a time have the extra entry
+        error_msg - message of the error that stopped the row, '' if it was run [-]
+    """
+    if model in batch_classes and len(df) > 0:
+        try:
+            batch = batch_classes[model](inputs=df)
+            batch.single_cycle()
+            return batch.analyze_performance()
+        except LayoutError:  # rows do not share the same options and machine layout
+            pass
+
+    results = pd.DataFrame(index=df.index, columns=performance_entries, dtype=float)
+    results['errors'] = 'true'
+    results['error_msg'] = ''
+    for index in df.index:
+        inputs = default_inputs(model).copy()
+        for entry in df.columns:
+            inputs[entry] = df.loc[index, entry]
+        try:
+            system = model(inputs=inputs)
+            system.single_cycle(mode=mode)
+            performance = system.analyze_performance()
+        except (ValueError, ArithmeticError) as error:  # e.g. CoolProp state out of range, no flow
+            results.loc[index, 'error_msg'] = type(error).__name__ + ': ' + str(error)
+            continue
+        for entry in performance.index:
+            results.loc[index, entry] = performance[entry]
+    return results
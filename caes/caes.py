@@ -1,10 +1,16 @@
+import warnings
 import pandas as pd
-import CoolProp.CoolProp as CP  # http://www.coolprop.org/coolprop/HighLevelAPI.html#propssi-function
-from math import log, pi
+import numpy as np
+from math import pi
 from .pressure_drop import aquifer_dp, pipe_fric_dp, pipe_grav_dp
 from .plot_functions import plot_series
 import matplotlib.pyplot as plt
+from operator import attrgetter
+from .time_step import time_step_class
 from .heat_transfer import pipe_heat_transfer_subsurface, pipe_heat_transfer_ocean
+from .fluid_properties import property_backend, DirectProperties, TabulatedProperties
+from .parameters import Input, derived
+from .sinks import output_sink, Totals
 
 
 # references
@@ -25,6 +31,28 @@ from .heat_transfer import pipe_heat_transfer_subsurface, pipe_heat_transfer_oce
 
 
 class CAES:
+    array_perf = True  # charge_perf/discharge_perf accept numpy arrays of time steps, see update_steps
+
+    # inputs that only affect the storage and design point, changing any other input with reset initializes again
+    reset_inputs = ['m_dot', 'mach_limit', 'r_f', 'r_w', 'h', 'phi', 'Slr', 'k', 'depth', 'epsilon',
+                    'p_hydro_grad', 'p_frac_grad', 'safety_factor', 'T_grad_m', 'T_grad_b']
+
+    # inputs that derived parameters depend on, changing one clears only its dependents (see parameters.py)
+    r_w = Input()  # wellbore radius [m]
+    epsilon = Input()  # pipe roughness [m]
+    depth = Input()  # depth [m]
+    p_hydro_grad = Input()  # hydrostatic pressure gradient [MPa/km]
+    p_frac_grad = Input()  # fracture gradient [MPa/km]
+    safety_factor = Input()  # pressure safety factor [-]
+    T_grad_m = Input()  # aquifer thermal gradient slope [deg C/m]
+    T_grad_b = Input()  # aquifer thermal gradient intercept [deg C]
+    r_f = Input()  # formation radius [m]
+    h = Input()  # thickness [m]
+    phi = Input()  # porosity [-]
+    Slr = Input()  # residual liquid fraction [-]
+    k = Input()  # permeability [mD]
+    m_dot = Input()  # design mass flow rate [kg/s]
+    mach_limit = Input()  # maximum Mach number in the wellbore [-]
 
     def get_default_inputs():
         attributes = ['debug', 'steps',
@@ -113,6 +141,16 @@ class CAES:
         inputs['h_ocean'] = 3000.0  # free convection of ocean water [W/m^2-K], Engineering Toolbox upper limit
         inputs['T_ocean'] = 290.0  # [K]
 
+        # air property calculations (see fluid_properties.py)
+        inputs['property_backend'] = 'direct'  # 'direct' (CoolProp PropsSI), 'cached' or 'table'
+        inputs['property_tol'] = 1e-6  # relative error tolerance of 'cached' and 'table' backends [-]
+
+        # time series output (see sinks.py)
+        inputs['output_sink'] = 'memory'  # 'memory' (self.data), 'none' (totals only), 'parquet' or 'hdf5'
+        inputs['output_file'] = ''  # directory of the Parquet dataset or HDF5 file, required for 'parquet' and 'hdf5'
+        inputs['output_chunk'] = 10000  # time steps written to the sink at once [-]
+        inputs['record'] = 'full'  # 'full' time series or 'summary' (only the totals used by analyze_performance)
+
         return inputs
 
     def __init__(self, inputs=get_default_inputs()):
@@ -124,6 +162,11 @@ class CAES:
         # number of timesteps to use in single cycle simulations
         self.steps = inputs['steps']  # (-)
 
+        # time series output
+        self.sink = output_sink(inputs['output_sink'], inputs['output_file'])  # None keeps it in memory
+        self.output_chunk = int(inputs['output_chunk'])  # time steps written to the sink at once [-]
+        self.record_mode = inputs['record']  # 'full' or 'summary'
+
         # options to include/exclude various loss mechanisms
         self.include_air_leakage = inputs['include_air_leakage']
         self.include_aquifer_dp = inputs['include_aquifer_dp']
@@ -149,10 +192,10 @@ class CAES:
         self.water = 'Water'  # CoolProp fluid name [-]
         self.T_water = inputs['T_water'] + 273.15  # [K]
         self.p_water = inputs['p_water']  # [MPa]
-        self.c_water = CP.PropsSI('CPMASS', 'T', self.T_water, 'P', self.p_water * 1e6,
-                                  self.water) / 1000.0  # constant pressure specific heat [kJ/kg-K]
-        self.v_water = 1.0 / CP.PropsSI('D', 'T', self.T_water, 'P', self.p_water * 1e6,
-                                        self.water)  # specific volume (1/density) [m^3/kg]
+        self.water_props = DirectProperties(fluid=self.water)
+        cp_water, rho_water = self.water_props.props(('CPMASS', 'D'), self.T_water, self.p_water * 1e6)
+        self.c_water = cp_water / 1000.0  # constant pressure specific heat [kJ/kg-K]
+        self.v_water = 1.0 / rho_water  # specific volume (1/density) [m^3/kg]
 
         # fuel properties (default values are for natural gas)
         self.fuel_HHV = inputs['fuel_HHV']  # [kWh/kg]
@@ -162,6 +205,52 @@ class CAES:
         self.eta_mech = 1.0 - inputs['loss_mech']  # mechanical [fr]
         self.eta_gen = 1.0 - inputs['loss_gen']  # generator [fr]
 
+        # heat transfer properties in wellbore
+        self.t_pipe = inputs['t_pipe']  # pipe wall thickness [m]
+        self.t_cement = inputs['t_cement']  # concrete thickness [m]
+        self.t_insul = inputs['t_insul']  # insulation thickness [m]
+        self.r_rock = inputs['r_rock']  # distance to "infinity" where formation temperature is fixed
+        self.k_cement = inputs['k_cement']  # thermal conductivity of cement [W/m-K]
+        self.k_pipe = inputs['k_pipe']  # thermal conductivity of pipe [W/m-K]
+        self.k_insul = inputs['k_insul']  # thermal conductivity of insulation [W/m-K]
+        self.k_rock = inputs['k_rock']  # thermal conductivity of rock/formation [W/m-K]
+        self.depth_ocean = inputs['depth_ocean']  # [m]
+        self.h_ocean = inputs['h_ocean']  # [W/m^2-K]
+        self.T_ocean = inputs['T_ocean']  # [K]
+
+        # aquifer mass losses
+        if self.include_air_leakage:
+            self.loss_m_air = inputs['loss_m_air']  # fraction of air lost in aquifer [-] #
+        else:
+            self.loss_m_air = 0.0
+
+        # site, storage and design point, recomputed by reset when the inputs they depend on change
+        self.inputs = inputs.copy()
+        self.init_storage(inputs)
+        self.init_state()
+        self.init_design(inputs)
+
+        # dataframe to store data
+        self.attributes_time_series = ['time', 'm_dot', 'delta_t', 'm_air', 'm_air_leakage',
+                                       'pwr', 'energy_in', 'energy_out',
+                                       'work_per_kg', 'total_work_per_kg', 'water_per_kg',
+                                       'fuel_per_kg',
+                                       'm_water', 'm_fuel',
+                                       'p_store', 'T_store', 'm_store',
+                                       'p0', 'p1', 'p2', 'p3',
+                                       'T0', 'T1', 'T2', 'T3',
+                                       'dp_pipe_f', 'dp_pipe_g', 'dp_well',
+                                       'dT_pipe_ocean', 'dT_pipe_sub', 'dT_pipe',
+                                       'error_msg']
+        self.init_time_series()
+
+    def init_storage(self, inputs):
+        """
+        wellbore, aquifer and storage inputs, the pressure and temperature limits, storage geometry and mass limits
+        are derived parameters (see p_store_max, T_store_init, V, m_store_max)
+
+        :param inputs: inputs (same entries as get_default_inputs)
+        """
         # wellbore
         self.r_w = inputs['r_w']  # wellbore radius [m]
         self.epsilon = inputs['epsilon']  # pipe roughness [m]
@@ -172,12 +261,9 @@ class CAES:
         self.p_frac_grad = inputs['p_frac_grad']  # fracture gradient [MPa/km]
         self.safety_factor = inputs['safety_factor']  # pressure safety factor [-]
 
-        # calculated aquifer operating pressure range
-        self.p_store_min = inputs['p_hydro_grad'] * inputs['depth'] * 1e-3  # minimum storage pressure[MPa]
-        self.p_store_range = inputs['safety_factor'] * (
-                inputs['p_frac_grad'] - inputs['p_hydro_grad']) * inputs['depth'] * 1e-3  # storage pressure range [MPa]
-        self.p_store_max = self.p_store_min + self.p_store_range  # maximum storage pressure [MPa]
-        self.p_store_max_actual = self.p_store_max  # actual depends on mass flow rate [MPa]
+        # air property calculations (see air_props)
+        self.air_backend = inputs['property_backend']  # 'direct', 'cached' or 'table'
+        self.air_tol = inputs['property_tol']  # relative error tolerance [-]
 
         # aquifer thermal gradient
         if self.include_thermal_gradient:
@@ -187,55 +273,29 @@ class CAES:
             self.T_grad_m = 0.0
             self.T_grad_b = self.T_atm - 273.15
 
-        # calculated aquifer temperature
-        self.T_store_init = 273.15 + self.T_grad_m * inputs['depth'] + self.T_grad_b  # storage temperature [K]
-
         # storage geomechanical properties
-        if inputs['r_f'] > inputs['r_w']:
+        if np.all(inputs['r_f'] > inputs['r_w']):
             self.r_f = inputs['r_f']  # radius [m]
         else:
             print('Warning: r_f must by => than r_w, r_f set to r_w')
-            self.r_f = inputs['r_w']  # radius [m]
+            self.r_f = np.maximum(inputs['r_f'], inputs['r_w'])  # radius [m]
         self.h = inputs['h']  # thickness [m]
-        self.h_plume = min(self.r_f, self.h)
         self.phi = inputs['phi']  # porosity [-]
         self.Slr = inputs['Slr']  # residual liquid fraction [-]
         self.k = inputs['k']  # permeability [mD]
 
-        # heat transfer properties in wellbore
-        self.t_pipe = inputs['t_pipe']  # pipe wall thickness [m]
-        self.t_cement = inputs['t_cement']  # concrete thickness [m]
-        self.t_insul = inputs['t_insul']  # insulation thickness [m]
-        self.r_rock = inputs['r_rock']  # distance to "infinity" where formation temperature is fixed
-        self.k_cement = inputs['k_cement']  # thermal conductivity of cement [W/m-K]
-        self.k_pipe = inputs['k_pipe']  # thermal conductivity of pipe [W/m-K]
-        self.k_insul = inputs['k_insul']  # thermal conductivity of insulation [W/m-K]
-        self.k_rock = inputs['k_rock']  # thermal conductivity of rock/formation [W/m-K]
-        self.depth_ocean = inputs['depth_ocean']  # [m]
-        self.h_ocean = inputs['h_ocean']  # [W/m^2-K]
-        self.T_ocean = inputs['T_ocean']  # [K]
-
-        # aquifer mass losses
-        if self.include_air_leakage:
-            self.loss_m_air = inputs['loss_m_air']  # fraction of air lost in aquifer [-] #
-        else:
-            self.loss_m_air = 0.0
-
-        # operational
-        self.m_dot = inputs['m_dot']
-
-        # calculated storage volume and mass storage
-        self.V_res = self.h_plume * pi * self.r_f ** 2  # storage total volume [m^3]
-        self.V = self.V_res * self.phi * (1.0 - self.Slr)  # volume available for air storage [m^3]
-        self.m_store_min = self.p_store_min * 1e3 * self.V * self.M / (self.R * self.T_store_init)  # minimum [kg]
-        self.m_store_max = self.p_store_max * 1e3 * self.V * self.M / (self.R * self.T_store_init)  # maximum [kg]
-        self.m_store_max_actual = self.m_store_max  # actual maximum varies based on mass flow rate
-
+    def init_state(self):
+        """
+        returns the storage, pressure and temperature states and the flow losses to the start of a cycle
+        """
         # storage  - initialize state
         self.time = 0.0  # [hr]
         self.T_store = self.T_store_init  # storage temperature [K]
         self.p_store = self.p_store_min  # storage pressure [MPa]
         self.m_store = self.m_store_min  # mass stored [kg]
+        self.p_store_max_actual = self.p_store_max  # actual depends on mass flow rate [MPa]
+        self.m_store_max_actual = self.m_store_max  # actual maximum varies based on mass flow rate
+        self.power_per_m_dot = {}  # specific power of the last update_power time step by direction [kW / (kg/s)]
 
         # flow pressure drops and heat transfer
         self.dp_pipe_f = 0.0  # pipe friction [MPa]
@@ -257,42 +317,277 @@ class CAES:
         self.T2 = self.T_store  # downwell
         self.T3 = self.T_store  # aquifer
 
-        # initialize at design flow rate to calculate machine design outlet pressure
-        self.calc_pipe_dp(inputs['m_dot'])  # pipe friction and gravitational potential
-        self.calc_pipe_dT(inputs['m_dot'])  # pipe heat transfer
-        self.calc_aquifer_dp(inputs['m_dot'])  # aquifer pressure losses
-        self.p_machine_design = self.p_store_max + self.dp_pipe_f + self.dp_pipe_g + self.dp_aquifer
-        self.p_well_design_min = self.p_store_min + self.dp_pipe_g
+    def init_design(self, inputs):
+        """
+        machine design outlet pressure from the flow losses at the design flow rate, and the Mach limit check
+
+        :param inputs: inputs (same entries as get_default_inputs)
+        """
+        # operational
+        self.m_dot = inputs['m_dot']
+        self.mach_limit = inputs['mach_limit']
+
+        # initialize at design flow rate (see design_losses)
+        self.dp_pipe_f, self.f, self.dp_pipe_g, self.dT_pipe_ocean, self.dT_pipe_sub, self.dp_aquifer = \
+            self.design_losses
 
         # store error messages for current state
         self.error_msg = ''
 
         # check if flow rate exceeds Mach limit
-        self.mach_limit = inputs['mach_limit']
-        rho = CP.PropsSI('D', 'T', self.T0, 'P', self.p_well_design_min * 1e6, self.air)  # density [kg/m3]
-        U_max = self.speed_of_sound * inputs['mach_limit']  # max velocity [m/s]
-        self.m_dot_max = rho * U_max * pi * self.r_w ** 2.0  # max flow rate [kg/s]
-        if inputs['m_dot'] > self.m_dot_max:
+        if np.any(self.m_dot > self.m_dot_max):
             self.error_msg = 'Exceeds Mach limit'
             print('exceeded')
         if self.debug:
             print("p_well_design_min MPa   :" + str(self.p_well_design_min))
-            print("rho               kg/m3 :" + str(rho))
-            print("U_max             m/s   : " + str(U_max))
+            print("U_max             m/s   : " + str(self.speed_of_sound * self.mach_limit))
             print("m_dot_max         kg/s  : " + str(self.m_dot_max))
 
-        # dataframe to store data
-        self.attributes_time_series = ['time', 'm_dot', 'delta_t', 'm_air', 'm_air_leakage',
-                                       'pwr', 'energy_in', 'energy_out',
-                                       'work_per_kg', 'total_work_per_kg', 'water_per_kg',
-                                       'fuel_per_kg',
-                                       'm_water', 'm_fuel',
-                                       'p_store', 'T_store', 'm_store',
-                                       'p0', 'p1', 'p2', 'p3',
-                                       'T0', 'T1', 'T2', 'T3',
-                                       'dp_pipe_f', 'dp_pipe_g', 'dp_well',
-                                       'error_msg']
-        self.data = pd.DataFrame(columns=self.attributes_time_series)
+    def reset(self, **changed_inputs):
+        """
+        returns the system to the start of a cycle so that the same object, including its time series buffer, can be
+        reused (e.g. by a sizing solver varying m_dot and r_f) instead of constructing a new system
+
+        only the derived parameters that depend on the changed inputs are recomputed if all of them are in
+        reset_inputs (storage and design point). Any other input (e.g. loss options, efficiencies or number of stages)
+        initializes the system again, which costs as much as constructing a new one
+
+        :param changed_inputs: inputs that differ from the current ones, e.g. reset(m_dot=100.0, r_f=150.0)
+        """
+        for key in changed_inputs:
+            self.inputs[key] = changed_inputs[key]
+
+        if any(key not in self.reset_inputs for key in changed_inputs):
+            inputs = self.inputs
+            vars(self).clear()  # cached derived parameters may depend on any of the inputs
+            type(self).__init__(self, inputs)
+            return
+
+        # inputs that are unchanged keep their derived parameters (see parameters.py)
+        self.init_storage(self.inputs)
+        self.init_state()
+        self.init_design(self.inputs)
+
+        # empty the time series buffer
+        self.clear_time_series()
+
+    # ------------------
+    # derived parameters, computed on first use and cached until an input they depend on changes (see parameters.py)
+    # ------------------
+    @derived('p_hydro_grad', 'depth')
+    def p_store_min(self):
+        return self.p_hydro_grad * self.depth * 1e-3  # minimum storage pressure[MPa]
+
+    @derived('safety_factor', 'p_frac_grad', 'p_hydro_grad', 'depth')
+    def p_store_range(self):
+        return self.safety_factor * (self.p_frac_grad - self.p_hydro_grad) * self.depth * 1e-3  # [MPa]
+
+    @derived('p_store_min', 'p_store_range')
+    def p_store_max(self):
+        return self.p_store_min + self.p_store_range  # maximum storage pressure [MPa]
+
+    @derived('p_store_max')
+    def air_props(self):
+        # air property provider, operating envelope from p_atm to p_store_max plus pipe losses (50% margin)
+        return property_backend(backend=self.air_backend, fluid=self.air, p_max=1.5 * np.max(self.p_store_max) * 1e6,
+                                tol=self.air_tol)
+
+    @derived('air_props')
+    def sweep_props(self):
+        # air property provider of the time steps solved together (see sweep_steps), tabulated so that each sweep
+        # interpolates instead of running a CoolProp flash for every time step, air_props if it is already tabulated
+        if isinstance(self.air_props, TabulatedProperties):
+            return self.air_props
+        return property_backend(backend='table', fluid=self.air, p_max=1.5 * np.max(self.p_store_max) * 1e6,
+                                tol=self.air_tol)
+
+    @derived('T_grad_m', 'depth', 'T_grad_b')
+    def T_store_init(self):
+        return 273.15 + self.T_grad_m * self.depth + self.T_grad_b  # storage temperature [K]
+
+    @derived('r_f', 'h')
+    def h_plume(self):
+        return np.minimum(self.r_f, self.h)  # [m]
+
+    @derived('h_plume', 'r_f')
+    def V_res(self):
+        return self.h_plume * pi * self.r_f ** 2  # storage total volume [m^3]
+
+    @derived('V_res', 'phi', 'Slr')
+    def V(self):
+        return self.V_res * self.phi * (1.0 - self.Slr)  # volume available for air storage [m^3]
+
+    @derived('p_store_min', 'V', 'T_store_init')
+    def m_store_min(self):
+        return self.p_store_min * 1e3 * self.V * self.M / (self.R * self.T_store_init)  # minimum [kg]
+
+    @derived('p_store_max', 'V', 'T_store_init')
+    def m_store_max(self):
+        return self.p_store_max * 1e3 * self.V * self.M / (self.R * self.T_store_init)  # maximum [kg]
+
+    @derived('m_dot', 'air_props', 'p_store_min', 'T_store_init', 'r_w', 'epsilon', 'depth', 'T_grad_m', 'T_grad_b',
+             'r_f', 'h_plume', 'k')
+    def design_losses(self):
+        """
+        flow losses at the design flow rate with the storage at minimum pressure (compressor outlet at T_atm), same
+        as calc_pipe_dp, calc_pipe_dT and calc_aquifer_dp at the start of a cycle
+        :return: dp_pipe_f [MPa], f [-], dp_pipe_g [MPa], dT_pipe_ocean [K], dT_pipe_sub [K], dp_aquifer [MPa]
+        """
+        losses = self.calc_losses_array(self.m_dot, self.T_atm, self.p_store_min, self.T_store_init, self.p_store_min)
+        return tuple(loss if np.ndim(loss) > 0 else float(loss) for loss in losses)
+
+    @derived('p_store_max', 'design_losses')
+    def p_machine_design(self):
+        dp_pipe_f, f, dp_pipe_g, dT_pipe_ocean, dT_pipe_sub, dp_aquifer = self.design_losses
+        return self.p_store_max + dp_pipe_f + dp_pipe_g + dp_aquifer  # machine design outlet pressure [MPa]
+
+    @derived('p_store_min', 'design_losses')
+    def p_well_design_min(self):
+        dp_pipe_f, f, dp_pipe_g, dT_pipe_ocean, dT_pipe_sub, dp_aquifer = self.design_losses
+        return self.p_store_min + dp_pipe_g  # [MPa]
+
+    @derived('air_props', 'p_well_design_min', 'mach_limit', 'r_w')
+    def m_dot_max(self):
+        rho, = self.air_props.props(('D',), self.T_atm, self.p_well_design_min * 1e6)  # density [kg/m3]
+        U_max = self.speed_of_sound * self.mach_limit  # max velocity [m/s]
+        return rho * U_max * pi * self.r_w ** 2.0  # max flow rate [kg/s]
+
+    def init_time_series(self):
+        """
+        creates the preallocated buffer that stores the time series, one column per entry in attributes_time_series
+
+        must be called again whenever attributes_time_series is changed (e.g. by a subclass adding stage entries)
+        """
+        self.data_columns = [entry for entry in self.attributes_time_series if entry != 'error_msg']
+        self.data_index = {entry: i for i, entry in enumerate(self.data_columns)}
+        self.data_getter = attrgetter(*self.data_columns)  # reads the buffer row from a TimeStep
+        self.time_step = time_step_class(self.attributes_time_series)  # holds the state of a single time step
+        if self.sink is None:
+            n_rows = 2 * int(self.steps) + 1  # single cycle
+        else:
+            n_rows = self.output_chunk  # written to the sink when full
+        self.data_buffer = np.zeros((n_rows, len(self.data_columns)))  # [rows, columns]
+        self.clear_time_series()
+
+    def clear_time_series(self):
+        """
+        empties the time series buffer and the output sink
+        """
+        self.data_msgs = []  # error messages, one per row
+        self.data_rows = 0  # number of rows filled
+        self.data_start = 0  # number of rows already written to the sink
+        self.data_view = None  # DataFrame built from the buffer, created on request
+        self.data_totals = Totals()  # totals of the rows written to the sink, used by analyze_performance
+        if self.sink is not None:
+            self.sink.open(self.attributes_time_series)
+
+    def buffer_data(self):
+        # rows of the time series buffer as a pandas DataFrame
+        df = pd.DataFrame(self.data_buffer[:self.data_rows], columns=self.data_columns,
+                          index=pd.RangeIndex(self.data_start, self.data_start + self.data_rows))
+        df['error_msg'] = self.data_msgs
+        return df.loc[:, self.attributes_time_series]
+
+    def flush(self):
+        """
+        writes the rows of the time series buffer to the output sink and empties the buffer (streaming sinks only)
+        """
+        if self.sink is None or self.data_rows == 0:
+            return
+        columns = self.data_buffer[:self.data_rows]
+        self.data_totals.add(lambda entry: columns[:, self.data_index[entry]], self.data_msgs)
+        self.sink.write(self.buffer_data())
+        self.data_start = self.data_start + self.data_rows
+        self.data_msgs = []
+        self.data_rows = 0
+        self.data_view = None
+
+    def record(self, values, error_msg=''):
+        """
+        stores the results of a single time step in the time series buffer
+
+        :param values: sequence of floats ordered as data_columns
+        :param error_msg: error message for this time step
+        """
+        if self.record_mode == 'summary':
+            self.data_totals.add_step(lambda entry: values[self.data_index[entry]], error_msg)
+            return
+
+        # grow buffer (doubling) or write it to the output sink if full
+        if self.data_rows == self.data_buffer.shape[0]:
+            if self.sink is None:
+                self.data_buffer = np.concatenate((self.data_buffer, np.zeros_like(self.data_buffer)))
+            else:
+                self.flush()
+
+        self.data_buffer[self.data_rows] = values
+        self.data_msgs.append(error_msg)
+        self.data_rows = self.data_rows + 1
+        self.data_view = None
+
+    def record_steps(self, s, n):
+        """
+        stores the results of n time steps in the time series buffer
+
+        :param s: TimeStep with each entry a float (same for all time steps) or a numpy array with one value per time step,
+                  error_msg is a list of n error messages
+        :param n: number of time steps
+        """
+        if self.record_mode == 'summary':
+            self.data_totals.add(lambda entry: np.broadcast_to(getattr(s, entry), (n,)), s.error_msg)
+            return
+
+        # write buffer to the output sink or grow buffer (doubling) until the time steps fit
+        while self.data_rows + n > self.data_buffer.shape[0]:
+            if self.sink is not None and self.data_rows > 0:
+                self.flush()
+            else:
+                self.data_buffer = np.concatenate((self.data_buffer, np.zeros_like(self.data_buffer)))
+
+        rows = slice(self.data_rows, self.data_rows + n)
+        for entry, i in self.data_index.items():
+            self.data_buffer[rows, i] = getattr(s, entry)
+        self.data_msgs.extend(s.error_msg)
+        self.data_rows = self.data_rows + n
+        self.data_view = None
+
+    def as_time_step(self, result, s):
+        """
+        compatibility for subclasses written against the previous interface, where charge_perf, discharge_perf and
+        update_storage_pressure returned a pandas Series
+        :param result: TimeStep or pandas Series returned by the subclass
+        :param s: TimeStep passed to the subclass
+        :return: TimeStep
+        """
+        if isinstance(result, pd.Series):
+            return s.update_from_series(result)
+        return result
+
+    @property
+    def data(self):
+        """
+        time series results as a pandas DataFrame (one row per time step, columns from attributes_time_series)
+
+        built from the time series buffer on first access after an update, then reused. With a streaming output sink
+        the buffer is written first and the time series is read back from the sink (empty for 'none')
+        """
+        if self.data_view is None:
+            if self.sink is None:
+                self.data_view = self.buffer_data()
+            else:
+                self.flush()
+                self.data_view = self.sink.read()
+        return self.data_view
+
+    @data.setter
+    def data(self, df):
+        # replaces the time series, e.g. self.data = pd.DataFrame(columns=self.attributes_time_series)
+        self.attributes_time_series = list(df.columns)
+        if 'error_msg' not in self.attributes_time_series:
+            self.attributes_time_series.append('error_msg')
+        self.init_time_series()
+        for i in df.index:
+            self.record(df.loc[i, self.data_columns].values.astype(float), df.loc[i].get('error_msg', ''))
 
     def update(self, m_dot=50.0, delta_t=1.0):
         """
@@ -306,134 +601,148 @@ class CAES:
         :return:
         """
 
-        # create series to hold results from this time step
-        s = pd.Series(data=0.0, index=self.attributes_time_series)
-        s['m_dot'] = m_dot
-        s['delta_t'] = delta_t
-        s['m_air'] = m_dot * 3600 * delta_t  # mass injection/release [kg]
-        s['error_msg'] = self.error_msg
+        # create object to hold results from this time step
+        s = self.time_step()
+        s.m_dot = m_dot
+        s.delta_t = delta_t
+        s.m_air = m_dot * 3600 * delta_t  # mass injection/release [kg]
+        s.error_msg = self.error_msg
 
         # update time
         self.time = self.time + delta_t  # [hr]
-        s['time'] = self.time
+        s.time = self.time
 
         # update flow pressure losses
         self.calc_pipe_dp(m_dot)  # pipe friction and gravitational potential
         self.calc_pipe_dT(m_dot)  # pipe heat transfer
         self.calc_aquifer_dp(m_dot)  # aquifer pressure losses
-        s['dp_pipe_f'] = self.dp_pipe_f
-        s['dp_pipe_g'] = self.dp_pipe_g
-        s['dT_pipe_ocean'] = self.dT_pipe_ocean
-        s['dT_pipe_sub'] = self.dT_pipe_sub
-        s['dT_pipe'] = s['dT_pipe_ocean'] + s['dT_pipe_sub']
-        s['dp_well'] = self.dp_aquifer
+        s.dp_pipe_f = self.dp_pipe_f
+        s.dp_pipe_g = self.dp_pipe_g
+        s.dT_pipe_ocean = self.dT_pipe_ocean
+        s.dT_pipe_sub = self.dT_pipe_sub
+        s.dT_pipe = s.dT_pipe_ocean + s.dT_pipe_sub
+        s.dp_well = self.dp_aquifer
 
         # charge/discharge
-        if s['m_air'] > 0.0:  # (charge)
+        if s.m_air > 0.0:  # (charge)
 
             # aquifer mass leakage (leakage occurs after air has been injected and traveled into the aquifer)
-            s['m_air_leakage'] = s['m_air'] * self.loss_m_air
+            s.m_air_leakage = s.m_air * self.loss_m_air
 
             # pressure states
-            s['p0'] = self.p_atm  # atmospheric pressure, compressor inlet
-            s['p1'] = self.p_store + self.dp_aquifer + self.dp_pipe_f + self.dp_pipe_g  # compressor outlet, pipe inlet
-            s['p2'] = self.p_store + self.dp_aquifer  # pipe outlet
-            s['p3'] = self.p_store  # storage pressure
+            s.p0 = self.p_atm  # atmospheric pressure, compressor inlet
+            s.p1 = self.p_store + self.dp_aquifer + self.dp_pipe_f + self.dp_pipe_g  # compressor outlet, pipe inlet
+            s.p2 = self.p_store + self.dp_aquifer  # pipe outlet
+            s.p3 = self.p_store  # storage pressure
 
             # temperature states
-            s['T0'] = self.T_atm  # atmospheric pressure, compressor inlet
-            s['T3'] = self.T_store  # storage pressure
+            s.T0 = self.T_atm  # atmospheric pressure, compressor inlet
+            s.T3 = self.T_store  # storage pressure
 
             # calculate compressor performance
-            s = self.charge_perf(s)
+            s = self.as_time_step(self.charge_perf(s), s)
 
             # finish updating temperature states
-            # s['T1']  compressor outlet - calculated by charge_perf
-            s['T2'] = s['T1'] - self.dT_pipe_ocean - self.dT_pipe_sub  # pipe outlet
+            # s.T1  compressor outlet - calculated by charge_perf
+            s.T2 = s.T1 - self.dT_pipe_ocean - self.dT_pipe_sub  # pipe outlet
 
             # apply mechanical, generator and storage efficienies
-            s['total_work_per_kg'] = s['work_per_kg'] / self.eta_mech / self.eta_gen
+            s.total_work_per_kg = s.work_per_kg / self.eta_mech / self.eta_gen
 
-        elif s['m_air'] < 0.0:  # (discharge)
+        elif s.m_air < 0.0:  # (discharge)
 
             # aquifer mass leakage  - does no occur during discharge
-            s['m_air_leakage'] = 0.0
+            s.m_air_leakage = 0.0
 
             # pressure states
-            s['p3'] = self.p_store  # aquifer pressure
-            s['p2'] = self.p_store - self.dp_aquifer  # pipe intlet
-            s['p1'] = self.p_store - self.dp_aquifer - self.dp_pipe_f - self.dp_pipe_g  # pipe outlet, expander inlet
-            s['p0'] = self.p_atm  # atmospheric pressure, expander outlet
+            s.p3 = self.p_store  # aquifer pressure
+            s.p2 = self.p_store - self.dp_aquifer  # pipe intlet
+            s.p1 = self.p_store - self.dp_aquifer - self.dp_pipe_f - self.dp_pipe_g  # pipe outlet, expander inlet
+            s.p0 = self.p_atm  # atmospheric pressure, expander outlet
 
             # temperature states
-            s['T3'] = self.T_store  # aquifer
-            s['T2'] = self.T_store  # pipe inlet
-            s['T1'] = self.T_store - self.dT_pipe_sub - self.dT_pipe_ocean  # pipe outlet, expander inlet # not updated
+            s.T3 = self.T_store  # aquifer
+            s.T2 = self.T_store  # pipe inlet
+            s.T1 = self.T_store - self.dT_pipe_sub - self.dT_pipe_ocean  # pipe outlet, expander inlet # not updated
 
             # calculate expander performance
-            s = self.discharge_perf(s)
+            s = self.as_time_step(self.discharge_perf(s), s)
 
             # finish updating temperature states
-            # s['T0'] - expander outlet, calculated by discharge_perf
+            # s.T0 - expander outlet, calculated by discharge_perf
 
             # apply mechanical, generator and storage efficienies
-            s['total_work_per_kg'] = s['work_per_kg'] * self.eta_mech * self.eta_gen
+            s.total_work_per_kg = s.work_per_kg * self.eta_mech * self.eta_gen
 
         else:  # no flow
             # pressure states
-            s['p0'] = self.p_atm
-            s['p1'] = self.p_store + self.dp_pipe_g
-            s['p2'] = self.p_store
-            s['p3'] = self.p_store
+            s.p0 = self.p_atm
+            s.p1 = self.p_store + self.dp_pipe_g
+            s.p2 = self.p_store
+            s.p3 = self.p_store
 
             # temperature states [K]
-            s['T0'] = self.T_atm  # compressor inlet / expander outlet
-            s['T1'] = self.T_atm  # compressor outlet / expander inlet
-            s['T2'] = self.T_store  # downwell
-            s['T3'] = self.T_store  # aquifer
+            s.T0 = self.T_atm  # compressor inlet / expander outlet
+            s.T1 = self.T_atm  # compressor outlet / expander inlet
+            s.T2 = self.T_store  # downwell
+            s.T3 = self.T_store  # aquifer
 
         # store pressure  and temperature states
-        self.p0 = s['p0']
-        self.p1 = s['p1']
-        self.p2 = s['p2']
-        self.p3 = s['p3']
+        self.p0 = s.p0
+        self.p1 = s.p1
+        self.p2 = s.p2
+        self.p3 = s.p3
 
-        self.T0 = s['T0']
-        self.T1 = s['T1']
-        self.T2 = s['T2']
-        self.T3 = s['T3']
+        self.T0 = s.T0
+        self.T1 = s.T1
+        self.T2 = s.T2
+        self.T3 = s.T3
 
         # calculate the power per time step
-        s['pwr'] = -1.0 * s['m_air'] * s['total_work_per_kg'] / (3600 * delta_t)  # 3600 converts from hr to s
+        s.pwr = -1.0 * s.m_air * s.total_work_per_kg / (3600 * delta_t)  # 3600 converts from hr to s
 
         # calculate water and fuel use
-        s['m_water'] = s['water_per_kg'] * abs(s['m_air'])
-        s['m_fuel'] = s['fuel_per_kg'] * abs(s['m_air'])
+        s.m_water = s.water_per_kg * abs(s.m_air)
+        s.m_fuel = s.fuel_per_kg * abs(s.m_air)
 
         # calculate energy in/out
-        if s['m_air'] > 0.0:  # (charge)
-            s['energy_in'] = -1.0 * s['m_air'] * s['total_work_per_kg'] / 3600  # [kWh]
-        elif s['m_air'] < 0.0:  # (discharge)
-            s['energy_out'] = -1.0 * s['m_air'] * s['total_work_per_kg'] / 3600  # [kWh]
+        if s.m_air > 0.0:  # (charge)
+            s.energy_in = -1.0 * s.m_air * s.total_work_per_kg / 3600  # [kWh]
+        elif s.m_air < 0.0:  # (discharge)
+            s.energy_out = -1.0 * s.m_air * s.total_work_per_kg / 3600  # [kWh]
 
         # update storage pressure
-        s = self.update_storage_pressure(s)
+        s = self.as_time_step(self.update_storage_pressure(s), s)
 
         # -----------------------
         # finish storing results from current time step
         # -----------------------
-        self.data = self.data.append(s, ignore_index=True)
+        self.record(self.data_getter(s), s.error_msg)
 
         # clear warning messages for subsequent time step
         self.error_msg = ''
 
-    def single_cycle(self):
+    def single_cycle(self, mode='step', tol=1e-3, nodes=16):
         """
         runs a single cycle, charging and discharge in the number of steps specified in self.steps
         :param:
-        m_dot [kg/s]
+        mode - 'step' calls update for each time step, 'vectorized' computes all charge and then all discharge time
+               steps as numpy arrays with update_steps (tabulated air properties, see update_steps).
+               'adaptive' chooses the time steps with adaptive_steps instead of using self.steps, the number of time
+               steps taken is stored in self.steps_taken.
+               'quadrature' integrates the charge and discharge over the mass stored instead of taking time steps, see
+               quadrature_cycle (no time series).
+               'vectorized', 'adaptive' and 'quadrature' fall back to 'step' for subclasses whose
+               charge_perf/discharge_perf do not accept arrays
+        tol - local error tolerance for mode='adaptive', see adaptive_steps [-]
+        nodes - number of quadrature points for mode='quadrature', see quadrature_cycle [-]
         :return:
         """
+        if mode not in ['step', 'vectorized', 'adaptive', 'quadrature']:
+            raise ValueError("mode must be 'step', 'vectorized', 'adaptive' or 'quadrature'")
+        if mode != 'step' and not self.vectorized_available():
+            print('Warning - ' + type(self).__name__ + ' does not support vectorized time steps, using mode=step')
+            mode = 'step'
 
         # calculate aquifer pressure loss based on m_dot
         self.calc_aquifer_dp(self.m_dot)  # aquifer pressure losses
@@ -458,10 +767,16 @@ class CAES:
             print('delta_t_in  [hr]   : ' + str(round(delta_t_in, 2)))
             print('delta_t_out [hr]   : ' + str(round(delta_t_out, 2)))
 
+        if mode == 'quadrature':
+            if m_air_in > 0.0:
+                self.quadrature_cycle(nodes=nodes)
+            return
+
         # save initial state
         self.update(m_dot=0.0, delta_t=1e-6)
 
         # if aquifer pressure losses are greater than well range, then do not perform calculations
+        self.steps_taken = 0  # (mode='adaptive')
         if m_air_in > 0.0:
 
             # ========================
@@ -471,11 +786,17 @@ class CAES:
             if self.debug:
                 print("Charging")
 
-            for i in range(int(self.steps)):
-                # charge
-                self.update(m_dot=self.m_dot, delta_t=delta_t_in)
-                if self.debug:
-                    print('/t' + str(i) + ' of ' + str(self.steps))
+            if mode == 'adaptive':
+                self.steps_taken = self.steps_taken + self.adaptive_steps(m_dot=self.m_dot,
+                                                                          m_air_total=m_air_in * self.steps, tol=tol)
+            elif mode == 'vectorized':
+                self.update_steps(m_dot=self.m_dot, delta_t=delta_t_in, n=int(self.steps))
+            else:
+                for i in range(int(self.steps)):
+                    # charge
+                    self.update(m_dot=self.m_dot, delta_t=delta_t_in)
+                    if self.debug:
+                        print('/t' + str(i) + ' of ' + str(self.steps))
 
             # ========================
             # discharging
@@ -483,11 +804,838 @@ class CAES:
             if self.debug:
                 print("Discharging")
 
-            for i in range(int(self.steps)):
-                # discharge
-                self.update(m_dot=-1.0 * self.m_dot, delta_t=delta_t_out)
+            if mode == 'adaptive':
+                self.steps_taken = self.steps_taken + self.adaptive_steps(m_dot=-1.0 * self.m_dot,
+                                                                          m_air_total=m_air_out * self.steps, tol=tol)
+            elif mode == 'vectorized':
+                self.update_steps(m_dot=-1.0 * self.m_dot, delta_t=delta_t_out, n=int(self.steps))
+            else:
+                for i in range(int(self.steps)):
+                    # discharge
+                    self.update(m_dot=-1.0 * self.m_dot, delta_t=delta_t_out)
+                    if self.debug:
+                        print('/t' + str(i) + ' of ' + str(self.steps))
+
+    def adaptive_steps(self, m_dot, m_air_total, tol=1e-3, first_steps=8, max_steps=1000):
+        """
+        injects or releases m_air_total at a constant mass flow rate in time steps chosen by step doubling, taking
+        few time steps where the losses and machine performance vary slowly and more where they change quickly or the
+        storage pressure is close to its limits
+
+        the time steps are solved with implicit=True (see solve_steps), so that the results converge to the same limit
+        as update with many time steps but without the lag of the pressure losses behind the flow. An implicit time
+        step only depends on the flow rate and the storage pressure at its start, which follows from the mass
+        injected/released so far, so the time steps do not have to be solved in order. The charge or discharge starts
+        as first_steps trial steps, each of mass m_air is compared as a single step and as two half steps, the single
+        step being the first half step. The relative difference in total_work_per_kg and in the aquifer pressure drop
+        (relative to p_store), times m_air / m_air_total, estimates the error the half steps add to the cycle totals.
+        Trial steps within tol and within the storage pressure limits are accepted, the others are split in two. All
+        new half steps of a round of trial steps are solved together and each point is only solved once (the halves
+        of a split step start at its start and at its half step). The accepted half steps are then recorded in order,
+        with the per kg results (work, water and fuel) extrapolated with the single step (local Richardson
+        extrapolation, second order)
+
+        :param m_dot: mass flow rate, injection (+) or release (-) [kg/s]
+        :param m_air_total: total mass to inject or release [kg]
+        :param tol: allowable error of each pair of half steps before extrapolation, relative to the totals [-]
+        :param first_steps: number of trial steps to start with [-]
+        :param max_steps: trial steps smaller than 2 * m_air_total / max_steps are not split regardless of tol and the
+                          storage pressure limits [-]
+        :return: steps - number of time steps recorded [-]
+        """
+        m_air_min = m_air_total / max_steps  # smallest step [kg]
+        if m_dot > 0.0:  # (charge, leakage occurs after air has been injected)
+            m_store_per_kg = 1.0 - self.loss_m_air  # change in storage mass per kg injected/released [-]
+        else:  # (discharge)
+            m_store_per_kg = -1.0
+        props = self.sweep_props
+
+        # trial steps, start (mass injected/released so far) and mass of each [kg]
+        trials = [(i * m_air_total / first_steps, m_air_total / first_steps) for i in range(first_steps)]
+        # total_work_per_kg [kJ/kg], dp_well and p_store [MPa], within limits and states at each point, by mass so
+        # far [kg]
+        points = {}
+        accepted = []
+        while len(trials) > 0:
+            # solve the new half steps together, the states to 1e-3 * tol which is enough for the error estimate
+            new = sorted(set(start + x for start, m_air in trials for x in [0.0, 0.5 * m_air, m_air]) - set(points))
+            m_store = self.m_store + m_store_per_kg * np.array(new)  # [kg]
+            p_store = m_store * self.R * self.T_store / (self.V * self.M) * 1e-3  # [MPa]
+            s, f, states = self.compute_implicit_steps(m_dot, 1.0, p_store, tol=1e-3 * tol, props=props)
+            self.finish_steps(s, 1.0)
+            outside = self.storage_pressure_errors(s.p2, s.p3, quiet=True)
+            for i, start in enumerate(new):
+                points[start] = [np.broadcast_to(s.total_work_per_kg, (len(new),))[i],
+                                 np.broadcast_to(s.dp_well, (len(new),))[i], p_store[i], i not in outside,
+                                 {state: value[i] for state, value in states.items()}]
+
+            # accept or split the trial steps, steps that cross the storage pressure limits are split until the
+            # smallest step (steps starting outside of the limits are not)
+            split = []
+            for start, m_air in trials:
+                one, half, end = points[start], points[start + 0.5 * m_air], points[start + m_air]
+                error = max(abs(0.5 * (one[0] + half[0]) / one[0] - 1.0),
+                            abs(0.5 * (half[1] - one[1])) / one[2]) * m_air / m_air_total  # [-]
+                within_limits = not one[3] or half[3] and end[3]
+                if error <= tol and within_limits or 0.5 * m_air < m_air_min:
+                    accepted.append((start, m_air))
+                else:
+                    split.extend([(start, 0.5 * m_air), (start + 0.5 * m_air, 0.5 * m_air)])
+            if self.debug:
+                print('adaptive_steps split ' + str(len(split) // 2) + ' of ' + str(len(trials)) + ' trial steps')
+            trials = split
+
+        # record the half steps of the accepted steps in order, solved to the default tol from the states above
+        accepted.sort()
+        steps = 2 * len(accepted)
+        delta_t = np.repeat([0.5 * m_air / (abs(m_dot) * 3600) for start, m_air in accepted], 2)  # [hr]
+        starts = [start + x for start, m_air in accepted for x in [0.0, 0.5 * m_air]]  # [kg]
+        guess = {state: np.array([points[start][4][state] for start in starts]) for state in points[0.0][4]}
+        s, f, time, m_store, p_store, prev = self.solve_steps(m_dot, delta_t, steps, prev=guess, implicit=True)
+        for entry in ['work_per_kg', 'water_per_kg', 'fuel_per_kg']:
+            # local extrapolation of the per kg results of each pair of half steps
+            values = np.broadcast_to(getattr(s, entry), (steps,)).reshape(-1, 2)
+            setattr(s, entry, (values + (values.mean(axis=1) - values[:, 0])[:, np.newaxis]).ravel())
+        self.finish_steps(s, delta_t)
+        self.store_steps(s, f, time, m_store, p_store, steps)
+        return steps
+
+    def quadrature_cycle(self, nodes=16):
+        """
+        single_cycle(mode='quadrature'), the energy, water and fuel of charging from m_store_min to m_store_max_actual
+        and discharging back are integrated over the mass injected/released with Gauss-Legendre quadrature instead of
+        summed over time steps
+
+        the performance at each quadrature point is that of a time step at the storage pressure of the point, with the
+        pressure losses and pipe heat transfer evaluated at the states of the point itself (compute_implicit_steps),
+        which is the limit of single_cycle with many time steps. All points of the charge (and of the discharge) are
+        solved together with the tabulated air properties of sweep_props. For smooth performance, e.g. the isothermal
+        CAES, 8 points already converge to relative ~1e-12 (the spline error of the property table is not smooth at
+        that level), so the results are a reference for the time stepping modes.
+        Machines with a kink in performance (e.g. the ICAES2 compressors once they reach p_machine_design) converge
+        more slowly with the number of points
+
+        each point is computed as a single_cycle time step and added to the running totals (data_totals) used by
+        analyze_performance, weighted by the number of time steps it stands for (its quadrature weight times
+        self.steps). The points are not stored in the time series. Only the time of the system is updated, the cycle
+        ends in the state it started from
+
+        :param nodes: number of quadrature points for charging and for discharging [-]
+        :return:
+        """
+        points, weights = np.polynomial.legendre.leggauss(nodes)  # on [-1, 1]
+        m_air_stored = self.m_store_max_actual - self.m_store_min  # [kg]
+        for m_dot in [self.m_dot, -1.0 * self.m_dot]:
+            if m_dot > 0.0:  # (charge, mass leakage compensated for during injection)
+                m_air_total = m_air_stored / (1 - self.loss_m_air)  # [kg]
+                m_store = self.m_store_min + (1 - self.loss_m_air) * m_air_total * (1 + points) / 2  # [kg]
+            else:  # (discharge)
+                m_air_total = m_air_stored  # [kg]
+                m_store = self.m_store_max_actual - m_air_total * (1 + points) / 2  # [kg]
+            p_store = m_store * self.R * self.T_store / (self.V * self.M) * 1e-3  # [MPa]
+            delta_t = m_air_total / self.steps / (self.m_dot * 3600)  # single_cycle time step [hr]
+
+            s, f, states = self.compute_implicit_steps(m_dot, delta_t, p_store, props=self.sweep_props)
+            self.finish_steps(s, delta_t)
+            s.p_store = p_store
+            s.T_store = self.T_store
+            s.m_store = m_store
+
+            # check storage pressure against limits
+            error_msgs = [self.error_msg] + [''] * (nodes - 1)
+            for i, error_msg in self.storage_pressure_errors(s.p2, s.p3).items():
+                error_msgs[i] = error_msg
+            self.error_msg = ''
+
+            self.data_totals.add(lambda entry: np.broadcast_to(getattr(s, entry), (nodes,)), error_msgs,
+                                 weights=weights / 2 * self.steps)
+            self.time = self.time + delta_t * self.steps
+
+    def run_cycles(self, n=10, tol=1e-6, mode='step'):
+        """
+        repeats single_cycle from the state left by the previous cycle until the cyclic steady state is reached, i.e.
+        the storage mass and pressure at the end of a cycle and the RTE change by less than tol (relative) between
+        consecutive cycles
+
+        single_cycle injects and releases the same storage mass in every cycle (the air leakage is made up during
+        injection), so the storage mass and pressure return to their values at the start of each cycle. Only the state
+        carried over from the last time step of the previous cycle changes between cycles: the pressures and
+        temperatures of the machines and the pipe and aquifer losses, which lag one time step behind the flow. These
+        converge within a few cycles, for the default inputs the RTE of the steady cycle differs from that of the first
+        cycle by ~1e-5 (relative)
+
+        the cycles before the steady state only update the running totals (record = 'summary'), once it is reached, or
+        after n - 1 cycles, one last cycle is run and recorded as set by the record input, so that self.data and
+        analyze_performance describe that cycle only
+
+        :param n: maximum number of cycles, including the last one [-]
+        :param tol: relative change between cycles to stop at [-]
+        :param mode: see single_cycle
+        :return: results - Pandas Series from analyze_performance of the last cycle with the following extra entries
+            cycles - number of cycles run [-]
+            converged - True if the last cycle changed by less than tol from the previous one [Boolean]
+        """
+        record_mode = self.record_mode
+        previous = None  # [m_store, p_store, RTE] at the end of the previous cycle
+        change = np.inf  # largest relative change between the last two cycles [-]
+        cycles = 0
+        try:
+            while True:
+                last = change <= tol or cycles >= n - 1
+                self.record_mode = record_mode if last else 'summary'
+                self.clear_time_series()  # results of the current cycle only
+                self.single_cycle(mode=mode)
+                cycles = cycles + 1
+                results = self.analyze_performance()
+
+                state = np.array([self.m_store, self.p_store, results['RTE']], dtype=float)
+                if previous is not None:
+                    with np.errstate(divide='ignore', invalid='ignore'):
+                        change = np.max(np.abs(state / previous - 1.0))
+                previous = state
                 if self.debug:
-                    print('/t' + str(i) + ' of ' + str(self.steps))
+                    print('cycle ' + str(cycles) + ', RTE ' + str(results['RTE']) + ', change ' + str(change))
+                if last:
+                    break
+        finally:
+            self.record_mode = record_mode
+
+        results['cycles'] = cycles
+        results['converged'] = bool(change <= tol)
+        return results
+
+    def run_profile(self, m_dot=None, delta_t=1.0, tol=1e-10, power=None):
+        """
+        runs the system through a dispatch profile (e.g. a year of hourly time steps) from its current state
+
+        the mass flow rate of each time step is limited to the Mach limit (m_dot_max) and so that the storage stays
+        between m_store_min and m_store_max_actual (p_store_max less the aquifer pressure drop at the design flow rate,
+        as in single_cycle). The time steps are computed together with update_steps, or with update for subclasses
+        that do not support vectorized time steps. For power profiles the mass flow rates are solved with power_profile
+
+        update_steps interpolates the air properties from a property table (sweep_props, built once per process) for
+        any property_backend, so a profile matches a loop of update with the 'table' backend within relative ~1e-9
+        and with the default 'direct' backend within about property_tol, at a fraction of the time (e.g. ~0.2 s
+        instead of ~0.6 s for a year of hourly time steps)
+
+        :param m_dot: mass flow rate of each time step, injection (+), release (-) or no flow (0) [kg/s], numpy array,
+                      list or pandas Series
+        :param delta_t: time step [hr], float or one value per time step
+        :param tol: see update_steps
+        :param power: instead of m_dot, power request of each time step, generation (+), consumption (-) or none (0)
+                      [kW], numpy array, list or pandas Series
+        :return: m_dot - mass flow rate of each time step after limits are applied [kg/s], numpy array (pandas Series
+                 with the same index if m_dot or power is a Series)
+        """
+        profile = m_dot if power is None else power
+        index = profile.index if isinstance(profile, pd.Series) else None
+        n = len(profile)
+        delta_t = np.broadcast_to(np.asarray(delta_t, dtype=float), (n,))
+
+        # storage limit based on aquifer pressure losses at the design flow rate
+        dp_aquifer = self.design_losses[5]  # [MPa]
+        self.p_store_max_actual = self.p_store_max - dp_aquifer
+        self.m_store_max_actual = self.p_store_max_actual * 1e3 * self.V * self.M / (
+                self.R * self.T_store_init)  # maximum [kg]
+
+        if power is not None:
+            m_dot_request = self.power_profile(np.asarray(power, dtype=float), delta_t, tol=tol)
+        else:
+            m_dot_request = np.array(m_dot, dtype=float)
+        m_dot = self.limit_profile(m_dot_request, delta_t)
+
+        if self.debug:
+            print('time steps           : ' + str(n))
+            print('m_store_max_actual kg: ' + str(self.m_store_max_actual))
+            print('limited time steps   : ' + str(np.sum(m_dot != m_dot_request)))
+
+        if n > 0:
+            if self.vectorized_available():
+                self.update_steps(m_dot=m_dot, delta_t=delta_t, n=n, tol=tol)
+            else:
+                for i in range(n):
+                    self.update(m_dot=m_dot[i], delta_t=delta_t[i])
+
+        if index is not None:
+            return pd.Series(m_dot, index=index)
+        return m_dot
+
+    def limit_profile(self, m_dot, delta_t):
+        """
+        limits the mass flow rates of a profile from the current state to the Mach limit (m_dot_max) and so that the
+        storage stays between m_store_min and m_store_max_actual, the stored mass only depends on the mass injected and
+        released so this is done before the time steps are computed
+
+        :param m_dot: mass flow rate of each time step, injection (+), release (-) or no flow (0) [kg/s], numpy array
+        :param delta_t: time step [hr], numpy array with one value per time step
+        :return: m_dot - limited mass flow rates [kg/s], numpy array
+        """
+        # Mach limit
+        m_dot = np.clip(m_dot, -self.m_dot_max, self.m_dot_max)
+
+        # storage limits
+        m_store = self.m_store
+        for i in range(len(m_dot)):
+            m_air = m_dot[i] * 3600 * delta_t[i]  # mass injection/release [kg]
+            if m_air > 0.0:  # (charge)
+                m_air_max = max(self.m_store_max_actual - m_store, 0.0) / (1 - self.loss_m_air)
+                if m_air > m_air_max:
+                    m_air = m_air_max
+                    m_dot[i] = m_air / (3600 * delta_t[i])
+                m_store = m_store + m_air - m_air * self.loss_m_air
+            elif m_air < 0.0:  # (discharge)
+                m_air_min = min(self.m_store_min - m_store, 0.0)
+                if m_air < m_air_min:
+                    m_air = m_air_min
+                    m_dot[i] = m_air / (3600 * delta_t[i])
+                m_store = m_store + m_air
+        return m_dot
+
+    def power_profile(self, power, delta_t, tol=1e-10, max_iter=20):
+        """
+        mass flow rates that meet a power profile from the current state, limited as in limit_profile, solved for all
+        time steps together without updating the system
+
+        each iteration solves the whole profile with solve_steps (starting from the states of the previous iteration)
+        and updates the flow rate of each time step with a Newton step, the first guess is from the specific power
+        (power per mass flow rate) at the design flow rate. The slope of each time step is evaluated at a second nearby
+        flow rate with the same storage pressure and previous states (as in update_power), a secant between iterations
+        would also include the effect of the flow rate of the previous time step (e.g. after a change in direction).
+        Stops once the flow rates change by less than 10 * tol
+
+        :param power: power request of each time step, generation (+), consumption (-) or none (0) [kW], numpy array
+        :param delta_t: time step [hr], numpy array with one value per time step
+        :param tol: see update_steps
+        :param max_iter: maximum number of iterations [-]
+        :return: m_dot - mass flow rates, injection (+) or release (-) [kg/s], numpy array
+        """
+        n = len(power)
+        direction = np.where(power > 0.0, -1.0, np.where(power < 0.0, 1.0, 0.0))  # release for generation
+        target = np.abs(power)  # [kW]
+
+        # first guess from the specific power at the design flow rate
+        magnitude = np.zeros(n)  # [kg/s]
+        for flow_direction in [1.0, -1.0]:
+            rows = direction == flow_direction
+            if np.any(rows):
+                pwr_design = self.power_curve(np.array([flow_direction * self.m_dot]), delta_t[rows][0])[0]  # [kW]
+                magnitude[rows] = target[rows] / (pwr_design / self.m_dot)
+        first_guess = magnitude
+        m_dot = self.limit_profile(direction * magnitude, delta_t)
+
+        prev = None
+        for i in range(max_iter):
+            s, f, time, m_store, p_store, prev = self.solve_steps(m_dot, delta_t, n, tol=tol, prev=prev)
+            pwr = np.broadcast_to(s.pwr, (n,))  # [kW]
+
+            # slope of power with flow rate of each time step
+            magnitude = np.abs(m_dot)
+            flow = magnitude > 0.0
+            with np.errstate(divide='ignore', invalid='ignore'):
+                s_trial, _ = self.compute_mixed_steps(m_dot * (1.0 + 1e-6), delta_t, p_store[:-1], prev,
+                                                      props=self.sweep_props)
+                slope = (s_trial.pwr - pwr) / (magnitude * 1e-6)  # [kW / (kg/s)]
+                magnitude_new = np.where(flow & (slope > 0.0), magnitude - (pwr - target) / slope, first_guess)
+            m_dot_new = self.limit_profile(direction * np.maximum(magnitude_new, 0.0), delta_t)
+
+            converged = np.all(np.abs(m_dot_new - m_dot) <= 10 * tol * np.abs(m_dot))
+            m_dot = m_dot_new
+            if converged:
+                break
+            if self.debug:
+                print('power_profile iteration ' + str(i) + ', flow rate change ' +
+                      str(np.max(np.abs(m_dot_new - direction * magnitude))))
+        return m_dot
+
+    def update_power(self, power, delta_t=1.0, tol=1e-10, max_iter=20):
+        """
+        Updates the CAES system for the next time step given a power request, the mass flow rate that meets the
+        request at the current state is solved for and the time step is computed with update
+
+        the first guess is the request divided by the specific power (power per mass flow rate) of the previous power
+        time step in the same direction, which is cached. Newton steps, with the slope from a second nearby flow rate
+        evaluated together in power_curve, are kept within a bracket of the solution (bisection otherwise). The flow
+        rate is limited to the Mach limit (m_dot_max) and so that the storage stays between m_store_min and
+        m_store_max_actual, requests beyond the limits are not met
+
+        :param power: power request, generation/release (+), consumption/injection (-) or none (0) [kW]
+        :param delta_t: time step [hr]
+        :param tol: relative error in power to stop at [-]
+        :param max_iter: maximum number of power_curve evaluations [-]
+        :return: m_dot - mass flow rate, injection (+) or release (-) [kg/s]
+        """
+        # direction and highest flow rate allowed by the Mach and storage limits
+        if power > 0.0:  # (discharge)
+            direction = -1.0
+            m_air_max = max(self.m_store - self.m_store_min, 0.0)  # [kg]
+        else:  # (charge)
+            direction = 1.0
+            m_air_max = max(self.m_store_max_actual - self.m_store, 0.0) / (1 - self.loss_m_air)  # [kg]
+        m_dot_max = min(float(self.m_dot_max), m_air_max / (3600 * delta_t))  # [kg/s]
+        target = abs(power)  # [kW]
+
+        if power == 0.0 or m_dot_max <= 0.0:
+            self.update(m_dot=0.0, delta_t=delta_t)
+            return 0.0
+
+        # warm start, the specific power of the previous time step or, for the first one, of the highest flow rate
+        if direction in self.power_per_m_dot:
+            m_dot = min(target / self.power_per_m_dot[direction], m_dot_max)
+        else:
+            m_dot = m_dot_max
+
+        m_dot_lo, m_dot_hi = 0.0, m_dot_max  # bracket [kg/s]
+        for i in range(max_iter):
+            trial = np.array([m_dot, m_dot * (1.0 + 1e-6)])  # [kg/s]
+            pwr = self.power_curve(direction * trial, delta_t)  # [kW]
+            error = pwr[0] - target  # [kW]
+            if abs(error) <= tol * target:
+                break
+            if error < 0.0:
+                if m_dot >= m_dot_max:  # request exceeds the limits
+                    break
+                m_dot_lo = m_dot
+            else:
+                m_dot_hi = m_dot
+            slope = (pwr[1] - pwr[0]) / (trial[1] - trial[0])  # [kW / (kg/s)]
+            m_dot_new = m_dot - error / slope if slope > 0.0 else m_dot_hi
+            if not m_dot_lo < m_dot_new <= m_dot_hi:
+                m_dot_new = 0.5 * (m_dot_lo + m_dot_hi)
+            m_dot = m_dot_new
+        self.power_per_m_dot[direction] = pwr[0] / m_dot
+
+        self.update(m_dot=direction * m_dot, delta_t=delta_t)
+        return direction * m_dot
+
+    def power_curve(self, m_dot, delta_t=1.0):
+        """
+        power of the next time step at several mass flow rates, from the current state without updating the system
+        (same as update)
+
+        :param m_dot: mass flow rates, injection (+) or release (-) [kg/s], numpy array with the same flow direction for
+                      all entries
+        :param delta_t: time step [hr]
+        :return: pwr - power consumed (injection) or generated (release) [kW], numpy array
+        """
+        if not self.vectorized_available():
+            raise ValueError(type(self).__name__ + ' does not support vectorized time steps (see array_perf)')
+        n = len(m_dot)
+        prev = {state: np.full(n, float(getattr(self, state))) for state in ['p1', 'p2', 'p3', 'T1', 'T2', 'T3']}
+        s, f = self.compute_steps(m_dot, delta_t, np.full(n, float(self.p_store)), prev)
+        self.finish_steps(s, delta_t)
+        return np.broadcast_to(s.pwr, (n,))
+
+    def vectorized_available(self):
+        """
+        checks whether update_steps can be used, i.e. update, charge_perf, discharge_perf and update_storage_pressure
+        are defined by classes that set array_perf = True (subclasses overriding them must set it again)
+        :return: True or False
+        """
+        for method in ['update', 'charge_perf', 'discharge_perf', 'update_storage_pressure']:
+            for cls in type(self).__mro__:
+                if method in vars(cls):
+                    if not vars(cls).get('array_perf', False):
+                        return False
+                    break
+        return True
+
+    def update_steps(self, m_dot=50.0, delta_t=1.0, n=1, tol=1e-10):
+        """
+
+        Updates the CAES system for n time steps at constant mass flow rate, same as n calls of update(m_dot, delta_t)
+        but with each entry of the time step stored as a numpy array
+
+        the storage mass and pressure follow directly from the constant flow rate. The pressure losses and pipe heat
+        transfer of each time step are evaluated at the states of the previous time step (as in update), these are
+        solved with fixed-point sweeps over all time steps until the states change by less than tol. Sweep i
+        reproduces the first i time steps exactly, so at most n + 1 sweeps are needed (typically ~10). The sweeps
+        interpolate the air properties from a property table (see sweep_props), as each sweep with CoolProp flashes
+        would cost as much as all n calls of update. With the default tol the states match update with
+        property_backend 'table' within relative ~1e-10 and analyze_performance results within relative 1e-9, with
+        the default 'direct' backend within about property_tol
+
+        with numpy arrays of m_dot (and delta_t), one per time step, the flow may change between time steps, also in
+        direction (see compute_mixed_steps)
+
+        :param m_dot: mass flow rate, injection (+) or release (-) [kg/s], float (must not be 0) or numpy array with
+                      one value per time step (0 for no flow)
+        :param delta_t: time step [hr], float or numpy array with one value per time step
+        :param n: number of time steps [-]
+        :param tol: relative change in states between sweeps to stop at [-]
+        :return:
+        """
+        s, f, time, m_store, p_store, prev = self.solve_steps(m_dot, delta_t, n, tol)
+        self.store_steps(s, f, time, m_store, p_store, n)
+
+    def store_steps(self, s, f, time, m_store, p_store, n):
+        """
+        records n time steps from solve_steps and moves the system to the state after the last one
+        :param s, f, time, m_store, p_store: see solve_steps
+        :param n: number of time steps [-]
+        """
+        # update storage mass and pressure
+        s.p_store = p_store[1:]
+        s.T_store = self.T_store
+        s.m_store = m_store[1:]
+
+        # check storage pressure against limits
+        s.error_msg = [self.error_msg] + [''] * (n - 1)
+        for i, error_msg in self.storage_pressure_errors(s.p2, s.p3).items():
+            s.error_msg[i] = error_msg
+        for i, error_msg in self.state_errors(s, n).items():
+            s.error_msg[i] = error_msg
+
+        # store results
+        self.record_steps(s, n)
+
+        # store final state
+        self.time = time[-1]
+        self.m_store = m_store[-1]
+        self.p_store = p_store[-1]
+        for state in ['p0', 'p1', 'p2', 'p3', 'T0', 'T1', 'T2', 'T3']:
+            setattr(self, state, np.broadcast_to(getattr(s, state), (n,))[-1])
+        self.dp_pipe_f = s.dp_pipe_f[-1]
+        self.f = f[-1]
+        self.dp_pipe_g = s.dp_pipe_g[-1]
+        self.dT_pipe_ocean = s.dT_pipe_ocean[-1]
+        self.dT_pipe_sub = s.dT_pipe_sub[-1]
+        self.dp_aquifer = s.dp_well[-1]
+
+        # clear warning messages for subsequent time step
+        self.error_msg = ''
+
+    def solve_steps(self, m_dot, delta_t, n, tol=1e-10, prev=None, implicit=False):
+        """
+        solves n time steps from the current state without updating the system, see update_steps
+
+        :param m_dot: mass flow rate [kg/s], float or numpy array, see update_steps
+        :param delta_t: time step [hr], float or numpy array
+        :param n: number of time steps [-]
+        :param tol: relative change in states between sweeps to stop at [-]
+        :param prev: first guess of the states p1, p2, p3 [MPa] and T1, T2, T3 [K] of the previous time steps (of the
+                     time steps themselves for implicit=True), e.g. from a previous call with similar flow rates, the
+                     current state if None
+        :param implicit: if True the pressure losses and pipe heat transfer of each time step are evaluated at its own
+                         states instead of those of the previous time step (see compute_implicit_steps), the time steps
+                         then only depend on each other through the storage pressure, m_dot must have the same flow
+                         direction for all time steps
+        :return: s - TimeStep (without the storage entries), f - pipe friction factor [-], time [hr],
+                 m_store - storage mass before (first n) and after (last n) each time step [kg],
+                 p_store - storage pressure before and after each time step [MPa],
+                 prev - states of the previous time steps [MPa], [K]
+        """
+        m_air = m_dot * 3600 * delta_t  # mass injection/release per time step [kg]
+        mixed = False  # time steps differ in flow direction
+        if np.all(m_air > 0.0):  # (charge)
+            m_air_leakage = m_air * self.loss_m_air  # (leakage occurs after air has been injected)
+        elif np.all(m_air < 0.0):  # (discharge)
+            m_air_leakage = 0.0
+        elif np.ndim(m_air) > 0:
+            m_air_leakage = np.where(m_air > 0.0, m_air * self.loss_m_air, 0.0)
+            mixed = True
+        else:
+            raise ValueError('update_steps requires m_dot != 0, use update for no flow')
+
+        # time and storage mass, summed in the same order as update [hr], [kg]
+        time = np.cumsum(np.append(self.time, np.broadcast_to(delta_t, (n,))))[1:]
+        m_store = np.cumsum(np.append(self.m_store, np.broadcast_to(m_air - m_air_leakage, (n,))))
+        p_store = m_store * self.R * self.T_store / (self.V * self.M) * 1e-3  # before (first n) and after (last n)
+
+        if implicit:
+            s, f, prev = self.compute_implicit_steps(m_dot, delta_t, p_store[:-1], tol, props=self.sweep_props,
+                                                     guess=prev)
+        else:
+            s, f, prev = self.sweep_steps(m_dot, delta_t, p_store[:-1], n, tol, prev, mixed)
+
+        s.time = time
+        if not mixed:  # (finished by compute_mixed_steps)
+            self.finish_steps(s, delta_t)
+        return s, f, time, m_store, p_store, prev
+
+    def sweep_steps(self, m_dot, delta_t, p_store, n, tol, prev, mixed):
+        # fixed-point sweeps of solve_steps, the pressure losses of each time step use the states of the previous one
+        # the air properties are interpolated from a property table (see sweep_props)
+        states = ['p1', 'p2', 'p3', 'T1', 'T2', 'T3']
+        props = self.sweep_props
+        if prev is None:
+            # first guess, the states after the first time step with the pressures moved with the storage pressure
+            current = {state: np.array([float(getattr(self, state))]) for state in states}
+            with np.errstate(divide='ignore', invalid='ignore'):
+                first, _ = self.compute_steps(np.broadcast_to(m_dot, (n,))[:1], np.broadcast_to(delta_t, (n,))[:1],
+                                              p_store[:1], current, props)
+            shift = p_store - p_store[min(1, n - 1)]  # [MPa]
+            prev = {}
+            for state in states:
+                prev[state] = np.full(n, float(np.ravel(getattr(first, state))[0])) + (shift if state[0] == 'p' else 0.0)
+                prev[state][0] = current[state][0]  # (the first entry is the current state)
+        else:
+            prev = {state: prev[state].copy() for state in states}
+
+        s, f, rows = None, None, None
+        for sweep in range(n + 1):
+            # states of earlier sweeps are not converged and can be non-physical (e.g. p1 <= 0 for a discharge after a
+            # charge), their NaN results are replaced by the following sweeps. Warnings are only passed on for the
+            # last sweep, whose results are recorded
+            with warnings.catch_warnings(record=True) as caught, np.errstate(divide='warn', invalid='warn'):
+                warnings.simplefilter('always', RuntimeWarning)
+                if mixed:  # (only time steps whose previous states changed are computed again)
+                    s, f = self.compute_mixed_steps(m_dot, delta_t, p_store, prev, s, f, rows, props)
+                else:
+                    s, f = self.compute_steps(m_dot, delta_t, p_store, prev, props)
+
+            # states of the previous time step for the next sweep, states that become finite or non-finite count as
+            # changed (time steps update fails at stay non-finite, see state_errors)
+            change = 0.0
+            rows = np.zeros(n, dtype=bool)
+            for state in states:
+                value = np.append(getattr(self, state), np.broadcast_to(getattr(s, state), (n,))[:-1])
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    state_change = np.abs(value / prev[state] - 1.0)
+                state_change[np.isfinite(value) != np.isfinite(prev[state])] = np.inf
+                state_change[~np.isfinite(value) & ~np.isfinite(prev[state])] = 0.0  # (failed in both sweeps)
+                change = max(change, np.max(state_change))
+                rows = rows | (state_change > tol)
+                prev[state] = value
+
+            if change <= tol or sweep == n:
+                for warning in caught:
+                    warnings.warn_explicit(warning.message, warning.category, warning.filename, warning.lineno)
+                break
+        return s, f, prev
+
+    def compute_implicit_steps(self, m_dot, delta_t, p_store, tol=1e-10, max_sweeps=100, props=None, guess=None):
+        """
+        compute_steps with the pressure losses and pipe heat transfer of each time step evaluated at its own states
+        instead of those of the previous time step, solved by fixed-point iteration starting from the current state
+        (with Aitken extrapolation every third iteration).
+        The time steps are independent of each other, e.g. points along a charge or discharge (see quadrature_cycle)
+
+        :param m_dot: mass flow rate [kg/s], float or numpy array, same flow direction for all entries
+        :param delta_t: time step [hr], float or numpy array
+        :param p_store: storage pressure of each time step [MPa], numpy array
+        :param tol: relative change in states between iterations to stop at [-]
+        :param max_sweeps: maximum number of iterations [-]
+        :param props: air property provider, see compute_steps
+        :param guess: first guess of the states p1, p2, p3 [MPa] and T1, T2, T3 [K] of each time step, e.g. from a
+                      previous call at a lower tol, the current state if None
+        :return: s - TimeStep, f - pipe friction factor [-], states - p1, p2, p3 [MPa] and T1, T2, T3 [K] of each time
+                 step
+        """
+        n = len(p_store)
+        if guess is None:
+            states = {state: np.full(n, float(getattr(self, state))) for state in ['p1', 'p2', 'p3', 'T1', 'T2', 'T3']}
+        else:
+            states = {state: np.array(value, dtype=float) for state, value in guess.items()}
+        older = {}  # states of the iteration before the last one
+        for sweep in range(max_sweeps):
+            s, f = self.compute_steps(m_dot, delta_t, p_store, states, props)
+            values = {state: np.array(np.broadcast_to(getattr(s, state), (n,)), dtype=float) for state in states}
+            change = max(np.max(np.abs(values[state] / states[state] - 1.0)) for state in states)
+            if change <= tol:
+                states = values
+                break
+
+            # every third iteration, Aitken extrapolation of the states that converge geometrically (e.g. p1 through
+            # the pipe friction of a charge converges by a factor of ~4 per iteration)
+            for state in states:
+                if sweep % 3 == 2:
+                    with np.errstate(divide='ignore', invalid='ignore'):
+                        ratio = (values[state] - states[state]) / (states[state] - older[state])
+                    geometric = np.abs(ratio) < 0.9
+                    values[state][geometric] = values[state][geometric] + (values[state] - states[state])[geometric] * \
+                        ratio[geometric] / (1.0 - ratio[geometric])
+                older[state] = states[state]
+            states = values
+        return s, f, states
+
+    def compute_steps(self, m_dot, delta_t, p_store, prev, props=None):
+        """
+        computes the pressure losses, states and machine performance of several time steps (or systems, see
+        BatchCAES) at once, same as update, with the entries of the time steps stored as numpy arrays
+
+        :param m_dot: mass flow rate [kg/s], float or numpy array, same flow direction for all entries
+        :param delta_t: time step [hr], float or numpy array
+        :param p_store: storage pressure at the start of each time step [MPa], numpy array
+        :param prev: dictionary with the states p1, p2, p3 [MPa] and T1, T2, T3 [K] of the previous time steps
+        :param props: air property provider of the pressure losses and pipe heat transfer, air_props if None
+        :return: s - TimeStep, f - pipe friction factor [-]
+        """
+        # create object to hold results from these time steps
+        s = self.time_step()
+        s.m_dot = m_dot
+        s.delta_t = delta_t
+        s.m_air = m_dot * 3600 * delta_t  # mass injection/release [kg]
+
+        # flow pressure losses and pipe heat transfer
+        if np.all(m_dot > 0.0):  # injection
+            losses = self.calc_losses_array(m_dot, prev['T1'], prev['p1'], prev['T2'], prev['p2'], props)
+        else:  # withdrawl / no movement
+            losses = self.calc_losses_array(m_dot, prev['T2'], prev['p2'], prev['T3'], prev['p3'], props)
+        s.dp_pipe_f, f, s.dp_pipe_g, s.dT_pipe_ocean, s.dT_pipe_sub, s.dp_well = losses
+        s.dT_pipe = s.dT_pipe_ocean + s.dT_pipe_sub
+
+        if np.all(s.m_air > 0.0):  # (charge)
+            # aquifer mass leakage (leakage occurs after air has been injected and traveled into the aquifer)
+            s.m_air_leakage = s.m_air * self.loss_m_air
+
+            # pressure states
+            s.p0 = self.p_atm  # atmospheric pressure, compressor inlet
+            s.p1 = p_store + s.dp_well + s.dp_pipe_f + s.dp_pipe_g  # compressor outlet, pipe inlet
+            s.p2 = p_store + s.dp_well  # pipe outlet
+            s.p3 = p_store  # storage pressure
+
+            # temperature states
+            s.T0 = self.T_atm  # atmospheric pressure, compressor inlet
+            s.T3 = self.T_store  # storage pressure
+
+            # calculate compressor performance
+            s = self.charge_perf(s)
+            s.T2 = s.T1 - s.dT_pipe_ocean - s.dT_pipe_sub  # pipe outlet
+
+        elif np.all(s.m_air < 0.0):  # (discharge)
+            # aquifer mass leakage  - does no occur during discharge
+            s.m_air_leakage = 0.0
+
+            # pressure states
+            s.p3 = p_store  # aquifer pressure
+            s.p2 = p_store - s.dp_well  # pipe intlet
+            s.p1 = p_store - s.dp_well - s.dp_pipe_f - s.dp_pipe_g  # pipe outlet, expander inlet
+            s.p0 = self.p_atm  # atmospheric pressure, expander outlet
+
+            # temperature states
+            s.T3 = self.T_store  # aquifer
+            s.T2 = self.T_store  # pipe inlet
+            s.T1 = self.T_store - s.dT_pipe_sub - s.dT_pipe_ocean  # pipe outlet, expander inlet
+
+            # calculate expander performance
+            s = self.discharge_perf(s)
+
+        else:  # no flow
+            # pressure states
+            s.p0 = self.p_atm
+            s.p1 = p_store + s.dp_pipe_g
+            s.p2 = p_store
+            s.p3 = p_store
+
+            # temperature states [K]
+            s.T0 = self.T_atm  # compressor inlet / expander outlet
+            s.T1 = self.T_atm  # compressor outlet / expander inlet
+            s.T2 = self.T_store  # downwell
+            s.T3 = self.T_store  # aquifer
+
+        return s, f
+
+    def compute_mixed_steps(self, m_dot, delta_t, p_store, prev, s=None, f=None, rows=None, props=None):
+        """
+        compute_steps and finish_steps for time steps that differ in flow direction, the charge, discharge and no flow
+        time steps are computed separately and combined
+
+        :param m_dot: mass flow rate, injection (+), release (-) or no flow (0) [kg/s], numpy array
+        :param delta_t: time step [hr], float or numpy array
+        :param p_store: storage pressure at the start of each time step [MPa], numpy array
+        :param prev: dictionary with the states p1, p2, p3 [MPa] and T1, T2, T3 [K] of the previous time steps
+        :param s: TimeStep from a previous call, if given only the time steps in rows are computed again
+        :param f: pipe friction factor from a previous call [-]
+        :param rows: time steps to compute again, boolean numpy array
+        :param props: air property provider, see compute_steps
+        :return: s - TimeStep with each entry a numpy array, f - pipe friction factor [-]
+        """
+        n = len(m_dot)
+        delta_t = np.broadcast_to(delta_t, (n,))
+        if s is None:
+            s = self.time_step()
+            f = np.zeros(n)
+            rows = np.ones(n, dtype=bool)
+        for direction in [m_dot > 0.0, m_dot < 0.0, m_dot == 0.0]:
+            selected = rows & direction
+            if not np.any(selected):
+                continue
+            s_rows, f[selected] = self.compute_steps(m_dot[selected], delta_t[selected], p_store[selected],
+                                                     {state: value[selected] for state, value in prev.items()}, props)
+            self.finish_steps(s_rows, delta_t[selected])
+            for entry in self.data_columns:
+                values = getattr(s, entry)
+                if np.ndim(values) == 0:
+                    values = np.full(n, values)
+                    setattr(s, entry, values)
+                values[selected] = getattr(s_rows, entry)
+        return s, f
+
+    def finish_steps(self, s, delta_t):
+        """
+        applies the machine efficiencies and calculates the power, water and fuel use and energy in/out of time steps
+        from compute_steps
+        :param s: TimeStep from compute_steps, updated
+        :param delta_t: time step [hr], float or numpy array
+        """
+        # apply mechanical, generator and storage efficienies
+        if np.all(s.m_air > 0.0):  # (charge)
+            s.total_work_per_kg = s.work_per_kg / self.eta_mech / self.eta_gen
+        elif np.all(s.m_air < 0.0):  # (discharge)
+            s.total_work_per_kg = s.work_per_kg * self.eta_mech * self.eta_gen
+
+        # calculate the power per time step
+        s.pwr = -1.0 * s.m_air * s.total_work_per_kg / (3600 * delta_t)  # 3600 converts from hr to s
+
+        # calculate water and fuel use
+        s.m_water = s.water_per_kg * np.abs(s.m_air)
+        s.m_fuel = s.fuel_per_kg * np.abs(s.m_air)
+
+        # calculate energy in/out
+        if np.all(s.m_air > 0.0):  # (charge)
+            s.energy_in = -1.0 * s.m_air * s.total_work_per_kg / 3600  # [kWh]
+        elif np.all(s.m_air < 0.0):  # (discharge)
+            s.energy_out = -1.0 * s.m_air * s.total_work_per_kg / 3600  # [kWh]
+
+    def storage_pressure_errors(self, p2, p3, quiet=False):
+        """
+        checks the storage pressure of several time steps (or systems) against limits, same as update_storage_pressure
+        :param p2: downwell pressure [MPa], numpy array
+        :param p3: formation edge pressure [MPa], numpy array
+        :param quiet: if True the error messages are not printed
+        :return: dictionary of error messages by index, only for entries outside of the limits
+        """
+        p2, p3, p_store_min, p_store_max = np.broadcast_arrays(p2, p3, self.p_store_min, self.p_store_max)
+        errors = {}
+
+        # check storage pressure against limits, p2 (downwell)
+        for i in np.flatnonzero(p2 > p_store_max + self.buffer):
+            errors[i] = 'Error: p2 > P_store_max (' + str(p2[i]) + ' > ' + str(p_store_max[i]) + ')'
+
+        # check storage pressure against limits, p3 (formation edge)
+        for i in np.flatnonzero(p3 < p_store_min - self.buffer):
+            errors[i] = 'Error: p3 < P_store_min (' + str(p3[i]) + ' < ' + str(p_store_min[i]) + ')'
+        for i in np.flatnonzero(p3 > p_store_max + self.buffer):
+            errors[i] = 'Error: p3 > P_store_max (' + str(p3[i]) + ' > ' + str(p_store_max[i]) + ')'
+
+        if not quiet:
+            for i in sorted(errors):
+                print(errors[i])
+        return errors
+
+    def state_errors(self, s, n, quiet=False):
+        """
+        checks the states and power of several time steps for values update would fail on (CoolProp raises an error
+        for non-positive or non-finite pressures)
+        :param s: TimeStep with each entry a float or numpy array
+        :param n: number of time steps [-]
+        :param quiet: if True the error messages are not printed
+        :return: dictionary of error messages by index, only for time steps without a valid state
+        """
+        errors = {}
+        for entry in ['p1', 'p2', 'p3', 'T1', 'T2', 'T3', 'pwr']:
+            value = np.broadcast_to(getattr(s, entry), (n,))
+            invalid = ~np.isfinite(value)
+            if entry[0] == 'p' and entry != 'pwr':
+                invalid = invalid | (value <= 0.0)
+            for i in np.flatnonzero(invalid):
+                if i not in errors:
+                    errors[i] = 'Error: no valid state (' + entry + ' = ' + str(value[i]) + ')'
+
+        if not quiet:
+            for i in sorted(errors):
+                print(errors[i])
+        return errors
 
     def debug_perf(self, delta_t=1.0):
         """
@@ -520,50 +1668,46 @@ class CAES:
             CO2_per_MWh - CO2 emissions per MWh [kg]
             water_per_MWh - water consumption per MWh [kg]
         """
-        # create series to hold results
+        # create dictionary to hold results, converted to a series once complete
         entries = ['RTE', 'kWh_in', 'kWh_out', 'kW_in_avg', 'kW_out_avg',
                    'kg_water_per_kWh', 'kg_CO2_per_kWh', 'kg_fuel_per_kWh',
                    'dp_well_avg', 'dp_pipe_f_avg',
                    'T_aquifer', 'T_cmp_out',
                    'errors']
-        results = pd.Series(index=entries)
+        results = dict.fromkeys(entries, np.nan)
 
-        if len(self.data) > 1:
+        totals = self.time_series_totals()
+        if totals['steps'] > 1:
 
             # compute performance
-            energy_input_total = self.data.loc[:, 'energy_in'].sum()  # [kWh]
-            energy_output_total = self.data.loc[:, 'energy_out'].sum()  # [kWh]
-            water_input_total = self.data.loc[:, 'm_water'].sum()  # [kg]
-            fuel_input_total = self.data.loc[:, 'm_fuel'].sum()  # [kg]
+            energy_input_total = totals['energy_in']  # [kWh]
+            energy_output_total = totals['energy_out']  # [kWh]
+            water_input_total = totals['m_water']  # [kg]
+            fuel_input_total = totals['m_fuel']  # [kg]
             CO2_fuel = fuel_input_total * self.fuel_CO2  # [ton]
             heat_input_total = fuel_input_total * self.fuel_HHV  # [kWh]
             RTE = energy_output_total / (energy_input_total + heat_input_total)
 
-            # power in/out indices
-            ind_pwr_in = self.data.loc[:, 'm_air'] > 0.0
-            ind_pwr_out = self.data.loc[:, 'm_air'] < 0.0
-            ind_pwr = self.data.loc[:, 'm_air'] != 0.0
-
             # store results
             results['RTE'] = RTE
             results['kWh_in'] = energy_input_total
             results['kWh_out'] = energy_output_total
-            results['kW_in_avg'] = self.data.loc[ind_pwr_in, 'pwr'].mean()
-            results['kW_out_avg'] = self.data.loc[ind_pwr_out, 'pwr'].mean()
+            results['kW_in_avg'] = totals['pwr_in_avg']
+            results['kW_out_avg'] = totals['pwr_out_avg']
             results['kg_water_per_kWh'] = water_input_total / energy_output_total
             results['kg_CO2_per_kWh'] = CO2_fuel / energy_output_total
             results['kg_fuel_per_kWh'] = fuel_input_total / energy_output_total
             results['MWh_cushion_gas'] = self.m_store_min / self.m_dot / 3600 * results['kW_in_avg'] / 1000.0
-            results['dp_well_avg'] = self.data.loc[ind_pwr, 'dp_well'].mean()
-            results['dp_pipe_f_avg'] = self.data.loc[ind_pwr, 'dp_pipe_f'].mean()
+            results['dp_well_avg'] = totals['dp_well_avg']
+            results['dp_pipe_f_avg'] = totals['dp_pipe_f_avg']
             results['T_store_init'] = self.T_store_init
-            results['T_cmp_out_avg'] = self.data.loc[ind_pwr_in, 'T1'].mean()
-            results['T_exp_out_avg'] = self.data.loc[ind_pwr_out, 'T1'].mean()
+            results['T_cmp_out_avg'] = totals['T1_in_avg']
+            results['T_exp_out_avg'] = totals['T1_out_avg']
             results['p_store_min'] = self.p_store_min
             results['p_store_max'] = self.p_store_max
 
             # check for errors
-            if len(self.data.error_msg.unique()) > 1:  # errors
+            if totals['errors']:  # errors
                 results['errors'] = 'true'
             elif energy_input_total == 0 or energy_output_total == 0 or RTE <= 0:
                 results['errors'] = 'true'
@@ -573,7 +1717,55 @@ class CAES:
         else:  # insufficient data
             results['errors'] = 'true'
 
-        return results
+        return pd.Series({entry: value if isinstance(value, str) else float(value) for entry, value in results.items()},
+                         dtype=object)
+
+    def time_series_totals(self):
+        """
+        totals and averages of the time series used by analyze_performance, from self.data or, with a streaming output
+        sink, record = 'summary' or after single_cycle(mode='quadrature'), from the running totals
+
+        :return: dictionary with the following entries
+            steps - number of time steps [-]
+            energy_in, energy_out - energy input and output [kWh]
+            m_water, m_fuel - water and fuel consumption [kg]
+            pwr_in_avg, pwr_out_avg - average power while charging and discharging [kW]
+            dp_well_avg, dp_pipe_f_avg - average well and pipe friction pressure losses with flow [MPa]
+            T1_in_avg, T1_out_avg - average compressor outlet and expander inlet temperature [K]
+            errors - True if the time steps have more than one distinct error message [Boolean]
+        """
+        if self.sink is None and self.record_mode == 'full' and self.data_totals.steps == 0:
+            df = self.data
+            ind_pwr_in = df.loc[:, 'm_air'] > 0.0  # charging
+            ind_pwr_out = df.loc[:, 'm_air'] < 0.0  # discharging
+            ind_pwr = df.loc[:, 'm_air'] != 0.0
+            return {'steps': len(df),
+                    'energy_in': df.loc[:, 'energy_in'].sum(),
+                    'energy_out': df.loc[:, 'energy_out'].sum(),
+                    'm_water': df.loc[:, 'm_water'].sum(),
+                    'm_fuel': df.loc[:, 'm_fuel'].sum(),
+                    'pwr_in_avg': df.loc[ind_pwr_in, 'pwr'].mean(),
+                    'pwr_out_avg': df.loc[ind_pwr_out, 'pwr'].mean(),
+                    'dp_well_avg': df.loc[ind_pwr, 'dp_well'].mean(),
+                    'dp_pipe_f_avg': df.loc[ind_pwr, 'dp_pipe_f'].mean(),
+                    'T1_in_avg': df.loc[ind_pwr_in, 'T1'].mean(),
+                    'T1_out_avg': df.loc[ind_pwr_out, 'T1'].mean(),
+                    'errors': len(df.error_msg.unique()) > 1}
+
+        self.flush()
+        totals = self.data_totals
+        return {'steps': totals.steps,
+                'energy_in': totals.sums['energy_in'],
+                'energy_out': totals.sums['energy_out'],
+                'm_water': totals.sums['m_water'],
+                'm_fuel': totals.sums['m_fuel'],
+                'pwr_in_avg': totals.mean('pwr_in'),
+                'pwr_out_avg': totals.mean('pwr_out'),
+                'dp_well_avg': totals.mean('dp_well'),
+                'dp_pipe_f_avg': totals.mean('dp_pipe_f'),
+                'T1_in_avg': totals.mean('T1_in'),
+                'T1_out_avg': totals.mean('T1_out'),
+                'errors': totals.errors}
 
     def update_storage_pressure(self, s):
         """
@@ -583,33 +1775,33 @@ class CAES:
         designed to be kept the same for each caes architecutre
 
         :param:
-            s - pandas series containing performance of current time step and error messages
+            s - TimeStep containing performance of current time step and error messages
         :return:
             s - updated
         """
         # update storage mass and pressure
-        self.m_store = self.m_store + s['m_air'] - s['m_air_leakage']
+        self.m_store = self.m_store + s.m_air - s.m_air_leakage
         self.p_store = self.m_store * self.R * self.T_store / (self.V * self.M) * 1e-3  # storage pressure
         if self.include_aquifer_heat_transfer:
             self.T_store = self.T_store
 
         # check storage pressure against limits, p2 (downwell)
         if self.p2 > self.p_store_max + self.buffer:
-            s['error_msg'] = 'Error: p2 > P_store_max (' + str(self.p2) + ' > ' + str(self.p_store_max) + ')'
-            print(s['error_msg'])
+            s.error_msg = 'Error: p2 > P_store_max (' + str(self.p2) + ' > ' + str(self.p_store_max) + ')'
+            print(s.error_msg)
 
         # check storage pressure against limits, p3 (formation edge)
         if self.p3 < self.p_store_min - self.buffer:
-            s['error_msg'] = 'Error: p3 < P_store_min (' + str(self.p3) + ' < ' + str(self.p_store_min) + ')'
-            print(s['error_msg'])
+            s.error_msg = 'Error: p3 < P_store_min (' + str(self.p3) + ' < ' + str(self.p_store_min) + ')'
+            print(s.error_msg)
         elif self.p3 > self.p_store_max + self.buffer:
-            s['error_msg'] = 'Error: p3 > P_store_max (' + str(self.p3) + ' > ' + str(self.p_store_max) + ')'
-            print(s['error_msg'])
+            s.error_msg = 'Error: p3 > P_store_max (' + str(self.p3) + ' > ' + str(self.p_store_max) + ')'
+            print(s.error_msg)
 
         # store results
-        s['p_store'] = self.p_store
-        s['T_store'] = self.T_store
-        s['m_store'] = self.m_store
+        s.p_store = self.p_store
+        s.T_store = self.T_store
+        s.m_store = self.m_store
 
         return s
 
@@ -621,7 +1813,7 @@ class CAES:
         designed to be updated for each caes architecture
 
         :param:
-            s - pandas series containing performance of current time step and error messages
+            s - TimeStep containing performance of current time step and error messages
         :return:
             s - updated including (at a minimum) the following entries:
                 work_per_kg - compression work [kJ/kg air]
@@ -630,10 +1822,10 @@ class CAES:
         """
 
         # idealized isothermal process
-        s['work_per_kg'] = self.R / self.M * s['T0'] * log(s['p0'] / s['p1'])
-        s['water_per_kg'] = 0.0  # idealized process - no cooling water [kg/kg air]
-        s['fuel_per_kg'] = 0.0  # isothermal - no heat input [kg/kg air]
-        s['T1'] = s['T0']
+        s.work_per_kg = self.R / self.M * s.T0 * np.log(s.p0 / s.p1)
+        s.water_per_kg = 0.0  # idealized process - no cooling water [kg/kg air]
+        s.fuel_per_kg = 0.0  # isothermal - no heat input [kg/kg air]
+        s.T1 = s.T0
         return s
 
     def discharge_perf(self, s):
@@ -643,7 +1835,7 @@ class CAES:
         designed to be updated for each caes architecture
 
         :param:
-            s - pandas series containing performance of current time step and error messages
+            s - TimeStep containing performance of current time step and error messages
         :return:
             s - updated including (at a minimum) the following entries:
                 work_per_kg - compression work [kJ/kg air]
@@ -652,10 +1844,10 @@ class CAES:
         """
 
         # idealized isothermal process
-        s['work_per_kg'] = self.R / self.M * s['T1'] * log(s['p1'] / s['p0'])  # [kJ/kg]
-        s['water_per_kg'] = 0.0  # idealized process - no cooling water [kg/kg air]
-        s['fuel_per_kg'] = 0.0  # isothermal - no heat input [kg/kg air]
-        s['T0'] = s['T1']
+        s.work_per_kg = self.R / self.M * s.T1 * np.log(s.p1 / s.p0)  # [kJ/kg]
+        s.water_per_kg = 0.0  # idealized process - no cooling water [kg/kg air]
+        s.fuel_per_kg = 0.0  # isothermal - no heat input [kg/kg air]
+        s.T0 = s.T1
         return s
 
     def calc_aquifer_dp(self, m_dot):
@@ -668,10 +1860,9 @@ class CAES:
                 p = self.p3
 
             # fluid properties, inputs are degrees K and Pa
-            rho = CP.PropsSI('D', 'T', T, 'P', p * 1e6, self.air)  # density, [kg/m3]
-            mu = CP.PropsSI('V', 'T', T, 'P', p * 1e6,
-                            self.air) * 1000  # Viscosity, convert Pa*s (output) to cP
-            Z = CP.PropsSI('Z', 'T', T, 'P', p * 1e6, self.air)  # gas deviation factor [-]
+            # density [kg/m3], viscosity [Pa*s] and gas deviation factor [-]
+            rho, mu, Z = self.air_props.props(('D', 'V', 'Z'), T, p * 1e6)
+            mu = mu * 1000  # Viscosity, convert Pa*s (output) to cP
 
             Q = m_dot / rho  # radial flow rate [m3/s]
 
@@ -694,8 +1885,7 @@ class CAES:
             p = self.p2
 
         # fluid properties, inputs are degrees K and Pa
-        rho = CP.PropsSI('D', 'T', T, 'P', p * 1e6, self.air)  # density [kg/m3]
-        mu = CP.PropsSI('V', 'T', T, 'P', p * 1e6, self.air)  # viscosity [Pa*s]
+        rho, mu = self.air_props.props(('D', 'V'), T, p * 1e6)  # density [kg/m3] and viscosity [Pa*s]
 
         # pipe diameter
         d = 2 * self.r_w
@@ -726,11 +1916,8 @@ class CAES:
                 p = self.p2
 
             # fluid properties, inputs are degrees K and Pa
-            rho = CP.PropsSI('D', 'T', T, 'P', p * 1e6, self.air)  # density [kg/m3]
-            mu = CP.PropsSI('V', 'T', T, 'P', p * 1e6, self.air)  # viscosity [Pa*s]
-            Pr = CP.PropsSI('PRANDTL', 'T', T, 'P', p * 1e6, self.air)  # viscosity [Pa*s]
-            k = CP.PropsSI('CONDUCTIVITY', 'T', T, 'P', p * 1e6, self.air)  # thermal conductivity [W/m/K]
-            cp = CP.PropsSI('CPMASS', 'T', T, 'P', p * 1e6, self.air)  # thermal conductivity [W/m/K]
+            # density [kg/m3], viscosity [Pa*s], Prandtl number [-], thermal conductivity [W/m/K], heat capacity [J/kg/K]
+            rho, mu, Pr, k, cp = self.air_props.props(('D', 'V', 'PRANDTL', 'CONDUCTIVITY', 'CPMASS'), T, p * 1e6)
 
             # average pipe surface temperature
             avg_depth = self.depth / 2.0
@@ -761,6 +1948,77 @@ class CAES:
             self.dT_pipe_ocean = 0.0
             self.dT_pipe_sub = 0.0
 
+    def calc_losses_array(self, m_dot, T_pipe, p_pipe, T_aquifer, p_aquifer, props=None):
+        """
+        pipe pressure losses, pipe heat transfer and aquifer pressure losses for several time steps (or systems, see
+        BatchCAES) at once, same as calc_pipe_dp, calc_pipe_dT and calc_aquifer_dp
+
+        :param m_dot: mass flow rate, injection (+), release (-) or no flow (0) [kg/s], float or numpy array with the
+                      same flow direction for all entries
+        :param T_pipe: pipe inlet temperature of the previous time steps [K], numpy array
+        :param p_pipe: pipe inlet pressure of the previous time steps [MPa], numpy array
+        :param T_aquifer: aquifer inlet temperature of the previous time steps [K], numpy array
+        :param p_aquifer: aquifer inlet pressure of the previous time steps [MPa], numpy array
+        :param props: air property provider, air_props if None
+        :return: dp_pipe_f [MPa], f [-], dp_pipe_g [MPa], dT_pipe_ocean [K], dT_pipe_sub [K], dp_aquifer [MPa]
+        """
+        if props is None:
+            props = self.air_props
+        injection = np.all(m_dot > 0.0)
+        flow = np.all(m_dot != 0.0)
+        zeros = np.zeros(np.broadcast(m_dot, T_pipe, p_pipe).shape)
+
+        # fluid properties in pipe, density [kg/m3] and viscosity [Pa*s]
+        rho, mu = props.props(('D', 'V'), T_pipe, p_pipe * 1e6)
+
+        # friction
+        if self.include_pipe_dp_friction and flow:
+            dp_pipe_f, f = pipe_fric_dp(epsilon=self.epsilon, d=2 * self.r_w, depth=self.depth, m_dot=m_dot, rho=rho,
+                                        mu=mu)  # [MPa]
+        else:
+            dp_pipe_f, f = zeros, zeros
+
+        # gravity
+        if self.include_pipe_dp_gravity:
+            dp_pipe_g = pipe_grav_dp(m_dot=m_dot, rho=rho, z=self.depth)  # [MPa]
+        else:
+            dp_pipe_g = zeros
+
+        # pipe heat transfer
+        if self.include_pipe_heat_transfer and flow:
+            rho, mu, Pr, k, cp = props.props(('D', 'V', 'PRANDTL', 'CONDUCTIVITY', 'CPMASS'), T_pipe, p_pipe * 1e6)
+            Ts = 273.15 + self.T_grad_m * self.depth / 2.0 + self.T_grad_b  # average pipe surface temperature
+            T = T_pipe
+            for i in range(2):
+                if (i == 0 and injection) or (i == 1 and not injection):
+                    dT_pipe_ocean = pipe_heat_transfer_ocean(r_pipe=self.r_w, depth=self.depth_ocean, t_pipe=self.t_pipe,
+                                                             t_insul=self.t_insul, Tm=T, Ts=self.T_ocean, m_dot=m_dot,
+                                                             k_pipe=self.k_pipe, k_air=k, k_insul=self.k_insul,
+                                                             rho=rho, mu=mu, Pr=Pr, cp=cp, h_ocean=self.h_ocean)
+                    T = T - dT_pipe_ocean
+                else:
+                    dT_pipe_sub = pipe_heat_transfer_subsurface(r_pipe=self.r_w, t_pipe=self.t_pipe, t_cement=self.t_cement,
+                                                                r_rock=self.r_rock, depth=self.depth, Tm=T, Ts=Ts,
+                                                                m_dot=m_dot, k_pipe=self.k_pipe, k_cement=self.k_cement,
+                                                                k_rock=self.k_rock, k_air=k, rho=rho, mu=mu, Pr=Pr,
+                                                                cp=cp)
+                    T = T - dT_pipe_sub
+        else:
+            dT_pipe_ocean, dT_pipe_sub = zeros, zeros
+
+        # aquifer
+        if self.include_aquifer_dp and flow:
+            rho, mu, Z = props.props(('D', 'V', 'Z'), T_aquifer, p_aquifer * 1e6)
+            mu = mu * 1000  # Viscosity, convert Pa*s (output) to cP
+            Q = m_dot / rho  # radial flow rate [m3/s]
+            dp = aquifer_dp(Q=Q, r_f=self.r_f, r_w=self.r_w, k=self.k, mu=mu, h=self.h_plume, p_f=p_aquifer,
+                            T=T_aquifer, Z=Z)  # [MPa]
+            dp_aquifer = np.abs(dp)  # [MPa]
+        else:
+            dp_aquifer = zeros
+
+        return dp_pipe_f, f, dp_pipe_g, dT_pipe_ocean, dT_pipe_sub, dp_aquifer
+
     def plot_overview(self, casename=''):
         df = self.data
         df.loc[:, 'step'] = df.index
@@ -1,9 +1,10 @@
-from CoolProp.CoolProp import PropsSI
+from CoolProp.CoolProp import PT_INPUTS
 from scipy.interpolate import interp1d
 from math import pi
 import pandas as pd
 import numpy as np
 import math
+from .fluid_properties import abstract_state
 
 
 # Specific Speed Chart Inputs
@@ -90,13 +91,15 @@ def size_caes_cmp(p_in=1.01325, t_in=20.0, p_out=10.0, m_dot=2.2, RPM_low=10000,
     # Constants and Fluid Properties
     g = 9.81  # m/s^2
     fluid = 'Air'
-    CP = PropsSI('CPMASS', "T", t_in, "P", p_in, fluid) / 1000.0  # KJ/Kg-K
-    CV = PropsSI('CVMASS', "T", t_in, "P", p_in, fluid) / 1000.0  # KJ/Kg-K
+    state = abstract_state(fluid)  # single flash for all properties
+    state.update(PT_INPUTS, p_in, t_in)
+    CP = state.cpmass() / 1000.0  # KJ/Kg-K
+    CV = state.cvmass() / 1000.0  # KJ/Kg-K
     kappa = CP / CV
-    MW = PropsSI('M', fluid) * 1000.0  # kg/kmol
-    R_bar = PropsSI('GAS_CONSTANT', fluid)  # kJ/kmol/K
+    MW = state.molar_mass() * 1000.0  # kg/kmol
+    R_bar = state.gas_constant()  # kJ/kmol/K
     R = R_bar / MW * 1000.0  # J/kg-K
-    D1 = PropsSI('D', 'T', t_in, 'P', p_in, fluid)  # Density (kg/m3)
+    D1 = state.rhomass()  # Density (kg/m3)
     V1 = m_dot * D1  # m3/s
 
     # Print-out values, if debugging
@@ -0,0 +1,203 @@
+import CoolProp.CoolProp as CP  # http://www.coolprop.org/coolprop/HighLevelAPI.html#propssi-function
+import numpy as np
+from scipy.interpolate import RectBivariateSpline
+from functools import lru_cache
+from math import ceil, log10
+
+# fluid property providers used by CAES for the per time step pressure drop and heat transfer calculations
+#
+# all providers have the same interface:
+#   props(outputs, T, p) -> tuple with one value per output
+#       outputs - tuple of CoolProp output keys, e.g. ('D', 'V', 'Z')
+#       T - temperature [K], float or numpy array
+#       p - pressure [Pa], float or numpy array
+#
+# backends:
+#   'direct' - CoolProp AbstractState flash on every call
+#   'cached' - AbstractState flash memoized on (T, p) rounded to the tolerance
+#   'table'  - bicubic spline tables over the operating envelope, built once per process and shared read-only
+
+TABLE_OUTPUTS = ('D', 'V', 'Z', 'PRANDTL', 'CONDUCTIVITY', 'CPMASS')  # outputs stored in property tables
+TABLE_T_RANGE = (270.0, 700.0)  # temperature envelope of property tables [K]
+TABLE_P_STEP = 10.0e6  # upper pressure of property tables is rounded up to a multiple of this [Pa]
+
+tables = {}  # property tables built by this process, keyed by (fluid, T_range, p_range, tol)
+states = {}  # CoolProp AbstractState handles of this process, keyed by fluid
+parameters = {}  # CoolProp parameter indices, keyed by output
+
+
+def abstract_state(fluid='Air'):
+    """
+    returns the CoolProp AbstractState (HEOS backend) for this fluid, created once per process and reused so that the
+    fluid is only resolved once
+    """
+    if fluid not in states:
+        states[fluid] = CP.AbstractState('HEOS', fluid)
+    return states[fluid]
+
+
+def state_props(state, outputs, T, p):
+    """
+    single flash of an AbstractState at (T, p), then reads all outputs from it
+    :param state: CoolProp AbstractState
+    :param outputs: tuple of CoolProp output keys, e.g. ('D', 'V', 'Z')
+    :param T: temperature [K]
+    :param p: pressure [Pa]
+    :return: tuple with one value per output
+    """
+    state.update(CP.PT_INPUTS, p, T)
+    values = []
+    for output in outputs:
+        if output not in parameters:
+            parameters[output] = CP.get_parameter_index(output)
+        values.append(state.keyed_output(parameters[output]))
+    return tuple(values)
+
+
+class DirectProperties:
+    """
+    fluid properties evaluated with a reusable CoolProp AbstractState on every call (vectorized PropsSI for arrays)
+    """
+
+    def __init__(self, fluid='Air'):
+        self.fluid = fluid  # CoolProp fluid name [-]
+        self.state = abstract_state(fluid)
+
+    def props(self, outputs, T, p):
+        if np.ndim(T) == 0 and np.ndim(p) == 0:
+            return state_props(self.state, outputs, T, p)
+        T, p = np.broadcast_arrays(np.asarray(T, dtype=float), np.asarray(p, dtype=float))
+        # NaN for non-physical states (e.g. unconverged time steps), PropsSI fails if none of the states is valid
+        valid = (np.isfinite(T) & np.isfinite(p) & (T > 0.0) & (p > 0.0)).ravel()
+        values = np.full((T.size, len(outputs)), np.nan)
+        if np.any(valid):
+            values_valid = CP.PropsSI(list(outputs), 'T', T.ravel()[valid], 'P', p.ravel()[valid], self.fluid)
+            values[valid] = np.reshape(values_valid, (np.count_nonzero(valid), len(outputs)))
+        return tuple(values[:, i].reshape(T.shape) for i in range(len(outputs)))
+
+
+@lru_cache(maxsize=2 ** 16)
+def cached_props(fluid, outputs, T, p):
+    return state_props(abstract_state(fluid), outputs, T, p)
+
+
+class CachedProperties(DirectProperties):
+    """
+    fluid properties from CoolProp, memoized on temperature and pressure rounded to the relative tolerance
+    (least recently used entries are dropped once the cache is full)
+    """
+
+    def __init__(self, fluid='Air', tol=1e-6):
+        DirectProperties.__init__(self, fluid)
+        self.digits = max(1, int(ceil(-log10(tol))) + 1)  # significant digits kept in (T, p) [-]
+
+    def props(self, outputs, T, p):
+        if np.ndim(T) == 0 and np.ndim(p) == 0:
+            T = float('%.*g' % (self.digits, T))
+            p = float('%.*g' % (self.digits, p))
+            return cached_props(self.fluid, tuple(outputs), T, p)
+        return DirectProperties.props(self, outputs, T, p)
+
+
+class PropertyTable:
+    """
+    bicubic spline tables of TABLE_OUTPUTS over a rectangular (T, p) envelope
+
+    the grid is refined (intervals doubled in T and p) until the relative error at every cell midpoint is below tol,
+    or the grid reaches n_max points per axis
+    """
+
+    def __init__(self, fluid='Air', T_range=TABLE_T_RANGE, p_range=(1.0e5, 3.0e7), tol=1e-6, n_start=17, n_max=257):
+        self.fluid = fluid
+        self.T_min, self.T_max = T_range
+        self.p_min, self.p_max = p_range
+        self.tol = tol
+
+        n = n_start
+        while True:
+            T = np.linspace(self.T_min, self.T_max, n)
+            p = np.linspace(self.p_min, self.p_max, n)
+            values = self.evaluate(T, p)
+            self.splines = {output: RectBivariateSpline(T, p, values[output], kx=3, ky=3)
+                            for output in TABLE_OUTPUTS}
+
+            # check error at cell midpoints
+            T_mid = 0.5 * (T[1:] + T[:-1])
+            p_mid = 0.5 * (p[1:] + p[:-1])
+            values_mid = self.evaluate(T_mid, p_mid)
+            self.error = max(np.max(np.abs(self.splines[output](T_mid, p_mid) / values_mid[output] - 1.0))
+                             for output in TABLE_OUTPUTS)  # maximum relative error [-]
+            self.n = n  # grid points per axis [-]
+            if self.error < tol or 2 * n - 1 > n_max:
+                break
+            n = 2 * n - 1
+
+        if self.error > tol:
+            print('Warning - property table error (' + str(self.error) + ') exceeds tolerance (' + str(tol) + ')')
+
+    def evaluate(self, T, p):
+        T_grid, p_grid = np.meshgrid(T, p, indexing='ij')
+        values = CP.PropsSI(list(TABLE_OUTPUTS), 'T', T_grid.ravel(), 'P', p_grid.ravel(), self.fluid)
+        return {output: values[:, i].reshape(T_grid.shape) for i, output in enumerate(TABLE_OUTPUTS)}
+
+
+def get_table(fluid, T_range, p_range, tol):
+    """
+    returns the property table for these settings, building it the first time it is requested in this process
+    """
+    key = (fluid, tuple(T_range), tuple(p_range), tol)
+    if key not in tables:
+        tables[key] = PropertyTable(fluid=fluid, T_range=T_range, p_range=p_range, tol=tol)
+    return tables[key]
+
+
+class TabulatedProperties(DirectProperties):
+    """
+    fluid properties interpolated from a shared PropertyTable, CoolProp is used outside of the table envelope or for
+    outputs that are not tabulated
+    """
+
+    def __init__(self, fluid='Air', T_range=TABLE_T_RANGE, p_range=(1.0e5, 3.0e7), tol=1e-6):
+        DirectProperties.__init__(self, fluid)
+        self.table = get_table(fluid, T_range, p_range, tol)
+
+    def props(self, outputs, T, p):
+        table = self.table
+        if any(output not in table.splines for output in outputs):
+            return DirectProperties.props(self, outputs, T, p)
+
+        if np.ndim(T) == 0 and np.ndim(p) == 0:
+            if table.T_min <= T <= table.T_max and table.p_min <= p <= table.p_max:
+                return tuple(float(table.splines[output].ev(T, p)) for output in outputs)
+            return DirectProperties.props(self, outputs, T, p)
+
+        T, p = np.broadcast_arrays(np.asarray(T, dtype=float), np.asarray(p, dtype=float))
+        inside = (table.T_min <= T) & (T <= table.T_max) & (table.p_min <= p) & (p <= table.p_max)
+        values = tuple(table.splines[output].ev(T, p) for output in outputs)
+        if not inside.all():
+            outside = DirectProperties.props(self, outputs, T[~inside], p[~inside])
+            for value, value_outside in zip(values, outside):
+                value[~inside] = value_outside
+        return values
+
+
+def property_backend(backend='direct', fluid='Air', p_max=3.0e7, tol=1e-6):
+    """
+    creates a fluid property provider
+
+    :param backend: 'direct', 'cached' or 'table'
+    :param fluid: CoolProp fluid name
+    :param p_max: highest pressure expected [Pa], for 'table' it is rounded up to a multiple of TABLE_P_STEP so that
+                  systems with similar operating envelopes share the same table
+    :param tol: relative error tolerance for 'cached' and 'table' [-]
+    :return: property provider
+    """
+    if backend == 'direct':
+        return DirectProperties(fluid=fluid)
+    elif backend == 'cached':
+        return CachedProperties(fluid=fluid, tol=tol)
+    elif backend == 'table':
+        p_range = (1.0e5, TABLE_P_STEP * max(1, ceil(p_max / TABLE_P_STEP)))
+        return TabulatedProperties(fluid=fluid, T_range=TABLE_T_RANGE, p_range=p_range, tol=tol)
+    else:
+        raise ValueError("backend must be 'direct', 'cached' or 'table'")
@@ -1,4 +1,5 @@
-from math import pi, exp, log
+import numpy as np
+from math import pi
 
 
 def pipe_heat_transfer_subsurface(r_pipe=0.205, t_pipe=0.01, t_cement=0.0347, r_rock=10.0, depth=1402.35,
@@ -33,54 +34,13 @@ def pipe_heat_transfer_subsurface(r_pipe=0.205, t_pipe=0.01, t_cement=0.0347, r_
 
     :return delta_T: temperature change [K]
     """
-
-    # Reynolds number
-    A = pi / 4.0 * (r_pipe * 2.0) ** 2.0  # pipe cross-sectional area [m^2]
-    U = m_dot / (rho * A)  # velocity [m/s]
-    Re = rho * (r_pipe * 2.0) * abs(U) / mu  # [-]
-
-    # Nusselt Number
-    if Ts > Tm:  # heating
-        n = 0.4
-    else:  # cooling
-        n = 0.3
-    Nu = 0.023 * Re ** (4.0 / 5.0) * Pr ** n  # [-]
-
-    # Heat transfer coefficient
-    h = Nu * k_air / (2 * r_pipe)  # [W/m^2*K]
-
-    # thermal resistance
-    r1 = r_pipe
-    r2 = r_pipe + t_pipe
-    r3 = r_pipe + t_pipe + t_cement
-    r4 = r_pipe + t_pipe + t_cement + r_rock
-    R_pipe_conv = 1 / (2 * pi * r1 * depth * h)
-    R_pipe_cond = log(r2 / r1) / (2 * pi * depth * k_pipe)
-    R_cement_cond = log(r3 / r2) / (2 * pi * depth * k_cement)
-    R_rock_cond = log(r4 / r3) / (2 * pi * depth * k_rock)
-    R_tot = R_pipe_conv + R_pipe_cond + R_cement_cond + R_rock_cond
-    UA = 1 / R_tot
-
-    # heat transfer
-    Tm_out = Ts - (Ts - Tm) * exp(-UA / (abs(m_dot) * cp))
-    delta_T = Tm - Tm_out
-
-    if debug:
-        print('Re      [-] :' + str(Re))
-        print('Nu      [-] :' + str(Nu))
-        print('h  [W/m^-K] :' + str(h))
-        print('R_pipe_conv  [W/m^-K] :' + str(R_pipe_conv))
-        print('R_pipe_cond  [W/m^-K] :' + str(R_pipe_cond))
-        print('R_cement_cond  [W/m^-K] :' + str(R_cement_cond))
-        print('R_rock_cond  [W/m^-K] :' + str(R_rock_cond))
-        print('R_tot  [W/m^-K] :' + str(R_tot))
-        print('UA  [W/m^-K] :' + str(UA))
-        print('Ts      [K] :' + str(Ts))
-        print('Tm_in   [K] :' + str(Tm))
-        print('Tm_out  [K] :' + str(Tm_out))
-        print('delta_T [K] :' + str(delta_T))
-
-    return delta_T
+    inputs = dict(r_pipe=r_pipe, t_pipe=t_pipe, t_cement=t_cement, r_rock=r_rock, depth=depth, Tm=Tm, Ts=Ts,
+                  m_dot=m_dot, k_pipe=k_pipe, k_cement=k_cement, k_rock=k_rock, k_air=k_air, rho=rho, mu=mu, Pr=Pr,
+                  cp=cp)
+    delta_T = pipe_heat_transfer_subsurface_array(debug=debug, **inputs)
+    if any(isinstance(x, np.ndarray) for x in inputs.values()):
+        return delta_T
+    return float(delta_T)
 
 
 def pipe_heat_transfer_ocean(r_pipe=0.205, depth=25.0, t_pipe=0.01, t_insul=0.02,
@@ -117,36 +77,108 @@ def pipe_heat_transfer_ocean(r_pipe=0.205, depth=25.0, t_pipe=0.01, t_insul=0.02
 
     :return delta_T: temperature change [K]
     """
+    inputs = dict(r_pipe=r_pipe, depth=depth, t_pipe=t_pipe, t_insul=t_insul, Tm=Tm, Ts=Ts, m_dot=m_dot,
+                  k_pipe=k_pipe, k_air=k_air, k_insul=k_insul, rho=rho, mu=mu, Pr=Pr, cp=cp, h_ocean=h_ocean)
+    delta_T = pipe_heat_transfer_ocean_array(debug=debug, **inputs)
+    if any(isinstance(x, np.ndarray) for x in inputs.values()):
+        return delta_T
+    return float(delta_T)
 
+
+def pipe_heat_convection(r_pipe, m_dot, Tm, Ts, k_air, rho, mu, Pr):
+    """
+    heat transfer coefficient inside the pipe (Dittus-Boelter), inputs are floats or numpy arrays
+    :return Re: Reynolds number [-]
+    :return Nu: Nusselt number [-]
+    :return h: heat transfer coefficient [W/m^2*K]
+    """
     # Reynolds number
     A = pi / 4.0 * (r_pipe * 2.0) ** 2.0  # pipe cross-sectional area [m^2]
     U = m_dot / (rho * A)  # velocity [m/s]
     Re = rho * (r_pipe * 2.0) * abs(U) / mu  # [-]
 
     # Nusselt Number
-    if Ts > Tm:  # heating
-        n = 0.4
-    else:  # cooling
-        n = 0.3
+    n = np.where(Ts > Tm, 0.4, 0.3)  # heating or cooling
     Nu = 0.023 * Re ** (4.0 / 5.0) * Pr ** n  # [-]
 
-    # Heat transfer coefficient inside pipe
+    # Heat transfer coefficient
     h = Nu * k_air / (2 * r_pipe)  # [W/m^2*K]
+    return Re, Nu, h
+
+
+def pipe_heat_transfer_subsurface_array(r_pipe=0.205, t_pipe=0.01, t_cement=0.0347, r_rock=10.0, depth=1402.35,
+                                        Tm=325.0, Ts=295.0, m_dot=325.0,
+                                        k_pipe=56.7, k_cement=0.72, k_rock=2.90, k_air=0.033242,
+                                        rho=169.11, mu=21.492e-6, Pr=0.79960, cp=1236.8, debug=False):
+    """
+    pipe_heat_transfer_subsurface for numpy arrays, inputs are broadcast together (same units), used by
+    pipe_heat_transfer_subsurface for floats as well
+    :return delta_T: temperature change [K], 0 where there is no flow
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):  # no flow is masked below
+        Re, Nu, h = pipe_heat_convection(r_pipe, m_dot, Tm, Ts, k_air, rho, mu, Pr)
+
+        # thermal resistance
+        r1 = r_pipe
+        r2 = r_pipe + t_pipe
+        r3 = r_pipe + t_pipe + t_cement
+        r4 = r_pipe + t_pipe + t_cement + r_rock
+        R_pipe_conv = 1 / (2 * pi * r1 * depth * h)
+        R_pipe_cond = np.log(r2 / r1) / (2 * pi * depth * k_pipe)
+        R_cement_cond = np.log(r3 / r2) / (2 * pi * depth * k_cement)
+        R_rock_cond = np.log(r4 / r3) / (2 * pi * depth * k_rock)
+        R_tot = R_pipe_conv + R_pipe_cond + R_cement_cond + R_rock_cond
+        UA = 1 / R_tot
+
+        # heat transfer
+        Tm_out = Ts - (Ts - Tm) * np.exp(-UA / (abs(m_dot) * cp))
+    delta_T = np.where(m_dot != 0.0, Tm - Tm_out, 0.0)
+
+    if debug:
+        print('Re      [-] :' + str(Re))
+        print('Nu      [-] :' + str(Nu))
+        print('h  [W/m^-K] :' + str(h))
+        print('R_pipe_conv  [W/m^-K] :' + str(R_pipe_conv))
+        print('R_pipe_cond  [W/m^-K] :' + str(R_pipe_cond))
+        print('R_cement_cond  [W/m^-K] :' + str(R_cement_cond))
+        print('R_rock_cond  [W/m^-K] :' + str(R_rock_cond))
+        print('R_tot  [W/m^-K] :' + str(R_tot))
+        print('UA  [W/m^-K] :' + str(UA))
+        print('Ts      [K] :' + str(Ts))
+        print('Tm_in   [K] :' + str(Tm))
+        print('Tm_out  [K] :' + str(Tm_out))
+        print('delta_T [K] :' + str(delta_T))
+
+    return delta_T
 
-    # thermal resistance
-    r1 = r_pipe
-    r2 = r_pipe + t_pipe
-    r3 = r_pipe + t_pipe + t_insul
-    R_pipe_conv = 1 / (2 * pi * r1 * depth * h)
-    R_pipe_cond = log(r2 / r1) / (2 * pi * depth * k_pipe)
-    R_insul_cond = log(r3 / r2) / (2 * pi * depth * k_insul)
-    R_ocean_conv = 1 / (2 * pi * r3 * depth * h_ocean)
-    R_tot = R_pipe_conv + R_pipe_cond + R_insul_cond + R_ocean_conv
-    UA = 1 / R_tot
-
-    # heat transfer
-    Tm_out = Ts - (Ts - Tm) * exp(-UA / (abs(m_dot) * cp))
-    delta_T = Tm - Tm_out
+
+def pipe_heat_transfer_ocean_array(r_pipe=0.205, depth=25.0, t_pipe=0.01, t_insul=0.02,
+                                   Tm=325.0, Ts=290.0, m_dot=325.0,
+                                   k_pipe=56.7, k_air=0.033242, k_insul=0.46,
+                                   rho=169.11, mu=21.492e-6, Pr=0.79960, cp=1236.8,
+                                   h_ocean=3000, debug=False):
+    """
+    pipe_heat_transfer_ocean for numpy arrays, inputs are broadcast together (same units), used by
+    pipe_heat_transfer_ocean for floats as well
+    :return delta_T: temperature change [K], 0 where there is no flow
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):  # no flow is masked below
+        Re, Nu, h = pipe_heat_convection(r_pipe, m_dot, Tm, Ts, k_air, rho, mu, Pr)
+
+        # thermal resistance
+        r1 = r_pipe
+        r2 = r_pipe + t_pipe
+        r3 = r_pipe + t_pipe + t_insul
+        R_pipe_conv = 1 / (2 * pi * r1 * depth * h)
+        R_pipe_cond = np.log(r2 / r1) / (2 * pi * depth * k_pipe)
+        R_insul_cond = np.log(r3 / r2) / (2 * pi * depth * k_insul)
+        R_ocean_conv = 1 / (2 * pi * r3 * depth * h_ocean)
+        R_tot = R_pipe_conv + R_pipe_cond + R_insul_cond + R_ocean_conv
+        UA = 1 / R_tot
+
+        # heat transfer
+        Tm_out = Ts - (Ts - Tm) * np.exp(-UA / (abs(m_dot) * cp))
+    delta_T = np.where(m_dot != 0.0, Tm - Tm_out, 0.0)
 
     if debug:
         print('Re      [-] :' + str(Re))
@@ -1,9 +1,11 @@
-import pandas as pd
+import numpy as np
 from caes import CAES
-import CoolProp.CoolProp as CP  # http://www.coolprop.org/coolprop/HighLevelAPI.html#propssi-function
+from caes.parameters import derived
 
 
 class ICAES2(CAES):
+    array_perf = True  # charge_perf/discharge_perf accept numpy arrays of time steps, see CAES.update_steps
+
     def get_default_inputs():
         inputs = CAES.get_default_inputs()
 
@@ -50,10 +52,9 @@ class ICAES2(CAES):
         self.depth = inputs['depth']
 
         # fluid properties
-        self.cp = CP.PropsSI('CPMASS', 'T', self.T_atm, 'P', self.p_atm * 1000.0,
-                             'AIR') / 1000.0  # constant pressure specific heat [kJ/kg-K]
-        self.cv = CP.PropsSI('CVMASS', 'T', self.T_atm, 'P', self.p_atm * 1000.0,
-                             'AIR') / 1000.0  # constant volume specific heat [kJ/kg-K]
+        cp, cv = self.air_props.props(('CPMASS', 'CVMASS'), self.T_atm, self.p_atm * 1000.0)
+        self.cp = cp / 1000.0  # constant pressure specific heat [kJ/kg-K]
+        self.cv = cv / 1000.0  # constant volume specific heat [kJ/kg-K]
         self.gamma = self.cp / self.cv  # heat capacity ratio [-]
 
         # machinery - general
@@ -106,20 +107,6 @@ class ICAES2(CAES):
             else:
                 self.delta_p_cmp.append(0.0)
 
-        # multiplier for total pressure ratio to account for interstage pressure drops
-        PR_delta_p_cmp = 1.0
-        for delta_p in self.delta_p_cmp:
-            PR_delta_p_cmp = PR_delta_p_cmp * (1.0 + delta_p)
-
-        # equally divide pressure ratio for each stage, if pressure ratios are unspecified
-        if len(inputs['PR_cmp']) == self.n_stages_cmp:
-            self.PR_cmp = inputs['PR_cmp']
-        else:
-            self.PR_cmp = []
-            PR_equal = (self.p_machine_design / self.p_atm * PR_delta_p_cmp) ** (1. / self.n_stages_cmp)
-            for n in range(self.n_stages_cmp):
-                self.PR_cmp.append(PR_equal)
-
         # -------------------
         # expansion
         # -------------------
@@ -162,22 +149,12 @@ class ICAES2(CAES):
             else:
                 self.delta_p_exp.append(0.0)
 
-        # multiplier for total pressure ratio to account for interstage pressure drops
-        PR_delta_p_exp = 1.0
-        for delta_p in self.delta_p_exp:
-            PR_delta_p_exp = PR_delta_p_exp * (1.0 + delta_p)
-
-        # equally divide pressure ratio for each stage, if pressure ratios are unspecified
-        if len(inputs['PR_exp']) == self.n_stages_exp:
-            self.PR_exp = inputs['PR_exp']
-        else:
-            self.PR_exp = []
-            PR_equal = (self.p_machine_design / self.p_atm * PR_delta_p_exp) ** (1. / self.n_stages_exp)
-            for n in range(self.n_stages_exp):
-                self.PR_exp.append(PR_equal)
+        # pressure ratios, equally divided from p_machine_design if unspecified (see PR_cmp and PR_exp)
+        self.PR_cmp_inputs = inputs['PR_cmp']
+        self.PR_exp_inputs = inputs['PR_exp']
 
         # -------------------
-        # recreate dataframe to store data (with additional entries)
+        # recreate time series buffer to store data (with additional entries)
         # -------------------
         additional_time_series = ['cmp_p_in', 'cmp_T_in', 'exp_p_in', 'exp_T_in']
         stage_entries = ['n', 'w_stg']
@@ -193,7 +170,41 @@ class ICAES2(CAES):
             for entry in state_entries:
                 additional_time_series.append('exp_' + entry + str(n))
         self.attributes_time_series = self.attributes_time_series + additional_time_series
-        self.data = pd.DataFrame(columns=self.attributes_time_series)
+        self.init_time_series()
+
+    @derived('p_machine_design')
+    def PR_cmp(self):
+        """
+        pressure ratio of each compression stage [-]
+        """
+        if len(self.PR_cmp_inputs) == self.n_stages_cmp:
+            return self.PR_cmp_inputs
+
+        # multiplier for total pressure ratio to account for interstage pressure drops
+        PR_delta_p_cmp = 1.0
+        for delta_p in self.delta_p_cmp:
+            PR_delta_p_cmp = PR_delta_p_cmp * (1.0 + delta_p)
+
+        # equally divide pressure ratio for each stage
+        PR_equal = (self.p_machine_design / self.p_atm * PR_delta_p_cmp) ** (1. / self.n_stages_cmp)
+        return [PR_equal for n in range(self.n_stages_cmp)]
+
+    @derived('p_machine_design')
+    def PR_exp(self):
+        """
+        pressure ratio of each expansion stage [-]
+        """
+        if len(self.PR_exp_inputs) == self.n_stages_exp:
+            return self.PR_exp_inputs
+
+        # multiplier for total pressure ratio to account for interstage pressure drops
+        PR_delta_p_exp = 1.0
+        for delta_p in self.delta_p_exp:
+            PR_delta_p_exp = PR_delta_p_exp * (1.0 + delta_p)
+
+        # equally divide pressure ratio for each stage
+        PR_equal = (self.p_machine_design / self.p_atm * PR_delta_p_exp) ** (1. / self.n_stages_exp)
+        return [PR_equal for n in range(self.n_stages_exp)]
 
     def charge_perf(self, s):
         """
@@ -203,7 +214,7 @@ class ICAES2(CAES):
         designed to be updated for each caes architecture
 
         :param:
-            s - pandas series containing performance of current time step and error messages
+            s - TimeStep containing performance of current time step and error messages
         :return:
             s - updated including (at a minimum) the following entries:
                 work_per_kg - compression work [kJ/kg air]
@@ -224,13 +235,10 @@ class ICAES2(CAES):
             PRs = self.PR_cmp
         else:  # self.PR_type == 'free'
             PRs = []
-            p_in_stg = s['p0']
-            p_out_final = s['p1']
+            p_in_stg = s.p0
+            p_out_final = s.p1
             for PR_design in self.PR_cmp:
-                if p_in_stg * PR_design >= p_out_final:
-                    PR = p_out_final / p_in_stg
-                else:
-                    PR = PR_design
+                PR = np.minimum(PR_design, p_out_final / p_in_stg)  # last stage(s) reduced to reach p_out_final
                 PRs.append(PR)
                 # update for next stage
                 p_in_stg = p_in_stg * PR
@@ -238,10 +246,10 @@ class ICAES2(CAES):
         # --------------
         # inlet
         # --------------
-        p_in = s['p0']
-        T_in = s['T0']
-        s['cmp_p_in'] = p_in
-        s['cmp_T_in'] = T_in
+        p_in = s.p0
+        T_in = s.T0
+        s.cmp_p_in = p_in
+        s.cmp_T_in = T_in
 
         # --------------
         # calculate performance for each stage
@@ -255,15 +263,15 @@ class ICAES2(CAES):
             # store results
             # -------------
             # required
-            s['work_per_kg'] = s['work_per_kg'] + w_stg  # [kJ/kg]
-            s['fuel_per_kg'] = 0.0  # near-isothermal - no heat input [kg/kg air]
+            s.work_per_kg = s.work_per_kg + w_stg  # [kJ/kg]
+            s.fuel_per_kg = 0.0  # near-isothermal - no heat input [kg/kg air]
             # additional
-            s['cmp_p_in' + str(n_stg)] = p_in
-            s['cmp_T_in' + str(n_stg)] = T_in
-            s['cmp_n' + str(n_stg)] = n
-            s['cmp_w_stg' + str(n_stg)] = w_stg
-            s['cmp_p_out' + str(n_stg)] = p_out
-            s['cmp_T_out' + str(n_stg)] = T_out
+            setattr(s, 'cmp_p_in' + str(n_stg), p_in)
+            setattr(s, 'cmp_T_in' + str(n_stg), T_in)
+            setattr(s, 'cmp_n' + str(n_stg), n)
+            setattr(s, 'cmp_w_stg' + str(n_stg), w_stg)
+            setattr(s, 'cmp_p_out' + str(n_stg), p_out)
+            setattr(s, 'cmp_T_out' + str(n_stg), T_out)
 
             # -------------
             # inlet state for next stage
@@ -271,7 +279,7 @@ class ICAES2(CAES):
             p_in = p_out * (1.0 - delta_p)
             T_in = T_out
 
-        s['T1'] = T_out
+        s.T1 = T_out
         return s
 
     def discharge_perf(self, s):
@@ -281,7 +289,7 @@ class ICAES2(CAES):
         designed to be updated for each caes architecture
 
         :param:
-            s - pandas series containing performance of current time step and error messages
+            s - TimeStep containing performance of current time step and error messages
         :return:
             s - updated including (at a minimum) the following entries:
                 work_per_kg - compression work [kJ/kg air]
@@ -303,13 +311,10 @@ class ICAES2(CAES):
             PRs = self.PR_exp
         else:  # self.PR_type == 'free'
             PRs = []
-            p_in_stg = s['p1']
-            p_out_final = s['p0']
+            p_in_stg = s.p1
+            p_out_final = s.p0
             for PR_design in self.PR_exp:
-                if p_in_stg / PR_design <= p_out_final:
-                    PR = p_in_stg / p_out_final
-                else:
-                    PR = PR_design
+                PR = np.minimum(PR_design, p_in_stg / p_out_final)  # last stage(s) reduced to reach p_out_final
                 PRs.append(PR)
                 # update for next stage
                 p_in_stg = p_in_stg / PR
@@ -318,16 +323,16 @@ class ICAES2(CAES):
         # inlet
         # --------------
         if self.PR_type == 'free':
-            p_in = s['p1']
+            p_in = s.p1
         else:  # if self.PR_type == 'fixed':
-            p_in = s['p0']
+            p_in = s.p0
             for PR_design in self.PR_exp:
                 p_in = p_in * PR_design  # back-calculate throttle pressure
-            if p_in / 1000.0 > self.p_store:
+            if np.any(p_in / 1000.0 > s.p3):
                 print('expander inlet pressure > storage pressure')
-        T_in = s['T1']
-        s['exp_p_in'] = p_in
-        s['exp_T_in'] = T_in
+        T_in = s.T1
+        s.exp_p_in = p_in
+        s.exp_T_in = T_in
 
         # --------------
         # calculate performance for each stage
@@ -341,15 +346,15 @@ class ICAES2(CAES):
             # store results
             # -------------
             # required
-            s['work_per_kg'] = s['work_per_kg'] + w_stg  # [kJ/kg]
-            s['fuel_per_kg'] = 0.0  # near-isothermal - no heat input [kg/kg air]
+            s.work_per_kg = s.work_per_kg + w_stg  # [kJ/kg]
+            s.fuel_per_kg = 0.0  # near-isothermal - no heat input [kg/kg air]
             # additional
-            s['exp_p_in' + str(n_stg)] = p_in
-            s['exp_T_in' + str(n_stg)] = T_in
-            s['exp_n' + str(n_stg)] = n
-            s['exp_w_stg' + str(n_stg)] = w_stg
-            s['exp_p_out' + str(n_stg)] = p_out
-            s['exp_T_out' + str(n_stg)] = T_out
+            setattr(s, 'exp_p_in' + str(n_stg), p_in)
+            setattr(s, 'exp_T_in' + str(n_stg), T_in)
+            setattr(s, 'exp_n' + str(n_stg), n)
+            setattr(s, 'exp_w_stg' + str(n_stg), w_stg)
+            setattr(s, 'exp_p_out' + str(n_stg), p_out)
+            setattr(s, 'exp_T_out' + str(n_stg), T_out)
 
             # -------------
             # inlet state for next stage
@@ -357,5 +362,5 @@ class ICAES2(CAES):
             p_in = p_out * (1.0 - delta_p)
             T_in = T_out
 
-        s['T0'] = T_out
+        s.T0 = T_out
         return s
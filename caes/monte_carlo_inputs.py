@@ -21,63 +21,20 @@ OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR
 # ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~#
 import pandas as pd
 import numpy as np
+from scipy import stats
+from scipy.stats import qmc
 
 
 # =============================================================================#
 # Create MonteCarlo Inputs
 # =============================================================================#
-def monteCarloInputs(filename, sheetname, iterations):
+def monteCarloInputs(filename, sheetname, iterations, seed=None, method='mc'):
     # Read Excel with inputs
     df_xls = pd.read_excel(filename, sheet_name=sheetname, index_col=0)
 
-    # Create Dataframe to hold inputs
-    rows = range(iterations)
-    parameters1 = df_xls.index.values
-    parameters2 = np.append('sheetname', parameters1)
-    df = pd.DataFrame(data=0.0, index=rows, columns=parameters2)
-
-    # Create Inputs
-    for param in parameters1:
-
-        dist_type = df_xls.loc[param]["Distribution"]
-
-        # Constants
-        if dist_type == "constant" or dist_type == "Constant" or dist_type == "C":
-            avg = df_xls.loc[param]["Average"]
-            df.loc[:][param] = avg
-
-        # Uniform Distributions - specified low and high values
-        elif dist_type == "uniform" or dist_type == "Uniform" or dist_type == "U":
-            low = df_xls.loc[param]["Low"]
-            high = df_xls.loc[param]["High"]
-            df.loc[:][param] = np.random.uniform(low=low, high=high, size=iterations)
-
-        # Uniform Distributions - (+/-) 10 % perturbation from average
-        elif dist_type == "uniform_perturb10" or dist_type == "Uniform_perturb10":
-            low = 0.9 * df_xls.loc[param]["Average"]
-            high = 1.1 * df_xls.loc[param]["Average"]
-            df.loc[:][param] = np.random.uniform(low=low, high=high, size=iterations)
-
-        # Normal Distributions
-        elif dist_type == "normal" or dist_type == "Normal" or dist_type == "N":
-            avg = df_xls.loc[param]["Average"]
-            stdev = df_xls.loc[param]["Stdev"]
-            df.loc[:][param] = np.random.normal(loc=avg, scale=stdev, size=iterations)
-
-        # LogNormal Distributions
-        elif dist_type == "lognormal" or dist_type == "Lognormal" or dist_type == "LN":
-            avg = df_xls.loc[param]["Average"]
-            stdev = df_xls.loc[param]["Stdev"]
-            df.loc[:][param] = np.random.lognormal(mean=avg, sigma=stdev, size=iterations)
-
-        # Traingular Distributions
-        elif dist_type == "triangle" or dist_type == "Triangle" or dist_type == "T":
-            left = df_xls.loc[param]["Low"]
-            mode = df_xls.loc[param]["Average"]
-            right = df_xls.loc[param]["High"]
-            df.loc[:][param] = np.random.triangular(left, mode, right, size=iterations)
-
-    df.loc[:, 'sheetname'] = sheetname
+    # Create Inputs, one row per iteration (see Sampler)
+    df = Sampler(df_xls, seed=seed, method=method).sample(iterations)
+    df.insert(0, 'sheetname', sheetname)
     return df
 
 
@@ -99,3 +56,122 @@ def baselineInputs(filename, sheetname):
 
     s.loc['sheetname'] = sheetname
     return s
+
+
+# =============================================================================#
+# Values of a Distribution at Cumulative Probabilities
+# =============================================================================#
+def distribution_values(spec, u):
+    """
+    inverse cumulative distribution of a parameter, for sampling designs in the unit hypercube (e.g. caes.sensitivity)
+    :param spec: row of the distribution table read by monteCarloInputs (Distribution, Average, Low, High and Stdev)
+    :param u: numpy array of cumulative probabilities, 0 to 1 [-]
+    :return: numpy array of parameter values, same shape as u
+    """
+    u = np.asarray(u, dtype=float)
+    dist_type = spec["Distribution"]
+
+    if dist_type == "constant" or dist_type == "Constant" or dist_type == "C":
+        return spec["Average"] + 0.0 * u
+    elif dist_type == "uniform" or dist_type == "Uniform" or dist_type == "U":
+        return spec["Low"] + u * (spec["High"] - spec["Low"])
+    elif dist_type == "uniform_perturb10" or dist_type == "Uniform_perturb10":
+        return spec["Average"] * (0.9 + 0.2 * u)
+    elif dist_type == "normal" or dist_type == "Normal" or dist_type == "N":
+        return stats.norm.ppf(u, loc=spec["Average"], scale=spec["Stdev"])
+    elif dist_type == "lognormal" or dist_type == "Lognormal" or dist_type == "LN":
+        # Average and Stdev of the underlying normal distribution, as in np.random.lognormal
+        return np.exp(stats.norm.ppf(u, loc=spec["Average"], scale=spec["Stdev"]))
+    elif dist_type == "triangle" or dist_type == "Triangle" or dist_type == "T":
+        left = spec["Low"]
+        mode = spec["Average"]
+        right = spec["High"]
+        return stats.triang.ppf(u, (mode - left) / (right - left), loc=left, scale=right - left)
+    else:
+        raise ValueError('unknown distribution ' + str(dist_type))
+
+
+def is_constant(spec):
+    # True if the parameter of a row of the distribution table does not vary
+    return spec["Distribution"] in ["constant", "Constant", "C"]
+
+
+# =============================================================================#
+# Seeded Sampler of the Distribution Table
+# =============================================================================#
+class Sampler:
+    """
+    draws the inputs of all sites and iterations of a Monte Carlo study as one block, from a distribution table
+    (Distribution, Average, Low, High and Stdev for each parameter, as read by monteCarloInputs) and a seed
+
+    the cumulative probabilities of all rows are drawn at once and mapped to parameter values with distribution_values,
+    so the inputs only depend on the seed, not on how the rows are later split between workers
+
+    methods:
+        'mc'     - independent random draws
+        'lhs'    - Latin hypercube, stratified over the iterations of each site
+        'sobol'  - scrambled Sobol sequence, each site takes the next block of iterations (balanced if iterations is a
+                   power of 2)
+    """
+
+    def __init__(self, distributions, seed=None, method='mc'):
+        """
+        :param distributions: pandas DataFrame of distributions, one row per parameter
+        :param seed: seed (int) or numpy.random.Generator
+        :param method: 'mc', 'lhs' or 'sobol'
+        """
+        if method not in ['mc', 'lhs', 'sobol']:
+            raise ValueError("method must be 'mc', 'lhs' or 'sobol'")
+        self.distributions = distributions
+        self.rng = np.random.default_rng(seed)
+        self.method = method
+        self.variables = [param for param in distributions.index if not is_constant(distributions.loc[param])]
+
+    def unit(self, sites, iterations):
+        """
+        :return: numpy array of cumulative probabilities, shape (sites, iterations, variables) [-]
+        """
+        shape = (sites, iterations, len(self.variables))
+        if self.method == 'mc':
+            return self.rng.random(shape)
+        elif self.method == 'lhs':
+            strata = np.argsort(self.rng.random(shape), axis=1)  # random permutation of the iterations
+            return (strata + self.rng.random(shape)) / iterations
+        else:
+            return qmc.Sobol(d=len(self.variables), scramble=True, seed=self.rng).random(sites * iterations).reshape(
+                shape)
+
+    def sample(self, iterations, sites=None, site_values=None):
+        """
+        :param iterations: draws per site [-]
+        :param sites: pandas DataFrame, one row per site, its columns are repeated for each iteration (None for a
+                      single site without site data)
+        :param site_values: dictionary of site specific distribution entries, {parameter: {entry: numpy array with one
+                            value per site}}, e.g. {'depth_m': {'Low': 0.9 * depth, 'High': 1.1 * depth}}, the other
+                            entries are taken from the distribution table
+        :return: df - pandas DataFrame, one row per site and iteration (site by site), with the columns site and
+                 iteration and the columns of sites (if given), and one column per parameter
+        """
+        n_sites = 1 if sites is None else len(sites)
+        U = self.unit(n_sites, iterations).reshape(n_sites * iterations, len(self.variables))
+
+        if sites is None:
+            df = pd.DataFrame(index=range(iterations))
+        else:
+            df = sites.iloc[np.repeat(np.arange(n_sites), iterations)].reset_index()
+            df = df.rename(columns={df.columns[0]: 'site'})
+            df.insert(1, 'iteration', np.tile(np.arange(iterations), n_sites))
+
+        # Create Inputs
+        site_values = {} if site_values is None else site_values
+        values = {}
+        for param in self.distributions.index:
+            spec = self.distributions.loc[param].to_dict()
+            for entry, value in site_values.get(param, {}).items():
+                spec[entry] = np.repeat(np.asarray(value, dtype=float), iterations)
+            if param in self.variables:
+                u = U[:, self.variables.index(param)]
+            else:
+                u = np.zeros(n_sites * iterations)
+            values[param] = distribution_values(spec, u)
+        return pd.concat([df, pd.DataFrame(values, index=df.index)], axis=1)
@@ -0,0 +1,109 @@
+import numpy as np
+
+# dependency tracked parameters of CAES systems
+#
+#   Input   - attribute set from the inputs (e.g. depth, k, phi), setting a different value clears the cached derived
+#             parameters that depend on it, directly or through other derived parameters
+#   derived - decorator for a method that computes a derived parameter (e.g. p_store_max, V, p_machine_design), it is
+#             computed on first access and then stored on the instance like a normal attribute
+#
+# example:
+#     class Storage:
+#         depth = Input()  # [m]
+#
+#         @derived('depth')
+#         def p_store_min(self):
+#             return 10.0 * self.depth * 1e-3  # [MPa]
+#
+# changing depth only clears p_store_min and the parameters that depend on it, everything else stays cached
+
+dependents_cache = {}  # transitive dependents, keyed by (class, parameter name)
+
+
+class Input:
+    """
+    input attribute, setting a different value clears the cached derived parameters that depend on it
+    """
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        try:
+            return obj.__dict__[self.name]
+        except KeyError:
+            raise AttributeError(self.name)
+
+    def __set__(self, obj, value):
+        values = obj.__dict__
+        if self.name in values and same_value(values[self.name], value):
+            values[self.name] = value
+            return
+        values[self.name] = value
+        for name in dependents(type(obj), self.name):
+            values.pop(name, None)
+
+
+class derived:
+    """
+    decorator for a cached derived parameter
+    :param depends_on: names of the inputs and derived parameters used by the decorated method
+    """
+
+    def __init__(self, *depends_on):
+        self.depends_on = depends_on
+
+    def __call__(self, func):
+        self.func = func
+        self.__doc__ = func.__doc__
+        return self
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        value = self.func(obj)
+        obj.__dict__[self.name] = value  # cached, found before this (non-data) descriptor from now on
+        return value
+
+
+def same_value(old, new):
+    # True if a new input value does not change the derived parameters (scalars only, arrays always count as changed)
+    if old is new:
+        return True
+    if np.ndim(old) == 0 and np.ndim(new) == 0:
+        try:
+            return bool(old == new)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def dependents(cls, name):
+    """
+    :return: names of the derived parameters of cls that depend on parameter name, directly or indirectly
+    """
+    key = (cls, name)
+    if key not in dependents_cache:
+        parameters = {}
+        for base in reversed(cls.__mro__):
+            for attribute, value in vars(base).items():
+                if isinstance(value, derived):
+                    parameters[attribute] = value.depends_on
+                elif attribute in parameters:  # overridden by a plain attribute or method
+                    del parameters[attribute]
+
+        found = []
+        stack = [name]
+        while stack:
+            parameter = stack.pop()
+            for attribute, depends_on in parameters.items():
+                if parameter in depends_on and attribute not in found:
+                    found.append(attribute)
+                    stack.append(attribute)
+        dependents_cache[key] = found
+    return dependents_cache[key]
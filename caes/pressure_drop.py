@@ -1,4 +1,5 @@
-from math import log, log10, pi
+import numpy as np
+from math import log, pi
 
 
 def aquifer_dp(Q=1, r_f=100.0, r_w=0.25, k=100, mu=0.5, h=40.0, p_f=10.0, T=298.15, Z=1.0):
@@ -10,56 +11,81 @@ def aquifer_dp(Q=1, r_f=100.0, r_w=0.25, k=100, mu=0.5, h=40.0, p_f=10.0, T=298.
     # K - permeability[mD]
     # Mu - viscosity[cP]
     # Z - gas deviation factor[-]
+    # inputs may be floats or numpy arrays (broadcast together, see aquifer_dp_array)
     """
-    quantity = p_f ** 2.0 - Q * mu * T * Z * log(r_f / r_w) / (8.834 * 10.0 ** -3.0 * k * h)
-    if quantity > 0.0:
-        delta_p = p_f - quantity ** 0.5
-    else:
-        delta_p = 1e12 # would have been a complex number, make pressure drop extremely large
-        print('Warning - Very large aquifer pressure drop')
-
-    return delta_p
+    delta_p = aquifer_dp_array(Q=Q, r_f=r_f, r_w=r_w, k=k, mu=mu, h=h, p_f=p_f, T=T, Z=Z)
+    if any(isinstance(x, np.ndarray) for x in (Q, r_f, r_w, k, mu, h, p_f, T, Z)):
+        return delta_p
+    return float(delta_p)
 
 
-def friction_coeff(Re=1000.0, epsilon=0.002 * 1e-3, d=1.06):
+def aquifer_dp_array(Q=1, r_f=100.0, r_w=0.25, k=100, mu=0.5, h=40.0, p_f=10.0, T=298.15, Z=1.0):
     """
-
-    :param Re: Reynolds number [-]
-    :param epsilon: Pipe roughness [m]
-    :param d: Pipe diameter [m]
-    :return f: friction coefficient [-]
+    aquifer_dp for numpy arrays, inputs are broadcast together (same units as aquifer_dp), used by aquifer_dp for
+    floats as well
+    :return delta_p: pressure drop [MPa], 1e12 where infeasible
     """
-    if Re == 0.0:
-        f = 0.0
-    elif Re <= 4000:  # laminar flow
-        f = 64.0 / Re
+    quantity = p_f ** 2.0 - Q * mu * T * Z * np.log(r_f / r_w) / (8.834 * 10.0 ** -3.0 * k * h)
+    feasible = quantity > 0.0
+    delta_p = np.where(feasible, p_f - np.where(feasible, quantity, 0.0) ** 0.5, 1e12)  # [MPa]
+    if not feasible.all():  # would have been a complex number, pressure drop made extremely large
+        if np.ndim(feasible) == 0:  # floats
+            print('Warning - Very large aquifer pressure drop')
+        else:
+            print('Warning - Very large aquifer pressure drop (' + str(np.size(feasible) - np.count_nonzero(feasible))
+                  + ' entries)')
 
-    else:  # turbulent flow
-        # allowable calculation error
-        error = 1e-6
+    return delta_p
 
-        # initial friction factor values
-        f = 0.01  # initial guess
 
-        # initial values
-        LHS = 1.0
-        RHS = 0.0
+def friction_coeff(Re=1000.0, epsilon=0.002 * 1e-3, d=1.06, tol=1e-12, max_iter=10):
+    """
+    friction coefficient, laminar (Re <= 4000) or turbulent from the Colebrook-White equation
 
-        while abs(LHS - RHS) > error:
-            # f_guess = f_calc  # update guess
-            # a =
-            # f_calc = (1 / a) ** 2  # calculate new value
+    Colebrook-White is solved for x = 1/f^0.5 with Newton's method, starting from the explicit Swamee-Jain estimate
+    (converges in 1 to 2 iterations, at most max_iter)
 
-            LHS = 1 / (f ** 0.5)
-            RHS = -2.0 * log10((epsilon / d) / 3.7 + 2.51 / (Re * f ** 0.5))
-            f = (1 / RHS) ** 2  # calculate new value
+    :param Re: Reynolds number [-], float or numpy array
+    :param epsilon: Pipe roughness [m], float or numpy array
+    :param d: Pipe diameter [m], float or numpy array
+    :param tol: relative change in x to stop at [-]
+    :param max_iter: maximum number of Newton iterations [-]
+    :return f: friction coefficient [-], float or numpy array (Re, epsilon and d broadcast together)
+    """
+    f = friction_coeff_array(Re, epsilon, d, tol, max_iter)
+    if isinstance(Re, np.ndarray) or isinstance(epsilon, np.ndarray) or isinstance(d, np.ndarray):
+        return f
+    return float(f)
+
+
+def friction_coeff_array(Re, epsilon, d, tol=1e-12, max_iter=10):
+    """
+    friction_coeff for numpy arrays (broadcast together), used by friction_coeff for floats as well
+    """
+    Re = np.asarray(Re, dtype=float)
+
+    # turbulent flow
+    turbulent = Re > 4000
+    Re_t = np.where(turbulent, Re, 1.0e5)  # [-] (placeholder where laminar or no flow)
+    a = (epsilon / d) / 3.7
+    b = 2.51 / Re_t
+    x = -2.0 * np.log10(a + 5.74 / Re_t ** 0.9)  # Swamee-Jain estimate of 1/f^0.5
+    for i in range(max_iter):
+        y = a + b * x
+        dx = (x + 2.0 * np.log10(y)) / (1.0 + 2.0 / log(10.0) * b / y)  # Newton step
+        x = x - dx
+        if (np.abs(dx) <= tol * x).all():
+            break
+
+    # laminar flow, 0 for no flow
+    f = np.where(turbulent, 1.0 / x ** 2.0, 64.0 / np.where(Re > 0.0, Re, np.inf))
 
     return f
 
 
 def pipe_fric_dp(epsilon=0.002 * 1.0e-3, d=1.06, depth=950, m_dot=10.0, rho=172, mu=18.37e-6):
     """
-    Assumes constant density
+    Assumes constant density, inputs can be floats or numpy arrays (broadcast together)
     :param epsilon: roughness [m]
     :param d: pipe diameter [m]
     :param depth: well depth / pipe length [m]
@@ -72,25 +98,20 @@ def pipe_fric_dp(epsilon=0.002 * 1.0e-3, d=1.06, depth=950, m_dot=10.0, rho=172,
     # gravitational constant
     g = 9.81  # [m/s^2]
 
-    if abs(m_dot) == 0.0:  # no flow
-        delta_p = 0.0
-        f = 0.0
-    else:
-
-        # velocity
-        A = pi / 4.0 * d ** 2.0  # pipe cross-sectional area [m^2]
-        U = m_dot / (rho * A)  # velocity [m/s]
+    # velocity
+    A = pi / 4.0 * d ** 2.0  # pipe cross-sectional area [m^2]
+    U = m_dot / (rho * A)  # velocity [m/s]
 
-        # Reynolds number
-        Re = rho * d * abs(U) / mu
+    # Reynolds number
+    Re = rho * d * abs(U) / mu
 
-        f = friction_coeff(Re=Re, epsilon=epsilon, d=d)
+    f = friction_coeff(Re=Re, epsilon=epsilon, d=d)  # 0 for no flow
 
-        # head loss
-        h = f * depth / d * U ** 2.0 / (2.0 * g)
+    # head loss
+    h = f * depth / d * U ** 2.0 / (2.0 * g)
 
-        # pressure drop
-        delta_p = rho * g * h
+    # pressure drop
+    delta_p = rho * g * h
 
     return delta_p * 1.0e-6, f  # convert from Pa to MPa
 
@@ -107,11 +128,9 @@ def pipe_grav_dp(m_dot=10.0, rho=115.0, z=950.0):
     # gravitational constant
     g = 9.81  # [m/s^2]
 
-    if m_dot > 0.0:  # injection
-        delta_p = -rho * g * z
-    elif m_dot < 0.0:  # withdrawl
-        delta_p = rho * g * z
-    else:  # no activity
-        delta_p = -rho * g * z
+    # (+) for withdrawl, (-) for injection or no activity
+    delta_p = np.where(np.asarray(m_dot) < 0.0, rho * g * z, -rho * g * z)
+    if np.ndim(delta_p) == 0:  # floats
+        delta_p = float(delta_p)
 
     return delta_p * 1.0e-6  # convert from Pa to MPa
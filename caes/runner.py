@@ -0,0 +1,408 @@
+import os
+import glob
+import sqlite3
+import tempfile
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from .icaes2 import ICAES2
+from .batch import run_single_cycles, default_inputs, performance_entries
+
+# chunked, checkpointed runner for studies with many input rows (e.g. Monte Carlo or GIS sites)
+#
+# the inputs are split into chunks that are run in a process pool of long-lived workers (see init_worker), each
+# finished chunk is appended to a results store right away, with the inputs of each row and its input hash (a hash of
+# the input values). When a stopped job is started again, rows whose input hash is already in the store are skipped,
+# so only the unfinished chunks are run
+#
+# with n_jobs > 1 the inputs and results are kept in shared arrays with a fixed column schema (see ArrayFrames), workers
+# read their input rows and write their results to their row slots, only row positions and text results (e.g.
+# error_msg) are sent between processes
+#
+# results stores:
+#   'sqlite'  - table 'results' of an SQLite database file (standard library)
+#   'parquet' - Parquet dataset (directory), one file per chunk (requires pyarrow)
+#
+# example:
+#   runner = Runner(store='sqlite', filename='uncertainty_results.sqlite', chunk=500, n_jobs=8)
+#   results = runner.run(mc_inputs)  # run again after a failure to finish the remaining chunks
+
+
+def input_hashes(df):
+    """
+    :return: pandas Series of the hash of the input values of each row of df (hexadecimal strings), the same in every
+             run and independent of the row labels
+    """
+    hashes = pd.util.hash_pandas_object(df, index=False).values
+    return pd.Series([format(value, '016x') for value in hashes], index=df.index)
+
+
+class SQLiteStore:
+    """
+    appends each chunk of results to a table of an SQLite database
+    :param filename: database file
+    :param table: table name
+    """
+
+    def __init__(self, filename, table='results'):
+        self.filename = filename
+        self.table = table
+
+    def columns(self, con):
+        return [row[1] for row in con.execute('PRAGMA table_info("' + self.table + '")')]
+
+    def completed(self):
+        if not os.path.exists(self.filename):
+            return set()
+        with sqlite3.connect(self.filename) as con:
+            if 'input_hash' not in self.columns(con):
+                return set()
+            return set(row[0] for row in con.execute('SELECT input_hash FROM "' + self.table + '"'))
+
+    def write(self, df):
+        con = sqlite3.connect(self.filename)
+        try:
+            with con:  # one transaction, a chunk is either stored completely or not at all
+                columns = self.columns(con)
+                if len(columns) > 0:
+                    for column in df.columns:
+                        if column not in columns:  # e.g. results missing from the first chunk
+                            con.execute('ALTER TABLE "' + self.table + '" ADD COLUMN "' + str(column) + '"')
+                df.to_sql(self.table, con, if_exists='append', index=False)
+        finally:
+            con.close()
+
+    def read(self):
+        if not os.path.exists(self.filename):
+            return pd.DataFrame(columns=['input_hash'])
+        with sqlite3.connect(self.filename) as con:
+            if len(self.columns(con)) == 0:
+                return pd.DataFrame(columns=['input_hash'])
+            return pd.read_sql('SELECT * FROM "' + self.table + '"', con)
+
+
+class ParquetStore:
+    """
+    writes each chunk of results to its own file of a Parquet dataset (directory)
+    :param path: dataset directory
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def part_files(self):
+        return sorted(glob.glob(os.path.join(self.path, 'part-*.parquet')))
+
+    def completed(self):
+        hashes = set()
+        for filename in self.part_files():
+            hashes.update(pd.read_parquet(filename, columns=['input_hash'], engine='pyarrow')['input_hash'])
+        return hashes
+
+    def write(self, df):
+        os.makedirs(self.path, exist_ok=True)
+        filename = os.path.join(self.path, 'part-' + str(len(self.part_files())).zfill(6) + '.parquet')
+        df.to_parquet(filename + '.tmp', engine='pyarrow', index=False)
+        os.replace(filename + '.tmp', filename)  # complete files only
+
+    def read(self):
+        filenames = self.part_files()
+        if len(filenames) == 0:
+            return pd.DataFrame(columns=['input_hash'])
+        return pd.concat([pd.read_parquet(filename, engine='pyarrow') for filename in filenames], ignore_index=True)
+
+
+def results_store(store='sqlite', filename='results.sqlite'):
+    """
+    creates a results store
+    :param store: 'sqlite' or 'parquet'
+    :param filename: SQLite database file or Parquet dataset directory
+    :return: results store
+    """
+    if store == 'sqlite':
+        return SQLiteStore(filename)
+    elif store == 'parquet':
+        return ParquetStore(filename)
+    else:
+        raise ValueError("store must be 'sqlite' or 'parquet'")
+
+
+class SharedArray:
+    """
+    2D float array that worker processes attach to instead of receiving a copy
+    :param shape: (rows, columns)
+    :param kind: 'shared' - multiprocessing.shared_memory block (Python >= 3.8), 'memmap' - memory mapped file
+    :param filename: file of a 'memmap' array
+    """
+
+    def __init__(self, shape, kind='shared', filename=None):
+        self.shape = tuple(shape)
+        self.kind = kind
+        size = max(1, 8 * self.shape[0] * self.shape[1])  # [bytes]
+        if kind == 'shared':
+            from multiprocessing import shared_memory  # Python >= 3.8
+            self.buffer = shared_memory.SharedMemory(create=True, size=size)
+            self.name = self.buffer.name
+            self.array = np.ndarray(self.shape, dtype=float, buffer=self.buffer.buf)
+        elif kind == 'memmap':
+            self.name = filename
+            self.array = np.memmap(filename, dtype=float, mode='w+', shape=self.shape)
+        else:
+            raise ValueError("kind must be 'shared' or 'memmap'")
+        self.owner = True  # created by this process, removed by close
+
+    def __getstate__(self):
+        # sent to a process by name (e.g. spawn start method), the array is attached, not copied
+        return {'shape': self.shape, 'kind': self.kind, 'name': self.name}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.owner = False
+        if self.kind == 'shared':
+            from multiprocessing import shared_memory
+            self.buffer = shared_memory.SharedMemory(name=self.name)
+            self.array = np.ndarray(self.shape, dtype=float, buffer=self.buffer.buf)
+        else:
+            self.array = np.memmap(self.name, dtype=float, mode='r+', shape=self.shape)
+
+    def close(self):
+        self.array = None
+        if self.kind == 'shared':
+            self.buffer.close()
+            if self.owner:
+                self.buffer.unlink()
+        elif self.owner:
+            os.remove(self.name)
+
+
+class ArrayFrames:
+    """
+    inputs and results of a study in shared arrays with a fixed column schema: numeric input columns and the result
+    columns (outputs) are float arrays with one row slot per input row, other input columns (e.g. names) are sent to
+    each worker once. Results that are 'true' / 'false' (e.g. errors) are stored as 1 / 0, other non-numeric results
+    (e.g. error_msg) are returned by write_results to be sent back with the row positions
+
+    :param inputs: pandas DataFrame of inputs
+    :param outputs: result columns
+    :param kind: 'shared' or 'memmap' (see SharedArray)
+    :param path: directory of the 'memmap' files, a temporary directory if None
+    """
+
+    def __init__(self, inputs, outputs, kind='shared', path=None):
+        self.columns = list(inputs.columns)
+        self.numeric = [column for column in self.columns if inputs[column].dtype.kind in 'iuf']
+        self.dtypes = {column: inputs[column].dtype for column in self.numeric}
+        self.other = inputs[[column for column in self.columns if column not in self.numeric]]
+        self.index = inputs.index
+        self.outputs = list(outputs)
+
+        filenames = [None, None]
+        self.temporary_path = None  # removed by close
+        if kind == 'memmap':
+            if path is None:
+                path = tempfile.mkdtemp()
+                self.temporary_path = path
+            filenames = [os.path.join(path, 'inputs-' + str(os.getpid()) + '.dat'),
+                         os.path.join(path, 'results-' + str(os.getpid()) + '.dat')]
+        self.inputs = SharedArray((len(inputs), len(self.numeric)), kind=kind, filename=filenames[0])
+        self.inputs.array[:] = inputs[self.numeric].values
+        self.results = SharedArray((len(inputs), len(self.outputs)), kind=kind, filename=filenames[1])
+        self.results.array[:] = np.nan
+
+    def input_frame(self, rows):
+        """
+        :return: pandas DataFrame of the inputs at these row positions, same columns and dtypes as the inputs
+        """
+        df = pd.DataFrame(self.inputs.array[rows], index=self.index[rows], columns=self.numeric).astype(self.dtypes)
+        for column in self.other.columns:
+            df[column] = self.other[column].values[rows]
+        return df[self.columns]
+
+    def write_results(self, rows, results):
+        """
+        writes the results of the inputs at these row positions (pandas DataFrame, same order) to their row slots
+        :return: pandas DataFrame of the non-numeric results that are not result columns (e.g. error_msg)
+        """
+        for j, output in enumerate(self.outputs):
+            if output in results.columns:
+                values = results[output]
+                if values.dtype.kind not in 'iufb':
+                    flags = values.astype(str).str.lower().map({'true': 1.0, 'false': 0.0})
+                    values = flags.where(flags.notna(), pd.to_numeric(values, errors='coerce'))
+                self.results.array[rows, j] = np.asarray(values, dtype=float)
+        return results[[column for column in results.columns
+                        if column not in self.outputs and results[column].dtype.kind not in 'iufb']]
+
+    def result_frame(self, rows):
+        """
+        :return: pandas DataFrame of the results at these row positions, errors as 'true' / 'false'
+        """
+        df = pd.DataFrame(np.array(self.results.array[rows]), index=self.index[rows], columns=self.outputs)
+        if 'errors' in df.columns:
+            df['errors'] = np.where(df['errors'] == 0.0, 'false', 'true')
+        return df
+
+    def close(self):
+        self.inputs.close()
+        self.results.close()
+        if self.temporary_path is not None:
+            os.rmdir(self.temporary_path)
+
+
+def run_chunk(func, df, kwargs):
+    # results of a chunk, with its inputs and input hashes (results take precedence for columns in both)
+    results = func(df.drop(columns=['input_hash']), **kwargs)
+    inputs = df.drop(columns=[column for column in df.columns if column in results.columns])
+    return pd.concat([inputs, results], axis=1)
+
+
+worker = {}  # state of a worker process of Runner, see init_worker
+
+
+def init_worker(func, kwargs, inputs):
+    """
+    initializer of the worker processes of Runner, run once per process. Keeps the function and the inputs (pandas
+    DataFrame or ArrayFrames) for the tasks, which are only row positions (see run_rows), and preloads what all systems
+    of the process share so that it is not rebuilt per task: the default inputs of the model (see default_inputs), and
+    the CoolProp states of air and water and, for the 'table' backend, the air property table, from a system of the
+    first input row
+    """
+    worker['func'] = func
+    worker['kwargs'] = kwargs
+    worker['inputs'] = inputs
+
+    model = kwargs.get('model', ICAES2)
+    system_inputs = default_inputs(model).copy()
+    if len(inputs.index) > 0:
+        first = inputs.input_frame([0]) if isinstance(inputs, ArrayFrames) else inputs.iloc[[0]]
+        for entry in first.columns:
+            if entry in system_inputs.index:
+                system_inputs[entry] = first[entry].iloc[0]
+    try:
+        model(inputs=system_inputs).air_props
+    except Exception:  # preloading is optional, errors are left to the tasks
+        pass
+
+
+def run_rows(rows):
+    # task of a worker process: results of the input rows at these positions, written to their row slots for
+    # ArrayFrames (only the positions and the text results are returned)
+    inputs = worker['inputs']
+    if isinstance(inputs, ArrayFrames):
+        return rows, inputs.write_results(rows, worker['func'](inputs.input_frame(rows), **worker['kwargs']))
+    return run_chunk(worker['func'], inputs.iloc[rows], worker['kwargs'])
+
+
+class Runner:
+    """
+    runs a DataFrame of inputs in chunks with a process pool and stores each finished chunk, skipping the rows that
+    are already stored
+    """
+
+    def __init__(self, func=run_single_cycles, store='sqlite', filename='results.sqlite', chunk=1000, n_jobs=1,
+                 arrays='shared', outputs=performance_entries, path=None, verbose=True, **kwargs):
+        """
+        :param func: function of a chunk of inputs (pandas DataFrame) returning a DataFrame of results with the same
+                     index, e.g. run_single_cycles, must be defined at module level to be used with n_jobs > 1
+        :param store: results store, 'sqlite' or 'parquet'
+        :param filename: SQLite database file or Parquet dataset directory
+        :param chunk: rows per chunk [-]
+        :param n_jobs: number of processes, 1 runs in this process [-]
+        :param arrays: inputs and results of the processes, 'shared' or 'memmap' arrays (see ArrayFrames) or None
+                       (inputs sent to each process, results of each chunk sent back)
+        :param outputs: result columns stored with arrays, other numeric results are dropped, other text results
+                        (e.g. error_msg) are kept (default: entries of analyze_performance)
+        :param path: directory of the 'memmap' arrays, e.g. node-local scratch (temporary directory if None)
+        :param verbose: print progress [Boolean]
+        :param kwargs: keyword arguments of func, e.g. model=ICAES
+        """
+        self.func = func
+        self.store = results_store(store, filename)
+        self.chunk = chunk
+        self.n_jobs = n_jobs
+        self.arrays = arrays
+        self.outputs = list(outputs)
+        self.path = path
+        self.verbose = verbose
+        self.kwargs = kwargs
+
+    def chunks(self, df):
+        """
+        :return: df with the column input_hash, and a list of the row positions of each chunk of df that is not
+                 stored yet
+        """
+        df = df.copy()
+        df['input_hash'] = input_hashes(df)
+        completed = self.store.completed()
+        remaining = np.flatnonzero(~df['input_hash'].isin(completed).values)
+        return df, [remaining[start:start + self.chunk] for start in range(0, len(remaining), self.chunk)]
+
+    def run(self, df):
+        """
+        runs the rows of df that are not stored yet. If a chunk fails, the chunks that are not started yet are
+        cancelled, the chunks that finish are stored and then the error is raised
+        :param df: pandas DataFrame of inputs, one row per case
+        :return: results - pandas DataFrame of the stored inputs and results of each row of df, same index as df
+        """
+        inputs, chunks = self.chunks(df)
+        if self.verbose:
+            print('Runner: ' + str(len(chunks)) + ' chunks to run (' + str(sum(len(c) for c in chunks)) + ' of ' +
+                  str(len(df)) + ' rows)')
+
+        if self.n_jobs == 1:
+            for i, chunk in enumerate(chunks):
+                self.store.write(run_chunk(self.func, inputs.iloc[chunk], self.kwargs))
+                if self.verbose:
+                    print('Runner: chunk ' + str(i + 1) + ' of ' + str(len(chunks)) + ' stored')
+        elif len(chunks) > 0:
+            # the inputs are sent to (or shared with) each worker once, tasks are the row positions of a chunk
+            frames = None
+            if self.arrays is not None:
+                frames = ArrayFrames(inputs.drop(columns=['input_hash']), self.outputs, kind=self.arrays,
+                                     path=self.path)
+            try:
+                with ProcessPoolExecutor(max_workers=self.n_jobs, initializer=init_worker,
+                                         initargs=(self.func, self.kwargs, inputs if frames is None else frames)) \
+                        as executor:
+                    futures = [executor.submit(run_rows, chunk) for chunk in chunks]
+                    error = None  # first error of a chunk, raised once the finished chunks are stored
+                    stored = 0  # chunks stored [-]
+                    for future in as_completed(futures):  # in the order finished
+                        if future.cancelled():
+                            continue
+                        if future.exception() is not None:
+                            if error is None:
+                                error = future.exception()
+                                for pending in futures:  # chunks not started yet are not run
+                                    pending.cancel()
+                            continue
+                        if frames is None:
+                            self.store.write(future.result())
+                        else:
+                            rows, text = future.result()
+                            results = pd.concat([frames.result_frame(rows), text], axis=1)
+                            chunk_inputs = inputs.iloc[rows]
+                            self.store.write(pd.concat([chunk_inputs.drop(columns=[column for column in results.columns
+                                                                                   if column in chunk_inputs.columns]),
+                                                        results], axis=1))
+                        stored = stored + 1
+                        if self.verbose:
+                            print('Runner: chunk ' + str(stored) + ' of ' + str(len(chunks)) + ' stored')
+                    if error is not None:
+                        raise error
+            finally:
+                if frames is not None:
+                    frames.close()
+
+        return self.results(df)
+
+    def results(self, df):
+        """
+        :return: pandas DataFrame of the stored inputs and results of each row of df, same index as df (NaN for rows
+                 that are not stored)
+        """
+        stored = self.store.read().drop_duplicates('input_hash').set_index('input_hash')
+        hashes = input_hashes(df)
+        results = stored.reindex(hashes.values)
+        results.index = df.index
+        return results
@@ -0,0 +1,220 @@
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from scipy.stats import qmc
+from .icaes2 import ICAES2
+from .batch import run_single_cycles
+from .monte_carlo_inputs import distribution_values, is_constant
+
+# global sensitivity analysis of single cycle outputs to the uncertain inputs of a distribution table (the table read
+# by monteCarloInputs, one row per input with Distribution, Average, Low, High and Stdev)
+#
+#   sobol  - first order (S1) and total (ST) Sobol indices from a Saltelli design, with bootstrap confidence intervals
+#   morris - elementary effects (mu, mu_star, sigma) from Morris trajectories, a cheaper screening of many inputs
+#
+# designs are generated in the unit hypercube and mapped to input values with the inverse cumulative distribution of
+# each input (see distribution_values), constant inputs are held at their average. The design rows are run together
+# with the batch version of the model (see run_single_cycles), split into chunks that can be run in parallel
+#
+# example:
+#   analysis = Sensitivity.from_excel('user_inputs.xlsx', 'sensitivity_variables', n_jobs=4)
+#   indices = analysis.sobol(n=512, seed=42)
+#   effects = analysis.morris(r=20, seed=42)
+
+
+def sobol_indices(f_A, f_B, f_AB, n_boot=1000, conf=0.95, seed=None):
+    """
+    first order and total Sobol indices of one output, first order estimator of Saltelli et al. (2010) and total
+    estimator of Jansen (1999), both using the same base samples A and B for every input
+
+    :param f_A: numpy array of outputs of the base samples A, shape (n)
+    :param f_B: numpy array of outputs of the base samples B, shape (n)
+    :param f_AB: numpy array of outputs of A with input i taken from B, shape (inputs, n)
+    :param n_boot: bootstrap resamples of the base samples [-]
+    :param conf: confidence level of the intervals [-]
+    :param seed: random seed of the bootstrap
+    :return: dictionary of numpy arrays, one value per input
+        S1, S1_low, S1_high - first order index and confidence interval [-]
+        ST, ST_low, ST_high - total index and confidence interval [-]
+    """
+
+    def estimates(a, b, ab):
+        # a, b: (..., n), ab: (inputs, ..., n)
+        V = np.var(np.concatenate([a, b], axis=-1), axis=-1)
+        S1 = np.mean(b * (ab - a), axis=-1) / V
+        ST = 0.5 * np.mean((a - ab) ** 2, axis=-1) / V
+        return S1, ST
+
+    S1, ST = estimates(f_A, f_B, f_AB)
+    rows = np.random.default_rng(seed).integers(0, len(f_A), size=(n_boot, len(f_A)))
+    S1_boot, ST_boot = estimates(f_A[rows], f_B[rows], f_AB[:, rows])
+    q = [50.0 * (1.0 - conf), 50.0 * (1.0 + conf)]  # [%]
+    S1_low, S1_high = np.percentile(S1_boot, q, axis=-1)
+    ST_low, ST_high = np.percentile(ST_boot, q, axis=-1)
+    return {'S1': S1, 'S1_low': S1_low, 'S1_high': S1_high, 'ST': ST, 'ST_low': ST_low, 'ST_high': ST_high}
+
+
+class Sensitivity:
+    """
+    Sobol and Morris sensitivity analysis of a CAES model to the inputs of a distribution table
+
+    every input combination is run once, outputs are kept and reused by later designs (e.g. sobol with a larger n and
+    the same seed only runs the new base samples)
+    """
+
+    def __init__(self, distributions, model=ICAES2, outputs=('RTE', 'kW_out_avg', 'kWh_out'), fixed_inputs=None,
+                 mode='step', n_jobs=1, chunk=1000):
+        """
+        :param distributions: pandas DataFrame of distributions, one row per model input (see monteCarloInputs)
+        :param model: CAES class, e.g. ICAES2
+        :param outputs: entries of analyze_performance to analyze
+        :param fixed_inputs: dictionary of inputs that differ from model.get_default_inputs() and are not varied
+        :param mode: single_cycle mode, used if the model has no batch version
+        :param n_jobs: number of processes (joblib), 1 runs in this process [-]
+        :param chunk: design rows run together [-]
+        """
+        self.distributions = distributions
+        self.variables = [param for param in distributions.index if not is_constant(distributions.loc[param])]
+        self.model = model
+        self.outputs = list(outputs)
+        self.fixed_inputs = {param: float(distributions.loc[param, 'Average']) for param in distributions.index
+                             if is_constant(distributions.loc[param])}
+        if fixed_inputs is not None:
+            self.fixed_inputs.update(fixed_inputs)
+        self.mode = mode
+        self.n_jobs = n_jobs
+        self.chunk = chunk
+
+        self.evaluations = {}  # outputs of each input combination that has been run
+        self.calls = 0  # model runs [-]
+
+    @classmethod
+    def from_excel(cls, filename, sheetname, **kwargs):
+        """
+        sensitivity analysis of the distributions in an Excel sheet (same format as monteCarloInputs)
+        """
+        return cls(pd.read_excel(filename, sheet_name=sheetname, index_col=0), **kwargs)
+
+    def values(self, U):
+        """
+        :param U: numpy array of cumulative probabilities, one column per variable [-]
+        :return: pandas DataFrame of input values, one column per variable
+        """
+        U = np.clip(U, 1e-12, 1.0 - 1e-12)  # finite values of unbounded distributions
+        return pd.DataFrame({variable: distribution_values(self.distributions.loc[variable], U[:, j])
+                             for j, variable in enumerate(self.variables)})
+
+    def evaluate(self, U):
+        """
+        runs the model for the input combinations that have not been run before
+        :param U: numpy array of cumulative probabilities, one row per design point and one column per variable [-]
+        :return: numpy array of outputs, one row per design point, NaN where the model fails
+        """
+        X = self.values(U)
+        keys = [tuple(row) for row in X.values]
+        new = []  # first design point of each input combination that has not been run
+        new_keys = set()
+        for i, key in enumerate(keys):
+            if key not in self.evaluations and key not in new_keys:
+                new_keys.add(key)
+                new.append(i)
+        if len(new) > 0:
+            inputs = X.iloc[new].reset_index(drop=True)
+            for entry, value in self.fixed_inputs.items():
+                inputs[entry] = value
+            chunks = [inputs.iloc[start:start + self.chunk] for start in range(0, len(inputs), self.chunk)]
+            results = Parallel(n_jobs=self.n_jobs)(delayed(run_single_cycles)(df, self.model, self.mode)
+                                                   for df in chunks)
+            results = pd.concat(results)
+            for output in self.outputs:
+                if output not in results.columns:
+                    results[output] = np.nan
+            Y = results[self.outputs].values.astype(float)
+            for i, y in zip(new, Y):
+                self.evaluations[keys[i]] = y
+            self.calls = self.calls + len(new)
+        return np.array([self.evaluations[key] for key in keys])
+
+    def sobol(self, n=512, seed=None, n_boot=1000, conf=0.95):
+        """
+        first order and total Sobol indices from a Saltelli design: base samples A and B (n rows each, from a
+        scrambled Sobol sequence) and for each variable the samples A with that variable taken from B, n * (variables
+        + 2) model runs in total
+
+        :param n: base samples, a power of 2 keeps the balance of the Sobol sequence [-]
+        :param seed: random seed of the scrambling and the bootstrap
+        :param n_boot: bootstrap resamples [-]
+        :param conf: confidence level of the intervals [-]
+        :return: pandas DataFrame, one row per output and variable with the entries of sobol_indices, base samples
+                 where the model fails for any of the runs are skipped
+        """
+        d = len(self.variables)
+        U = qmc.Sobol(d=2 * d, scramble=True, seed=seed).random(n)
+        A = U[:, :d]
+        B = U[:, d:]
+        AB = np.repeat(A[np.newaxis], d, axis=0)
+        for i in range(d):
+            AB[i, :, i] = B[:, i]
+
+        Y = self.evaluate(np.concatenate([A, B] + list(AB)))
+        f_A = Y[:n]
+        f_B = Y[n:2 * n]
+        f_AB = Y[2 * n:].reshape(d, n, len(self.outputs))
+
+        results = []
+        for k, output in enumerate(self.outputs):
+            keep = np.isfinite(f_A[:, k]) & np.isfinite(f_B[:, k]) & np.all(np.isfinite(f_AB[:, :, k]), axis=0)
+            indices = sobol_indices(f_A[keep, k], f_B[keep, k], f_AB[:, keep, k], n_boot=n_boot, conf=conf,
+                                    seed=seed)
+            df = pd.DataFrame(indices)
+            df.insert(0, 'variable', self.variables)
+            df.insert(0, 'output', output)
+            results.append(df)
+        return pd.concat(results, ignore_index=True)
+
+    def morris(self, r=20, levels=4, seed=None):
+        """
+        elementary effects from r Morris trajectories on a grid of levels per variable, each trajectory changes one
+        variable at a time by delta = levels / (2 * (levels - 1)), r * (variables + 1) model runs in total. Grid levels
+        are mapped to the midpoints of levels equal probability intervals of each distribution
+
+        :param r: trajectories [-]
+        :param levels: grid levels, even [-]
+        :param seed: random seed
+        :return: pandas DataFrame, one row per output and variable with the entries
+            mu - mean elementary effect, per unit of cumulative probability grid
+            mu_star - mean absolute elementary effect
+            sigma - standard deviation of the elementary effects
+        """
+        d = len(self.variables)
+        delta = levels / (2.0 * (levels - 1))  # [grid fraction]
+        rng = np.random.default_rng(seed)
+
+        # trajectories, shape (r, d + 1, d), on the grid 0 to 1
+        base = rng.integers(0, levels, size=(r, d)) / (levels - 1)
+        direction = np.where(base + delta <= 1.0 + 1e-12, 1.0, -1.0)
+        order = np.argsort(rng.random((r, d)), axis=1)  # variable changed at each step
+        X = np.repeat(base[:, np.newaxis, :], d + 1, axis=1)
+        trajectories = np.arange(r)
+        for step in range(d):
+            variable = order[:, step]
+            X[trajectories, step + 1:, variable] += (direction[trajectories, variable] * delta)[:, np.newaxis]
+
+        U = (X.reshape(-1, d) * (levels - 1) + 0.5) / levels  # equal probability interval midpoints
+        Y = self.evaluate(U).reshape(r, d + 1, len(self.outputs))
+
+        # elementary effect of the variable changed at each step, shape (r, d, outputs)
+        effects = np.zeros((r, d, len(self.outputs)))
+        for step in range(d):
+            variable = order[:, step]
+            effects[trajectories, variable, :] = (Y[:, step + 1, :] - Y[:, step, :]) / (
+                    direction[trajectories, variable] * delta)[:, np.newaxis]
+
+        results = []
+        for k, output in enumerate(self.outputs):
+            df = pd.DataFrame({'output': output, 'variable': self.variables,
+                               'mu': np.nanmean(effects[:, :, k], axis=0),
+                               'mu_star': np.nanmean(np.abs(effects[:, :, k]), axis=0),
+                               'sigma': np.nanstd(effects[:, :, k], axis=0, ddof=1)})
+            results.append(df)
+        return pd.concat(results, ignore_index=True)
@@ -0,0 +1,215 @@
+import os
+import glob
+import numpy as np
+import pandas as pd
+
+# output sinks for the time series of a CAES system (see CAES.init_time_series)
+#
+#   'memory'  - time series kept in memory and available as CAES.data (default)
+#   'none'    - only the totals used by CAES.analyze_performance are kept
+#   'parquet' - chunked Parquet dataset, one file per chunk in the subdirectory 'time_series' of the directory
+#               output_file (requires pyarrow, pip install caes[parquet])
+#   'hdf5'    - appended to the table 'data' of the HDF5 file output_file (requires pytables, pip install caes[hdf5])
+#
+# with record = 'summary' time steps are only added to the totals (see Totals.add_step), nothing is written to the sink
+#
+# with a streaming sink ('none', 'parquet' or 'hdf5') time steps are stored in a buffer of output_chunk rows that is
+# written to the sink and emptied when full, so long simulations run in bounded memory
+
+
+class Totals:
+    """
+    running sums and counts of the time series entries used by CAES.analyze_performance, so that performance can be
+    analyzed without keeping the time series
+    """
+    # total: (time series entry, time steps included), in - charge (m_air > 0), out - discharge (m_air < 0),
+    # flow - charge or discharge (m_air != 0)
+    entries = {'energy_in': ('energy_in', 'all'),
+               'energy_out': ('energy_out', 'all'),
+               'm_water': ('m_water', 'all'),
+               'm_fuel': ('m_fuel', 'all'),
+               'pwr_in': ('pwr', 'in'),
+               'pwr_out': ('pwr', 'out'),
+               'dp_well': ('dp_well', 'flow'),
+               'dp_pipe_f': ('dp_pipe_f', 'flow'),
+               'T1_in': ('T1', 'in'),
+               'T1_out': ('T1', 'out')}
+
+    def __init__(self):
+        self.sums = {total: 0.0 for total in self.entries}
+        self.counts = {total: 0 for total in self.entries}  # time steps included, NaN values are skipped [-]
+        # (weighted time steps, see add, are counted by their weight)
+        self.steps = 0  # time steps [-]
+        self.error_msg = None  # error message of the first time step
+        self.errors = False  # True if the time steps have more than one distinct error message
+
+    def add_error_msg(self, error_msg):
+        # same as len(error_msg.unique()) > 1 for the time series, without storing the messages
+        if self.error_msg is None:
+            self.error_msg = error_msg
+        elif error_msg != self.error_msg:
+            self.errors = True
+
+    def add_step(self, value, error_msg=''):
+        """
+        adds a single time step to the totals
+        :param value: function returning the value (float) of a time series entry
+        :param error_msg: error message of the time step
+        """
+        m_air = value('m_air')
+        included = {'all': True, 'in': m_air > 0.0, 'out': m_air < 0.0, 'flow': m_air != 0.0}
+        for total, (entry, steps) in self.entries.items():
+            if included[steps]:
+                x = value(entry)
+                if x == x:  # NaN values are skipped
+                    self.sums[total] = self.sums[total] + x
+                    self.counts[total] = self.counts[total] + 1
+        self.steps = self.steps + 1
+        if not self.errors:
+            self.add_error_msg(error_msg)
+
+    def add(self, columns, error_msgs, weights=None):
+        """
+        adds time steps to the totals
+        :param columns: function returning the numpy array of a time series entry, one value per time step
+        :param error_msgs: list of error messages, one per time step
+        :param weights: number of time steps each entry stands for, e.g. the points of CAES.quadrature_cycle, numpy
+                        array (1 for each entry if None) [-]
+        """
+        m_air = columns('m_air')
+        if weights is None:
+            weights = np.ones(len(m_air))
+        masks = {'all': None, 'in': m_air > 0.0, 'out': m_air < 0.0, 'flow': m_air != 0.0}
+        for total, (entry, steps) in self.entries.items():
+            values = columns(entry)
+            values_weights = weights
+            if masks[steps] is not None:
+                values = values[masks[steps]]
+                values_weights = weights[masks[steps]]
+            included = ~np.isnan(values)
+            self.sums[total] = self.sums[total] + np.sum(values[included] * values_weights[included])
+            self.counts[total] = self.counts[total] + np.sum(values_weights[included])
+        self.steps = self.steps + np.sum(weights)
+        for error_msg in error_msgs:
+            if self.errors:
+                break
+            self.add_error_msg(error_msg)
+
+    def mean(self, total):
+        # mean of the time steps included, NaN if there are none (same as pandas)
+        if self.counts[total] == 0:
+            return np.nan
+        return self.sums[total] / self.counts[total]
+
+
+class NoSink:
+    """
+    discards the time series, only the totals are kept
+    """
+
+    def open(self, columns):
+        self.columns = columns
+
+    def write(self, df):
+        pass
+
+    def read(self):
+        return pd.DataFrame(columns=self.columns)
+
+
+class ParquetSink:
+    """
+    writes each chunk of the time series to its own file of a Parquet dataset, so that chunks can be appended at any
+    time and the dataset read back or memory mapped as a whole. The dataset is the subdirectory 'time_series' of path,
+    which belongs to the sink, files of a previous run are only removed from there
+    :param path: directory of the dataset
+    """
+
+    def __init__(self, path):
+        if path == '':
+            raise ValueError("output_file must be set to a directory for output_sink 'parquet'")
+        if os.path.isfile(path):
+            raise ValueError("output_file must be a directory for output_sink 'parquet' (" + path + " is a file)")
+        self.path = path
+        self.dataset = os.path.join(path, 'time_series')  # dataset directory, written by the sink only
+        self.parts = 0  # files written [-]
+
+    def part_files(self):
+        return sorted(glob.glob(os.path.join(self.dataset, 'part-*.parquet')))
+
+    def open(self, columns):
+        self.columns = columns
+        os.makedirs(self.dataset, exist_ok=True)
+        for filename in self.part_files():  # previous results
+            os.remove(filename)
+        self.parts = 0
+
+    def write(self, df):
+        df.to_parquet(os.path.join(self.dataset, 'part-' + str(self.parts).zfill(6) + '.parquet'), engine='pyarrow',
+                      index=False)
+        self.parts = self.parts + 1
+
+    def read(self):
+        if self.parts == 0:
+            return pd.DataFrame(columns=self.columns)
+        return pd.concat([pd.read_parquet(filename, engine='pyarrow', memory_map=True)
+                          for filename in self.part_files()], ignore_index=True)
+
+
+class HDF5Sink:
+    """
+    appends each chunk of the time series to the table 'data' of an HDF5 file
+    :param filename: HDF5 file
+    :param msg_length: shortest length of the error message column [characters], the column is sized for the longest
+                       message of the first chunk if that is longer, longer messages of later chunks are truncated
+    """
+
+    def __init__(self, filename, msg_length=200):
+        if filename == '':
+            raise ValueError("output_file must be set to a file for output_sink 'hdf5'")
+        if os.path.isdir(filename):
+            raise ValueError("output_file must be a file for output_sink 'hdf5' (" + filename + " is a directory)")
+        self.filename = filename
+        self.msg_length = msg_length
+        self.rows = 0  # rows written [-]
+
+    def open(self, columns):
+        self.columns = columns
+        if os.path.exists(self.filename):
+            with pd.HDFStore(self.filename, mode='a') as store:
+                if 'data' in store:  # previous results
+                    store.remove('data')
+        self.rows = 0
+
+    def write(self, df):
+        if self.rows == 0:  # (the table is created with the first chunk)
+            self.msg_itemsize = max([self.msg_length] + list(df['error_msg'].str.len()))  # [characters]
+        elif df['error_msg'].str.len().max() > self.msg_itemsize:
+            df = df.assign(error_msg=df['error_msg'].str.slice(0, self.msg_itemsize))
+        with pd.HDFStore(self.filename, mode='a') as store:
+            store.append('data', df, format='table', min_itemsize={'error_msg': self.msg_itemsize})
+        self.rows = self.rows + len(df)
+
+    def read(self):
+        if self.rows == 0:
+            return pd.DataFrame(columns=self.columns)
+        return pd.read_hdf(self.filename, 'data')
+
+
+def output_sink(sink='memory', filename=''):
+    """
+    creates an output sink for the time series
+    :param sink: 'memory', 'none', 'parquet' or 'hdf5'
+    :param filename: directory of the Parquet dataset or HDF5 file, required for 'parquet' and 'hdf5'
+    :return: output sink, None for 'memory'
+    """
+    if sink == 'memory':
+        return None
+    elif sink == 'none':
+        return NoSink()
+    elif sink == 'parquet':
+        return ParquetSink(filename)
+    elif sink == 'hdf5':
+        return HDF5Sink(filename)
+    else:
+        raise ValueError("sink must be 'memory', 'none', 'parquet' or 'hdf5'")
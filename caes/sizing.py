@@ -0,0 +1,234 @@
+import numpy as np
+import pandas as pd
+import time
+from scipy.spatial import cKDTree
+from .icaes2 import ICAES2
+
+# columns of the project sizing results (e.g. study_results.csv) for each model input
+RESULTS_COLUMNS = {'depth': 'depth_m', 'h': 'thickness_m', 'phi': 'porosity', 'k': 'permeability_mD'}
+
+
+class WarmStarts:
+    """
+    warm start provider for size_system, initial guesses of m_dot and r_f are taken from the nearest already sized
+    site (KD-tree in normalized input space)
+
+    inputs are normalized by their standard deviation across the sized sites, variables in log_variables and the
+    targets are compared in log space. The neighbour's m_dot is scaled by the ratio of power targets and its r_f by
+    the square root of the ratio of energy targets.
+    """
+
+    def __init__(self, variables=('depth', 'h', 'phi', 'k'), log_variables=('k',)):
+        self.variables = list(variables)  # site inputs used to find neighbours
+        self.log_variables = list(log_variables)  # site inputs compared in log space
+        self.points = []  # [site inputs, log(target_MW), log(target_MWh)] of sized sites
+        self.solutions = []  # [m_dot, r_f, target_MW, target_MWh] of sized sites
+        self.tree = None
+        self.scale = None
+
+    def __len__(self):
+        return len(self.points)
+
+    def point(self, site_inputs, target_MW, target_MWh):
+        x = []
+        for variable in self.variables:
+            if variable in self.log_variables:
+                x.append(np.log(site_inputs[variable]))
+            else:
+                x.append(site_inputs[variable])
+        return x + [np.log(target_MW), np.log(target_MWh)]
+
+    def add(self, site_inputs, target_MW, target_MWh, m_dot, r_f):
+        """
+        stores a sized site
+        """
+        self.points.append(self.point(site_inputs, target_MW, target_MWh))
+        self.solutions.append([m_dot, r_f, target_MW, target_MWh])
+        self.tree = None  # rebuilt on the next guess
+
+    def add_results(self, df, columns=RESULTS_COLUMNS, tol=1e-3):
+        """
+        stores the sized sites of a results dataframe (one row per site with the sizing inputs, capacity_MW,
+        duration_hr, m_dot and r_f), rows that did not converge or have no finite m_dot and r_f are skipped
+
+        convergence is taken from the converged column if there is one, otherwise (e.g. results saved before size_system
+        was used) from the errors column and the kW_out_avg and kWh_out columns compared to the targets
+        :param df: pandas DataFrame, e.g. from a previously saved study_results.csv
+        :param columns: dictionary of the dataframe column for each variable
+        :param tol: allowable sum of the relative power and energy errors of rows without a converged column [-]
+        """
+        for index, row in df.iterrows():
+            if 'converged' in df.columns:
+                if str(row['converged']).lower() != 'true':
+                    continue
+            else:
+                if 'errors' in df.columns and str(row['errors']).lower() == 'true':
+                    continue
+                error = abs(row['kW_out_avg'] / (row['capacity_MW'] * 1e3) - 1.0) + \
+                    abs(row['kWh_out'] / (row['capacity_MW'] * row['duration_hr'] * 1e3) - 1.0)
+                if not error <= tol:  # also catches NaN
+                    continue
+            if not (np.isfinite(row['m_dot']) and np.isfinite(row['r_f'])):
+                continue
+            site_inputs = {variable: row[columns.get(variable, variable)] for variable in self.variables}
+            self.add(site_inputs, row['capacity_MW'], row['capacity_MW'] * row['duration_hr'], row['m_dot'],
+                     row['r_f'])
+
+    @classmethod
+    def from_csv(cls, filename, columns=RESULTS_COLUMNS, **kwargs):
+        """
+        warm start provider from a previously saved results file (see add_results)
+        """
+        warm_starts = cls(**kwargs)
+        warm_starts.add_results(pd.read_csv(filename), columns=columns)
+        return warm_starts
+
+    def guess(self, site_inputs, target_MW, target_MWh):
+        """
+        :return: (m_dot [kg/s], r_f [m]) from the nearest sized site, None if no sites are sized
+        """
+        if len(self.points) == 0:
+            return None
+        if self.tree is None:
+            points = np.array(self.points)
+            self.scale = np.std(points, axis=0)
+            self.scale[self.scale == 0.0] = 1.0
+            self.tree = cKDTree(points / self.scale)
+        x = np.array(self.point(site_inputs, target_MW, target_MWh)) / self.scale
+        distance, i = self.tree.query(x)
+        m_dot, r_f, MW, MWh = self.solutions[i]
+        return m_dot * target_MW / MW, r_f * (target_MWh / MWh) ** 0.5
+
+
+def size_system(target_MW, target_MWh, site_inputs=None, model=ICAES2, m_dot=10.0, r_f=10.0, tol=1e-6,
+                max_iter=50, mode='step', warm_starts=None, debug=False):
+    """
+    sizes the mass flow rate (m_dot) and formation radius (r_f) of a system to deliver the target average power and
+    energy output over a single cycle
+
+    the two residuals, log(kW_out_avg / kW_target) and log(kWh_out / kWh_target), are solved in terms of log(m_dot) and
+    log(r_f) with Broyden's method. The starting Jacobian follows from the system physics (power scales with m_dot,
+    energy scales with the stored mass and r_f ** 2), so no finite difference cycles are needed, and it is improved
+    with each cycle. Steps that fail or increase the residual are halved.
+
+    :param target_MW: average power output [MW]
+    :param target_MWh: energy output [MWh]
+    :param site_inputs: dictionary or pandas Series of inputs that differ from model.get_default_inputs()
+    :param model: CAES class to size, e.g. ICAES or ICAES2
+    :param m_dot: initial guess (warm start) for the mass flow rate [kg/s]
+    :param r_f: initial guess (warm start) for the formation radius [m]
+    :param tol: allowable sum of the relative power and energy errors [-]
+    :param max_iter: maximum number of cycles to run [-]
+    :param mode: single_cycle mode, 'step' or 'vectorized'
+    :param warm_starts: WarmStarts, if given the initial guesses are taken from the nearest sized site and the sized
+                        system is added to it
+    :param debug: print each iteration [Boolean]
+    :return: results - Pandas Series from analyze_performance of the sized system with the following extra entries
+        m_dot - sized mass flow rate [kg/s]
+        r_f - sized formation radius [m]
+        iterations - number of cycles run [-]
+        converged - True if the targets are met within tol [Boolean]
+        error_msg - message of the last cycle that failed if the system is not sized, '' otherwise [-]
+        solve_time - time to size the system [s]
+    """
+    start = time.time()
+
+    # convert inputs to model units
+    kW_out = target_MW * 1e3
+    kWh_out = target_MWh * 1e3
+    target = np.log([kW_out, kWh_out])
+
+    systems = []  # system created by the first cycle, reset for the following cycles
+    error_msgs = []  # messages of the cycles that failed
+
+    def run_cycle(x):
+        try:
+            if len(systems) == 0:
+                inputs = model.get_default_inputs()
+                inputs['record'] = 'summary'  # only analyze_performance is used
+                if site_inputs is not None:
+                    for variable in site_inputs.keys():
+                        inputs[variable] = site_inputs[variable]
+                inputs['m_dot'] = np.exp(x[0])  # [kg/s]
+                inputs['r_f'] = np.exp(x[1])  # [m]
+                systems.append(model(inputs=inputs))
+            else:
+                systems[0].reset(m_dot=np.exp(x[0]), r_f=np.exp(x[1]))
+            system = systems[0]
+            system.single_cycle(mode=mode)
+            results = system.analyze_performance()
+        except (ValueError, ArithmeticError) as error:  # e.g. CoolProp state out of range
+            error_msgs.append(type(error).__name__ + ': ' + str(error))
+            return None, None
+        if not results['kW_out_avg'] > 0.0 or not results['kWh_out'] > 0.0:  # also catches NaN
+            return None, results
+        F = np.log([results['kW_out_avg'], results['kWh_out']]) - target
+        return F, results
+
+    def error(F):
+        return np.sum(np.abs(np.exp(F) - 1.0))  # sum of relative errors [-]
+
+    if warm_starts is not None:
+        # site inputs used to find neighbours, default inputs of the model for those not in site_inputs
+        warm_start_inputs = model.get_default_inputs()
+        if site_inputs is not None:
+            for variable in site_inputs.keys():
+                warm_start_inputs[variable] = site_inputs[variable]
+        guess = warm_starts.guess(warm_start_inputs, target_MW, target_MWh)
+        if guess is not None:
+            m_dot, r_f = guess
+
+    x = np.log([m_dot, r_f])
+    J = np.array([[1.0, 0.0],
+                  [0.0, 2.0]])  # d(log kW, log kWh) / d(log m_dot, log r_f)
+    F, results = run_cycle(x)
+    count = 1
+    if F is None:
+        if results is None:
+            results = pd.Series(index=['RTE', 'kWh_in', 'kWh_out', 'kW_in_avg', 'kW_out_avg'], dtype=float)
+        results['errors'] = 'true'
+    else:
+        while error(F) > tol:
+            if count >= max_iter:  # sizing unsuccessful
+                results['errors'] = 'true'
+                break
+            if debug:
+                print("\nIteration : " + str(count))
+                print("m_dot       : " + str(round(np.exp(x[0]), 3)))
+                print("r_f         : " + str(round(np.exp(x[1]), 3)))
+                print("MW_out_avg   : " + str(round(results['kW_out_avg'] / 1e3, 3)))
+                print("MWh_out      : " + str(round(results['kWh_out'] / 1e3, 3)))
+
+            # Broyden step, halved while the cycle fails or the residual grows
+            dx = -np.linalg.solve(J, F)
+            F_new = None
+            while count < max_iter:
+                F_new, results_new = run_cycle(x + dx)
+                count = count + 1
+                if F_new is not None and error(F_new) < error(F):
+                    break
+                dx = 0.5 * dx
+                F_new = None
+            if F_new is None:  # sizing unsuccessful
+                results['errors'] = 'true'
+                break
+
+            # Jacobian update
+            J = J + np.outer(F_new - F - J.dot(dx), dx) / dx.dot(dx)
+            x = x + dx
+            F = F_new
+            results = results_new
+
+    converged = F is not None and error(F) <= tol
+    if warm_starts is not None and converged:
+        warm_starts.add(warm_start_inputs, target_MW, target_MWh, np.exp(x[0]), np.exp(x[1]))
+
+    end = time.time()
+    results['solve_time'] = end - start
+    results['iterations'] = count
+    results['m_dot'] = np.exp(x[0])
+    results['r_f'] = np.exp(x[1])
+    results['converged'] = converged
+    results['error_msg'] = error_msgs[-1] if len(error_msgs) > 0 and not converged else ''
+
+    return results
@@ -0,0 +1,283 @@
+import json
+import numpy as np
+import pandas as pd
+from itertools import product
+from numpy.polynomial import legendre
+from scipy.stats import qmc
+from .caes import CAES
+from .icaes import ICAES
+from .icaes2 import ICAES2
+from .batch import run_single_cycles, performance_entries
+from .sizing import size_system
+
+# surrogate (emulator) of the single cycle performance of a CAES system, for studies with too many sites to run the
+# full model for each one (e.g. GIS cells)
+#
+#   inputs  - site inputs (e.g. depth, h, phi, k), each within a training range, variables in log_variables are used in
+#             log space (e.g. permeability)
+#   outputs - entries of analyze_performance (e.g. RTE, kW_out_avg, kWh_out) or of sizing results (e.g. m_dot, r_f),
+#             outputs in log_outputs are fit in log space. With targets, the full model sizes each point with
+#             size_system, which is needed to train or fall back for sizing results
+#
+# the emulator is a polynomial chaos expansion: Legendre polynomials of the inputs scaled to [-1, 1], up to a total
+# degree, with coefficients from a least squares fit to a space-filling (Latin hypercube) design of single_cycle runs.
+# The error estimate of each output is the root mean square leave-one-out error of the fit.
+#
+# example:
+#   surrogate = Surrogate(bounds={'depth': (800.0, 2500.0), 'h': (10.0, 100.0), 'phi': (0.1, 0.35),
+#                                 'k': (5.0, 1000.0)})
+#   surrogate.train(n=200, seed=42)
+#   surrogate.save('surrogate.json')
+#   results = Surrogate.load('surrogate.json').predict(cells, columns=RESULTS_COLUMNS)
+#
+# points outside the training ranges are run with the full model (see predict)
+
+# model classes that can be saved
+MODELS = {'CAES': CAES, 'ICAES': ICAES, 'ICAES2': ICAES2}
+
+
+def total_degree_exponents(n_variables, degree):
+    """
+    :return: list of the polynomial degree of each variable, for every term with a total degree <= degree
+    """
+    return [exponents for exponents in product(range(degree + 1), repeat=n_variables) if sum(exponents) <= degree]
+
+
+class Surrogate:
+    """
+    polynomial chaos emulator of single cycle outputs over a box of site inputs
+    """
+
+    def __init__(self, bounds, model=ICAES2, outputs=('RTE', 'kW_out_avg', 'kWh_out'), degree=3,
+                 log_variables=('k',), log_outputs=('kW_out_avg', 'kWh_out', 'm_dot', 'r_f'), fixed_inputs=None,
+                 mode='step', targets=None):
+        """
+        :param bounds: dictionary of (low, high) training range for each variable, the training hull
+        :param model: CAES class to emulate, e.g. ICAES2
+        :param outputs: entries to emulate
+        :param degree: total degree of the polynomials [-]
+        :param log_variables: variables used in log space
+        :param log_outputs: outputs fit in log space (must be positive), their errors are relative errors
+        :param fixed_inputs: dictionary of inputs that differ from model.get_default_inputs() and are the same for
+                             all points
+        :param mode: single_cycle mode of the full model, used if the model has no batch version or with targets
+        :param targets: (target_MW, target_MWh), the full model sizes each point to these targets with size_system
+                        instead of running a single cycle with the default m_dot and r_f (required for outputs of
+                        sizing results, e.g. m_dot and r_f)
+        """
+        self.variables = list(bounds.keys())
+        self.bounds = {variable: (float(bounds[variable][0]), float(bounds[variable][1])) for variable in bounds}
+        self.model = model
+        self.outputs = list(outputs)
+        self.degree = degree
+        self.log_variables = [variable for variable in log_variables if variable in self.variables]
+        self.log_outputs = [output for output in log_outputs if output in self.outputs]
+        self.fixed_inputs = {} if fixed_inputs is None else dict(fixed_inputs)
+        self.mode = mode
+        self.targets = None if targets is None else (float(targets[0]), float(targets[1]))
+
+        self.exponents = total_degree_exponents(len(self.variables), degree)  # terms of the expansion
+        self.coefficients = None  # one column per output
+        self.errors = None  # root mean square leave-one-out error of each output, in log space for log_outputs
+        self.n_train = 0  # training points [-]
+
+    def transform(self, X):
+        # inputs (one column per variable) to [-1, 1] within the bounds
+        Z = np.array(X, dtype=float)
+        for j, variable in enumerate(self.variables):
+            low, high = self.bounds[variable]
+            if variable in self.log_variables:
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    Z[:, j] = np.log(Z[:, j])
+                low, high = np.log(low), np.log(high)
+            Z[:, j] = 2.0 * (Z[:, j] - low) / (high - low) - 1.0
+        return Z
+
+    def inverse_transform(self, Z):
+        # [-1, 1] within the bounds to inputs
+        X = np.array(Z, dtype=float)
+        for j, variable in enumerate(self.variables):
+            low, high = self.bounds[variable]
+            if variable in self.log_variables:
+                X[:, j] = np.exp(np.log(low) + (Z[:, j] + 1.0) / 2.0 * (np.log(high) - np.log(low)))
+            else:
+                X[:, j] = low + (Z[:, j] + 1.0) / 2.0 * (high - low)
+        return X
+
+    def basis(self, Z):
+        # value of each term of the expansion (columns) at each point (rows)
+        V = [legendre.legvander(Z[:, j], self.degree) for j in range(len(self.variables))]
+        A = np.ones((len(Z), len(self.exponents)))
+        for i, exponents in enumerate(self.exponents):
+            for j, exponent in enumerate(exponents):
+                if exponent > 0:
+                    A[:, i] = A[:, i] * V[j][:, exponent]
+        return A
+
+    def input_array(self, df, columns=None):
+        columns = {} if columns is None else columns
+        return np.column_stack([np.asarray(df[columns.get(variable, variable)], dtype=float)
+                                for variable in self.variables])
+
+    def evaluate(self, df, columns=None):
+        """
+        runs the full model for each row of df, a single cycle with the batch version of the model if there is one,
+        or with targets the system sized by size_system
+        :param df: pandas DataFrame with a column for each variable
+        :param columns: dictionary of the df column for each variable (e.g. sizing.RESULTS_COLUMNS)
+        :return: pandas DataFrame of the outputs, same index as df, NaN where the full model fails (or the sizing does
+                 not converge)
+        """
+        inputs = pd.DataFrame(self.input_array(df, columns), index=df.index, columns=self.variables)
+        for entry, value in self.fixed_inputs.items():
+            inputs[entry] = value
+
+        results = pd.DataFrame(index=df.index, columns=self.outputs, dtype=float)
+        if self.targets is not None:
+            for index in inputs.index:
+                sized = size_system(self.targets[0], self.targets[1], site_inputs=inputs.loc[index], model=self.model,
+                                    mode=self.mode)
+                if sized['converged']:
+                    for output in self.outputs:
+                        if output in sized.index:
+                            results.loc[index, output] = float(sized[output])
+            return results
+
+        missing = [output for output in self.outputs if output not in performance_entries]
+        if len(missing) > 0:
+            raise ValueError(', '.join(missing) + ' are not entries of analyze_performance, set targets to evaluate '
+                             'them with size_system')
+        performance = run_single_cycles(inputs, model=self.model, mode=self.mode)
+        for output in self.outputs:
+            results[output] = performance[output].astype(float)
+        return results
+
+    def design(self, n=200, seed=None):
+        """
+        Latin hypercube design within the bounds
+        :param n: number of points [-]
+        :param seed: random seed
+        :return: pandas DataFrame with a column for each variable
+        """
+        U = qmc.LatinHypercube(d=len(self.variables), seed=seed).random(n)
+        return pd.DataFrame(self.inverse_transform(2.0 * U - 1.0), columns=self.variables)
+
+    def train(self, n=200, seed=None):
+        """
+        runs the full model for a Latin hypercube design of n points and fits the emulator to the results
+        :return: pandas DataFrame of the design and its outputs
+        """
+        df = self.design(n=n, seed=seed)
+        results = self.evaluate(df)
+        self.fit(df, results)
+        return pd.concat([df, results], axis=1)
+
+    def fit(self, df, results=None, columns=None):
+        """
+        fits the emulator to existing results, e.g. a previously saved study_results.csv. Points that are NaN (or not
+        positive for log_outputs) are skipped for that output
+        :param df: pandas DataFrame with a column for each variable
+        :param results: pandas DataFrame with a column for each output, same rows as df (df if None)
+        :param columns: dictionary of the df column for each variable (e.g. sizing.RESULTS_COLUMNS)
+        """
+        if results is None:
+            results = df
+        A = self.basis(self.transform(self.input_array(df, columns)))
+        self.coefficients = np.zeros((len(self.exponents), len(self.outputs)))
+        self.errors = {}
+        self.n_train = len(A)
+        for i, output in enumerate(self.outputs):
+            y = np.asarray(results[output], dtype=float)
+            if output in self.log_outputs:
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    y = np.log(np.where(y > 0.0, y, np.nan))
+            keep = np.isfinite(y) & np.all(np.isfinite(A), axis=1)
+            if np.sum(keep) <= len(self.exponents):
+                raise ValueError('too few points to fit ' + output + ' (' + str(np.sum(keep)) + ' for ' +
+                                 str(len(self.exponents)) + ' terms), use more points or a lower degree')
+
+            # least squares, leave-one-out residuals from the diagonal of the hat matrix
+            Q, R = np.linalg.qr(A[keep])
+            self.coefficients[:, i] = np.linalg.solve(R, Q.T.dot(y[keep]))
+            h = np.sum(Q ** 2, axis=1)
+            residuals = (y[keep] - Q.dot(Q.T.dot(y[keep]))) / (1.0 - h)
+            self.errors[output] = float(np.sqrt(np.mean(residuals ** 2)))
+
+    def inside(self, df, columns=None):
+        """
+        :return: numpy array, True for each row of df within the training bounds
+        """
+        Z = self.transform(self.input_array(df, columns))
+        return np.all((Z >= -1.0 - 1e-12) & (Z <= 1.0 + 1e-12), axis=1)
+
+    def predict(self, df, columns=None, fallback=True, chunk=100000):
+        """
+        predicts the outputs for each row of df
+        :param df: pandas DataFrame with a column for each variable
+        :param columns: dictionary of the df column for each variable (e.g. sizing.RESULTS_COLUMNS)
+        :param fallback: run the full model for rows outside the training bounds (NaN if False)
+        :param chunk: rows evaluated at a time, limits memory use [-]
+        :return: pandas DataFrame of the outputs, same index as df, with the extra column
+            surrogate - True if the row was predicted by the emulator, False if by the full model [Boolean]
+        """
+        if self.coefficients is None:
+            raise ValueError('surrogate is not trained, use train or fit first')
+        X = self.input_array(df, columns)
+        Y = np.full((len(X), len(self.outputs)), np.nan)
+        inside = np.zeros(len(X), dtype=bool)
+        for start in range(0, len(X), chunk):
+            Z = self.transform(X[start:start + chunk])
+            keep = np.all((Z >= -1.0 - 1e-12) & (Z <= 1.0 + 1e-12), axis=1)
+            inside[start:start + chunk] = keep
+            Y[start:start + chunk][keep] = self.basis(Z[keep]).dot(self.coefficients)
+        for i, output in enumerate(self.outputs):
+            if output in self.log_outputs:
+                Y[:, i] = np.exp(Y[:, i])
+
+        results = pd.DataFrame(Y, index=df.index, columns=self.outputs)
+        if fallback and not np.all(inside):
+            outside = pd.DataFrame(X[~inside], index=df.index[~inside], columns=self.variables)
+            results.loc[outside.index, self.outputs] = self.evaluate(outside).values
+        results['surrogate'] = inside
+        return results
+
+    def save(self, filename):
+        """
+        saves the trained emulator and its error estimates to a JSON file
+        """
+        if self.model.__name__ not in MODELS:
+            raise ValueError('model must be one of ' + ', '.join(MODELS) + ' to be saved')
+        data = {'model': self.model.__name__,
+                'variables': self.variables,
+                'bounds': self.bounds,
+                'outputs': self.outputs,
+                'degree': self.degree,
+                'log_variables': self.log_variables,
+                'log_outputs': self.log_outputs,
+                'fixed_inputs': self.fixed_inputs,
+                'mode': self.mode,
+                'targets': self.targets,
+                'exponents': [list(exponents) for exponents in self.exponents],
+                'coefficients': None if self.coefficients is None else self.coefficients.tolist(),
+                'errors': self.errors,
+                'n_train': self.n_train}
+        with open(filename, 'w') as f:
+            json.dump(data, f, indent=1, default=lambda value: value.item())
+
+    @classmethod
+    def load(cls, filename):
+        """
+        emulator from a file written by save
+        """
+        with open(filename) as f:
+            data = json.load(f)
+        surrogate = cls(bounds={variable: data['bounds'][variable] for variable in data['variables']},
+                        model=MODELS[data['model']], outputs=data['outputs'], degree=data['degree'],
+                        log_variables=data['log_variables'], log_outputs=data['log_outputs'],
+                        fixed_inputs=data['fixed_inputs'], mode=data['mode'], targets=data.get('targets'))
+        surrogate.exponents = [tuple(exponents) for exponents in data['exponents']]
+        if data['coefficients'] is not None:
+            surrogate.coefficients = np.array(data['coefficients'])
+        surrogate.errors = data['errors']
+        surrogate.n_train = data['n_train']
+        return surrogate
@@ -0,0 +1,314 @@
+import time
+import unittest
+import warnings
+import numpy as np
+import pandas as pd
+from math import log
+from caes import CAES, ICAES2
+
+
+class SeriesCAES(CAES):
+    # subclass written against the previous pandas Series interface
+    def charge_perf(self, s):
+        s = pd.Series({'work_per_kg': self.R / self.M * s['T0'] * log(s['p0'] / s['p1']), 'T1': s['T0']})
+        return s
+
+
+class TestCAES(unittest.TestCase):
+
+    def setUp(self):
+        inputs = CAES.get_default_inputs()
+        inputs['steps'] = 10
+        self.sys = CAES(inputs=inputs)
+
+    # time series storage
+    def test_data_rows(self):
+        self.sys.single_cycle()
+        self.assertEqual(len(self.sys.data), 2 * 10 + 1)
+        self.assertEqual(list(self.sys.data.columns), self.sys.attributes_time_series)
+
+    def test_data_buffer_grows(self):
+        self.sys.single_cycle()
+        self.sys.debug_perf(delta_t=0.1)
+        self.assertEqual(len(self.sys.data), 2 * 10 + 1 + 10)
+        self.assertGreater(self.sys.data.loc[21, 'energy_in'], 0.0)
+
+    def test_output_sink_none(self):
+        inputs = CAES.get_default_inputs()
+        inputs['steps'] = 10
+        inputs['output_sink'] = 'none'
+        inputs['output_chunk'] = 4
+        sys_none = CAES(inputs=inputs)
+        sys_none.single_cycle()
+        self.sys.single_cycle()
+        self.assertEqual(sys_none.data_buffer.shape[0], 4)
+        self.assertEqual(len(sys_none.data), 0)
+        results = self.sys.analyze_performance()
+        results_none = sys_none.analyze_performance()
+        for entry in ['RTE', 'kWh_in', 'kWh_out', 'kW_in_avg', 'kW_out_avg', 'dp_well_avg', 'T_cmp_out_avg']:
+            self.assertAlmostEqual(results_none[entry] / results[entry], 1.0, places=12)
+        self.assertEqual(results_none['errors'], results['errors'])
+
+    def test_record_summary(self):
+        for mode in ['step', 'vectorized']:
+            inputs = ICAES2.get_default_inputs()
+            inputs['steps'] = 10
+            system = ICAES2(inputs=inputs)
+            system.single_cycle(mode=mode)
+            inputs['record'] = 'summary'
+            sys_summary = ICAES2(inputs=inputs)
+            sys_summary.single_cycle(mode=mode)
+            self.assertEqual(len(sys_summary.data), 0)
+            results = system.analyze_performance()
+            results_summary = sys_summary.analyze_performance()
+            self.assertEqual(list(results_summary.index), list(results.index))
+            self.assertEqual(results_summary['errors'], results['errors'])
+            for entry in ['RTE', 'kWh_in', 'kWh_out', 'kW_in_avg', 'kW_out_avg', 'dp_pipe_f_avg', 'T_exp_out_avg']:
+                self.assertAlmostEqual(results_summary[entry] / results[entry], 1.0, places=12)
+
+    # per time step state
+    def test_series_interface(self):
+        inputs = CAES.get_default_inputs()
+        inputs['steps'] = 10
+        sys_series = SeriesCAES(inputs=inputs)
+        sys_series.single_cycle()
+        self.sys.single_cycle()
+        self.assertAlmostEqual(sys_series.data['energy_in'].sum(), self.sys.data['energy_in'].sum(), places=6)
+
+    # vectorized single cycle, same results as step-by-step within 1e-9 (see CAES.update_steps)
+    def test_vectorized(self):
+        for cls in [CAES, ICAES2]:
+            inputs = cls.get_default_inputs()
+            inputs['steps'] = 10
+            inputs['include_pipe_heat_transfer'] = True
+            sys_vectorized = cls(inputs=inputs)
+            sys_vectorized.single_cycle(mode='vectorized')
+            # the sweeps use tabulated air properties, same as step mode with the 'table' backend
+            for backend, places in [('table', 9), ('direct', 6)]:
+                inputs['property_backend'] = backend
+                sys_step = cls(inputs=inputs)
+                sys_step.single_cycle(mode='step')
+                self.assertEqual(len(sys_vectorized.data), len(sys_step.data))
+                for entry in ['RTE', 'kWh_in', 'kWh_out', 'dp_well_avg', 'dp_pipe_f_avg']:
+                    self.assertAlmostEqual(sys_vectorized.analyze_performance()[entry] /
+                                           sys_step.analyze_performance()[entry], 1.0, places=places)
+                self.assertAlmostEqual(sys_vectorized.p_store / sys_step.p_store, 1.0, places=places)
+
+    def test_vectorized_speed(self):
+        # at 1000 time steps the sweeps are faster than 1000 calls of update
+        inputs = CAES.get_default_inputs()
+        inputs['steps'] = 1000
+        CAES(inputs=inputs).single_cycle(mode='vectorized')  # property table built once per process
+        times = {}
+        for mode in ['step', 'vectorized']:
+            system = CAES(inputs=inputs)
+            start = time.perf_counter()
+            system.single_cycle(mode=mode)
+            times[mode] = time.perf_counter() - start
+        self.assertLess(times['vectorized'], times['step'])
+
+    def test_adaptive(self):
+        inputs = CAES.get_default_inputs()
+        inputs['steps'] = 1000
+        sys_fine = CAES(inputs=inputs)
+        sys_fine.single_cycle(mode='vectorized')
+        sys_adaptive = CAES(inputs=CAES.get_default_inputs())
+        sys_adaptive.single_cycle(mode='adaptive', tol=1e-3)
+        self.assertLess(sys_adaptive.steps_taken, 40)
+        self.assertEqual(len(sys_adaptive.data), sys_adaptive.steps_taken + 1)
+        self.assertAlmostEqual(sys_adaptive.m_store / sys_adaptive.m_store_min, 1.0, places=9)
+        for entry in ['RTE', 'kWh_in', 'kWh_out']:
+            self.assertAlmostEqual(sys_adaptive.analyze_performance()[entry] /
+                                   sys_fine.analyze_performance()[entry], 1.0, places=4)
+
+    def test_adaptive_cost(self):
+        # with the default tol as accurate as 1000 uniform time steps and faster
+        inputs = ICAES2.get_default_inputs()
+        inputs['steps'] = 10000
+        sys_ref = ICAES2(inputs=inputs)
+        sys_ref.single_cycle(mode='vectorized')
+        rte_ref = sys_ref.analyze_performance()['RTE']
+        inputs['steps'] = 1000
+        results = {}
+        for mode in ['vectorized', 'adaptive']:
+            times = []
+            for i in range(3):
+                system = ICAES2(inputs=inputs)
+                start = time.perf_counter()
+                system.single_cycle(mode=mode)
+                times.append(time.perf_counter() - start)
+            results[mode] = (abs(system.analyze_performance()['RTE'] / rte_ref - 1.0), min(times))
+        self.assertLess(results['adaptive'][0], results['vectorized'][0])
+        self.assertLess(results['adaptive'][1], results['vectorized'][1])
+
+    def test_quadrature(self):
+        results = {}
+        for nodes in [8, 16]:
+            system = CAES(inputs=CAES.get_default_inputs())
+            system.single_cycle(mode='quadrature', nodes=nodes)
+            self.assertEqual(len(system.data), 0)
+            self.assertEqual(system.m_store, system.m_store_min)
+            results[nodes] = system.analyze_performance()
+        inputs = CAES.get_default_inputs()
+        inputs['steps'] = 1000
+        sys_fine = CAES(inputs=inputs)
+        sys_fine.single_cycle(mode='vectorized')
+        results_fine = sys_fine.analyze_performance()
+        self.assertEqual(results[16]['errors'], results_fine['errors'])
+        for entry in ['RTE', 'kWh_in', 'kWh_out', 'kW_in_avg', 'kW_out_avg', 'dp_well_avg']:
+            self.assertAlmostEqual(results[8][entry] / results[16][entry], 1.0, places=11)  # (property table)
+            self.assertAlmostEqual(results[16][entry] / results_fine[entry], 1.0, places=3)
+        for entry in ['RTE', 'kWh_in', 'kWh_out']:  # (1000 time steps, relative error ~2e-5)
+            self.assertAlmostEqual(results[16][entry] / results_fine[entry], 1.0, places=4)
+
+    def test_vectorized_fallback(self):
+        inputs = CAES.get_default_inputs()
+        inputs['steps'] = 10
+        sys_series = SeriesCAES(inputs=inputs)
+        self.assertFalse(sys_series.vectorized_available())
+        sys_series.single_cycle(mode='vectorized')
+        self.assertEqual(len(sys_series.data), 2 * 10 + 1)
+
+    def test_reset(self):
+        inputs = ICAES2.get_default_inputs()
+        inputs['steps'] = 10
+        system = ICAES2(inputs=inputs)
+        system.single_cycle()
+        system.reset(m_dot=150.0, r_f=80.0)
+        system.single_cycle()
+
+        inputs['m_dot'] = 150.0
+        inputs['r_f'] = 80.0
+        sys_new = ICAES2(inputs=inputs)
+        sys_new.single_cycle()
+        self.assertEqual(len(system.data), len(sys_new.data))
+        self.assertTrue((system.data == sys_new.data).all().all())
+
+    def test_run_cycles(self):
+        results = self.sys.run_cycles(n=10, tol=1e-6)
+        self.assertTrue(results['converged'])
+        self.assertLess(results['cycles'], 10)
+        self.assertEqual(len(self.sys.data), 2 * 10 + 1)  # last cycle only
+        self.assertEqual(self.sys.record_mode, 'full')
+
+        # the last cycle starts from the state left by the previous one
+        self.sys.single_cycle()
+        self.sys.data = self.sys.data.iloc[21:]
+        self.assertAlmostEqual(self.sys.analyze_performance()['RTE'] / results['RTE'], 1.0, places=6)
+
+    # the first cycle starts from the initial state, the next ones from the lagged losses of the previous cycle
+    def test_run_cycles_differ(self):
+        m_store = self.sys.m_store
+        self.sys.single_cycle()
+        first = self.sys.analyze_performance()
+        self.sys.clear_time_series()
+        results = self.sys.run_cycles(n=10, tol=1e-9)
+        self.assertTrue(results['converged'])
+        self.assertGreater(results['cycles'], 2)
+        self.assertGreater(abs(results['RTE'] / first['RTE'] - 1.0), 1e-7)
+        self.assertAlmostEqual(self.sys.m_store / m_store, 1.0, places=12)  # leakage made up during injection
+
+    def test_run_profile(self):
+        m_dot = np.array([2.0, 2.0, 0.0, -1.0, 0.5, 0.0, -3.0]) * self.sys.m_dot
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', RuntimeWarning)  # unconverged sweeps must not warn
+            m_dot_run = self.sys.run_profile(m_dot, delta_t=np.full(len(m_dot), 2.0))
+        self.assertEqual(len(self.sys.data), len(m_dot))
+        self.assertTrue(np.all(np.abs(m_dot_run) <= self.sys.m_dot_max))
+        self.assertTrue(np.all(self.sys.data.m_store >= self.sys.m_store_min * (1.0 - 1e-12)))
+        self.assertTrue(np.all(self.sys.data.m_store <= self.sys.m_store_max_actual * (1.0 + 1e-12)))
+
+        inputs = CAES.get_default_inputs()
+        inputs['property_backend'] = 'table'  # (as in the sweeps of run_profile)
+        sys_step = CAES(inputs=inputs)
+        for m_dot_step in m_dot_run:
+            sys_step.update(m_dot=m_dot_step, delta_t=2.0)
+        for entry in ['pwr', 'p1', 'T2', 'm_store']:
+            np.testing.assert_allclose(self.sys.data[entry], sys_step.data[entry], rtol=1e-9)
+
+    def test_run_profile_speed(self):
+        # profiles are computed with tabulated air properties, faster than a loop of update
+        hours = np.arange(24 * 60)
+        m_dot = np.where(hours % 24 < 12, 0.5, -0.5) * self.sys.m_dot
+        self.sys.run_profile(m_dot[:2])  # property table built once per process
+        system = CAES(inputs=CAES.get_default_inputs())
+        start = time.perf_counter()
+        m_dot_run = system.run_profile(m_dot)
+        time_profile = time.perf_counter() - start
+        sys_step = CAES(inputs=CAES.get_default_inputs())
+        sys_step.run_profile(np.zeros(0))
+        start = time.perf_counter()
+        for m_dot_step in m_dot_run:
+            sys_step.update(m_dot=m_dot_step, delta_t=1.0)
+        self.assertLess(time_profile, time.perf_counter() - start)
+        np.testing.assert_allclose(system.data.pwr, sys_step.data.pwr, rtol=1e-6)
+
+    def test_run_profile_failed_steps(self):
+        # random profile at the Mach limit, some discharges fail (p1 <= 0, update raises a CoolProp error there)
+        for cls in [CAES, ICAES2]:
+            inputs = cls.get_default_inputs()
+            inputs['property_backend'] = 'table'
+            system = cls(inputs=inputs)
+            m_dot = np.random.default_rng(0).uniform(-1.0, 1.0, 200) * system.m_dot_max
+            m_dot_run = system.run_profile(m_dot)
+            data = system.data
+            failed = ~np.isfinite(data.pwr) | ~(data.p1 > 0.0)
+            self.assertTrue(failed.any())
+            self.assertTrue(data.error_msg[failed].str.startswith('Error').all())
+            self.assertEqual(system.analyze_performance()['errors'], 'true')
+
+            # time steps before the first failed one as with update
+            first = np.flatnonzero(failed)[0]
+            sys_step = cls(inputs=inputs)
+            sys_step.run_profile(np.zeros(0))
+            for m_dot_step in m_dot_run[:first]:
+                sys_step.update(m_dot=m_dot_step, delta_t=1.0)
+            for entry in ['pwr', 'p1', 'T2']:
+                np.testing.assert_allclose(data[entry][:first], sys_step.data[entry], rtol=1e-9)
+
+    def test_update_power(self):
+        power = [-20e3, -25e3, 0.0, 15e3, 10e3, 30e3]  # [kW], the last request empties the storage
+        inputs = ICAES2.get_default_inputs()
+        system = ICAES2(inputs=inputs)
+        system.run_profile(np.zeros(1))  # storage limits as in run_profile
+        m_dot = [system.update_power(power_step) for power_step in power]
+        for i in [0, 1, 3, 4]:
+            self.assertAlmostEqual(system.data.pwr[i + 1] / abs(power[i]), 1.0, places=9)
+        self.assertEqual(system.data.m_air[3], 0.0)
+        self.assertLess(system.data.pwr[6], power[5])
+        self.assertAlmostEqual(system.m_store / system.m_store_min, 1.0, places=9)
+
+        sys_profile = ICAES2(inputs=inputs)
+        m_dot_profile = sys_profile.run_profile(power=[0.0] + power)
+        np.testing.assert_allclose(m_dot_profile[1:], m_dot, rtol=1e-8)
+        np.testing.assert_allclose(sys_profile.data.pwr, system.data.pwr, rtol=1e-8)
+
+    def test_derived_parameters(self):
+        inputs = ICAES2.get_default_inputs()
+        system = ICAES2(inputs=inputs)
+        air_props = system.air_props
+        system.reset(k=20.0)  # only the flow losses depend on permeability
+        self.assertIs(system.air_props, air_props)
+        self.assertIn('p_store_max', vars(system))
+        self.assertNotIn('PR_cmp', vars(system))
+
+        system.depth = 1200.0  # clears the storage limits and everything downstream
+        self.assertNotIn('p_store_max', vars(system))
+        self.assertNotIn('p_machine_design', vars(system))
+
+        inputs['k'] = 20.0
+        inputs['depth'] = 1200.0
+        sys_new = ICAES2(inputs=inputs)
+        for name in ['p_store_max', 'm_store_max', 'p_machine_design', 'm_dot_max', 'PR_cmp', 'PR_exp']:
+            self.assertEqual(getattr(system, name), getattr(sys_new, name))
+
+    def test_time_step_items(self):
+        s = self.sys.time_step()
+        s['p0'] = 1.0
+        self.assertEqual(s.p0, 1.0)
+        with self.assertRaises(KeyError):
+            s['not_an_entry'] = 1.0
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+import numpy as np
+import pandas as pd
+from caes import CAES, ICAES, ICAES2, BatchCAES, BatchICAES2
+from caes.batch import LayoutError, run_single_cycles
+
+
+class TestBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.df = pd.DataFrame({'depth': [1000.0, 1402.35, 1800.0], 'k': [38.67, 100.0, 20.0],
+                                'm_dot': [400.0, 574.3625466, 300.0], 'steps': 10})
+
+    def check(self, cls, batch_cls):
+        batch = batch_cls(inputs=self.df)
+        batch.single_cycle()
+        results = batch.analyze_performance()
+        for i in self.df.index:
+            inputs = cls.get_default_inputs()
+            for entry in self.df.columns:
+                inputs[entry] = self.df.loc[i, entry]
+            system = cls(inputs=inputs)
+            system.single_cycle()
+            expected = system.analyze_performance()
+            for entry in ['RTE', 'kWh_in', 'kWh_out', 'kW_in_avg', 'dp_well_avg', 'T_cmp_out_avg']:
+                self.assertAlmostEqual(results.loc[i, entry] / expected[entry], 1.0, places=9)
+            self.assertEqual(results.loc[i, 'errors'], expected['errors'])
+
+    def test_caes(self):
+        self.check(CAES, BatchCAES)
+
+    def test_icaes2(self):
+        self.check(ICAES2, BatchICAES2)
+
+    # only the storage and design point are recomputed
+    def test_reset(self):
+        batch = BatchICAES2(inputs=self.df)
+        batch.single_cycle()
+        water_props = batch.water_props  # (created once by __init__)
+        k = [20.0, 60.0, 200.0]
+        batch.reset(k=np.array(k), r_f=150.0)
+        self.assertIs(batch.water_props, water_props)
+        batch.single_cycle()
+        df = self.df.assign(k=k, r_f=150.0)
+        batch_new = BatchICAES2(inputs=df)
+        batch_new.single_cycle()
+        pd.testing.assert_frame_equal(batch.analyze_performance(), batch_new.analyze_performance())
+
+    def test_layout(self):
+        with self.assertRaises(LayoutError):
+            BatchICAES2(inputs=pd.DataFrame({'n_cmp2': [1.1, -1.0]}))
+
+    def test_unknown_input(self):
+        with self.assertRaises(ValueError):
+            run_single_cycles(pd.DataFrame({'depht': [1000.0, 1500.0]}), model=ICAES2)
+
+    def test_error_msg(self):
+        # ICAES has no batch version, rows are run one at a time
+        results = run_single_cycles(pd.DataFrame({'m_dot': [100.0, 0.0], 'steps': 10}), model=ICAES)
+        self.assertEqual(results.loc[0, 'errors'], 'false')
+        self.assertEqual(results.loc[0, 'error_msg'], '')
+        self.assertEqual(results.loc[1, 'errors'], 'true')
+        self.assertTrue(results.loc[1, 'error_msg'].startswith('ValueError'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,36 @@
+import unittest
+import numpy as np
+from caes import property_backend
+
+
+class TestFluidProperties(unittest.TestCase):
+
+    def setUp(self):
+        self.outputs = ('D', 'V', 'Z', 'PRANDTL', 'CONDUCTIVITY', 'CPMASS')
+        self.direct = property_backend('direct')
+        self.T = np.array([290.0, 315.3, 455.7])  # [K]
+        self.p = np.array([0.2e6, 14.02e6, 17.91e6])  # [Pa]
+
+    def check(self, backend, tol):
+        for T, p in zip(self.T, self.p):
+            for value, expected in zip(backend.props(self.outputs, T, p), self.direct.props(self.outputs, T, p)):
+                self.assertLess(abs(value / expected - 1.0), tol)
+
+    def test_cached(self):
+        self.check(property_backend('cached', tol=1e-6), tol=1e-5)
+
+    def test_table(self):
+        self.check(property_backend('table', p_max=20.0e6, tol=1e-6), tol=1e-5)
+
+    def test_table_arrays(self):
+        table = property_backend('table', p_max=20.0e6, tol=1e-6)
+        T = np.append(self.T, 900.0)  # last point outside the table envelope
+        p = np.append(self.p, 1.0e6)
+        rho, mu = table.props(('D', 'V'), T, p)
+        rho_direct, mu_direct = self.direct.props(('D', 'V'), T, p)
+        self.assertTrue(np.allclose(rho, rho_direct, rtol=1e-5))
+        self.assertTrue(np.allclose(mu, mu_direct, rtol=1e-5))
+
+
+if __name__ == '__main__':
+    unittest.main()
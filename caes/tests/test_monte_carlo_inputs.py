@@ -0,0 +1,46 @@
+import unittest
+import numpy as np
+import pandas as pd
+from caes import Sampler
+
+
+class TestSampler(unittest.TestCase):
+
+    def setUp(self):
+        self.distributions = pd.DataFrame({'Distribution': ['triangle', 'uniform', 'lognormal', 'constant'],
+                                           'Average': [10.0, np.nan, np.nan, 1.1],
+                                           'Low': [9.42, np.nan, np.nan, np.nan],
+                                           'High': [11.1, np.nan, np.nan, np.nan],
+                                           'Stdev': [np.nan, np.nan, 2.448, np.nan]},
+                                          index=['p_hydro_grad', 'depth_m', 'permeability_mD', 'n_cmp1'])
+        self.sites = pd.DataFrame({'depth_m': [1000.0, 1500.0, 2000.0], 'permeability_mD': [10.0, 100.0, 500.0]},
+                                  index=[5, 9, 12])
+        self.site_values = {'depth_m': {'Low': 0.9 * self.sites['depth_m'], 'High': 1.1 * self.sites['depth_m']},
+                            'permeability_mD': {'Average': np.log(self.sites['permeability_mD'])}}
+
+    def sample(self, method, seed=0):
+        sampler = Sampler(self.distributions, seed=seed, method=method)
+        return sampler.sample(16, sites=self.sites[[]], site_values=self.site_values)
+
+    def test_reproducible(self):
+        for method in ['mc', 'lhs', 'sobol']:
+            df = self.sample(method)
+            self.assertEqual(len(df), 3 * 16)
+            self.assertEqual(list(df.columns), ['site', 'iteration', 'p_hydro_grad', 'depth_m', 'permeability_mD',
+                                                'n_cmp1'])
+            pd.testing.assert_frame_equal(df, self.sample(method))
+            self.assertFalse(df.equals(self.sample(method, seed=1)))
+
+    def test_site_values(self):
+        df = self.sample('lhs')
+        self.assertTrue((df['n_cmp1'] == 1.1).all())
+        for site, depth in self.sites['depth_m'].items():
+            values = df.loc[df.site == site, 'depth_m']
+            self.assertTrue(values.between(0.9 * depth, 1.1 * depth).all())
+            # one draw in each of the 16 equal probability intervals
+            strata = np.floor((values - 0.9 * depth) / (0.2 * depth) * 16)
+            self.assertEqual(sorted(strata), list(range(16)))
+
+
+if __name__ == '__main__':
+    unittest.main()
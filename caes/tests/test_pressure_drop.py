@@ -0,0 +1,60 @@
+import unittest
+import numpy as np
+from math import log10
+from caes import friction_coeff, pipe_fric_dp, pipe_grav_dp, aquifer_dp
+from caes import pipe_heat_transfer_subsurface, pipe_heat_transfer_ocean
+
+
+class TestPressureDrop(unittest.TestCase):
+
+    def test_friction_coeff(self):
+        epsilon = 0.002 * 1e-3  # [m]
+        d = 0.41  # [m]
+        for Re in [5.0e3, 1.0e5, 1.0e7, 3.0e8]:
+            x = 1.0 / friction_coeff(Re=Re, epsilon=epsilon, d=d) ** 0.5
+            self.assertAlmostEqual(x, -2.0 * log10((epsilon / d) / 3.7 + 2.51 * x / Re), places=12)  # Colebrook
+
+    def test_friction_coeff_array(self):
+        Re = np.array([0.0, 1000.0, 5.0e3, 1.0e7])
+        epsilon = np.array([0.002, 0.004, 0.006, 0.1]) * 1e-3
+        f = friction_coeff(Re=Re, epsilon=epsilon, d=0.41)
+        for i in range(len(Re)):
+            self.assertEqual(f[i], friction_coeff(Re=Re[i], epsilon=epsilon[i], d=0.41))
+
+    def test_pipe_fric_dp_array(self):
+        m_dot = np.array([0.0, 100.0, -300.0])
+        dp, f = pipe_fric_dp(m_dot=m_dot)
+        for i in range(len(m_dot)):
+            self.assertAlmostEqual(dp[i], pipe_fric_dp(m_dot=m_dot[i])[0], places=12)
+        self.assertEqual(dp[0], 0.0)
+
+    def test_aquifer_dp_array(self):
+        Q = np.array([0.1, 1.0, 100.0])  # last entry is infeasible [m3/s]
+        k = np.array([2.0, 50.0, 100.0])  # [mD]
+        dp = aquifer_dp(Q=Q, k=k)
+        for i in range(len(Q)):
+            self.assertAlmostEqual(dp[i], aquifer_dp(Q=Q[i], k=k[i]), places=12)
+        self.assertEqual(dp[2], 1e12)
+
+    def test_pipe_heat_transfer_array(self):
+        Tm = np.array([280.0, 300.0, 330.0])  # [K]
+        m_dot = np.array([100.0, -50.0, 0.0])  # [kg/s]
+        for pipe_heat_transfer in [pipe_heat_transfer_subsurface, pipe_heat_transfer_ocean]:
+            delta_T = pipe_heat_transfer(Tm=Tm, m_dot=m_dot)
+            for i in range(2):
+                self.assertAlmostEqual(delta_T[i], pipe_heat_transfer(Tm=Tm[i], m_dot=m_dot[i]), places=12)
+            self.assertEqual(delta_T[2], 0.0)
+            self.assertEqual(pipe_heat_transfer(Tm=330.0, m_dot=0.0), 0.0)
+
+    # floats in, floats out (the array kernels unwrapped)
+    def test_scalar_types(self):
+        self.assertIsInstance(friction_coeff(Re=1.0e5), float)
+        self.assertIsInstance(pipe_fric_dp(m_dot=100.0)[1], float)
+        self.assertIsInstance(aquifer_dp(Q=1.0), float)
+        self.assertIsInstance(pipe_grav_dp(m_dot=-100.0), float)
+        self.assertIsInstance(pipe_heat_transfer_subsurface(), float)
+        self.assertIsInstance(pipe_heat_transfer_ocean(), float)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+from caes import CAES, ICAES, Runner
+from caes.batch import run_single_cycles
+
+
+def failing_cycles(df, fail=None, model=CAES):
+    # run_single_cycles that fails for the chunk with the row fail
+    if fail in df.index:
+        raise RuntimeError('node failure')
+    return run_single_cycles(df, model=model)
+
+
+class TestRunner(unittest.TestCase):
+
+    def setUp(self):
+        self.df = pd.DataFrame({'depth': np.linspace(1000.0, 1500.0, 10), 'k': np.geomspace(20.0, 200.0, 10),
+                                'steps': 10})
+        self.filename = os.path.join(tempfile.mkdtemp(), 'results.sqlite')
+        self.rows_run = []
+
+    def func(self, df, fail=None):
+        if fail is not None and fail in df.index:
+            raise RuntimeError('node failure')
+        self.rows_run.extend(df.index)
+        return run_single_cycles(df, model=CAES)
+
+    def test_resume(self):
+        runner = Runner(self.func, filename=self.filename, chunk=3, verbose=False, fail=7)
+        with self.assertRaises(RuntimeError):
+            runner.run(self.df)
+        self.assertEqual(self.rows_run, [0, 1, 2, 3, 4, 5])
+
+        # the restarted job only runs the chunks that were not stored
+        runner = Runner(self.func, filename=self.filename, chunk=3, verbose=False)
+        results = runner.run(self.df)
+        self.assertEqual(self.rows_run, list(range(10)))
+        self.assertEqual(list(results.index), list(self.df.index))
+        np.testing.assert_allclose(results['depth'], self.df['depth'])
+        expected = run_single_cycles(self.df, model=CAES)
+        np.testing.assert_allclose(results['RTE'], expected['RTE'], rtol=1e-12)
+
+        runner.run(self.df.iloc[::-1])  # all rows are stored
+        self.assertEqual(len(self.rows_run), 10)
+
+    def test_workers(self):
+        expected = run_single_cycles(self.df, model=CAES)
+        for arrays in ['shared', 'memmap', None]:
+            filename = self.filename.replace('results', 'results_' + str(arrays))
+            runner = Runner(run_single_cycles, filename=filename, chunk=3, n_jobs=2, arrays=arrays, verbose=False,
+                            model=CAES)
+            results = runner.run(self.df)
+            np.testing.assert_allclose(results['RTE'], expected['RTE'], rtol=1e-12)
+            self.assertEqual(list(results['errors']), list(expected['errors']))
+            self.assertEqual(list(results['steps']), [10] * 10)
+
+    # the chunks that finish after a failed chunk are stored
+    def test_workers_failure(self):
+        for arrays in ['shared', None]:
+            filename = self.filename.replace('results', 'results_failure_' + str(arrays))
+            runner = Runner(failing_cycles, filename=filename, chunk=3, n_jobs=2, arrays=arrays, verbose=False, fail=0)
+            with self.assertRaises(RuntimeError):
+                runner.run(self.df)
+            results = runner.results(self.df)
+            self.assertTrue(results['RTE'].iloc[:3].isna().all())
+            self.assertTrue(results['RTE'].iloc[3:9].notna().all())  # chunks already sent to the workers
+
+    # text results (error_msg) are kept with shared arrays
+    def test_workers_error_msg(self):
+        df = pd.DataFrame({'depth': [1000.0, 1200.0, 1.0e6, 1400.0], 'steps': 10})
+        expected = run_single_cycles(df, model=ICAES)
+        self.assertNotEqual(expected.loc[2, 'error_msg'], '')
+        for n_jobs, arrays in [(1, None), (2, 'shared'), (2, 'memmap'), (2, None)]:
+            filename = self.filename.replace('results', 'results_' + str(n_jobs) + '_' + str(arrays))
+            runner = Runner(run_single_cycles, filename=filename, chunk=2, n_jobs=n_jobs, arrays=arrays, verbose=False,
+                            model=ICAES)
+            results = runner.run(df)
+            self.assertEqual(list(results['error_msg']), list(expected['error_msg']))
+            self.assertEqual(list(results['errors']), list(expected['errors']))
+
+
+if __name__ == '__main__':
+    unittest.main()
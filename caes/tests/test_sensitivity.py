@@ -0,0 +1,49 @@
+import unittest
+import numpy as np
+import pandas as pd
+from caes import CAES, Sensitivity
+from caes.sensitivity import sobol_indices
+
+
+class TestSensitivity(unittest.TestCase):
+
+    def setUp(self):
+        distributions = pd.DataFrame({'Distribution': ['uniform', 'lognormal', 'constant'],
+                                      'Average': [np.nan, np.log(38.67), 0.01],
+                                      'Low': [1000.0, np.nan, np.nan],
+                                      'High': [1500.0, np.nan, np.nan],
+                                      'Stdev': [np.nan, 0.5, np.nan]}, index=['depth', 'k', 'loss_m_air'])
+        self.analysis = Sensitivity(distributions, model=CAES, fixed_inputs={'steps': 10})
+
+    def test_sobol_indices(self):
+        # y = x1 + 2 * x2 with uniform inputs: S1 = ST = [0.2, 0.8]
+        rng = np.random.default_rng(0)
+        A = rng.random((4096, 2))
+        B = rng.random((4096, 2))
+        AB = np.array([np.column_stack([B[:, 0], A[:, 1]]), np.column_stack([A[:, 0], B[:, 1]])])
+        indices = sobol_indices(A[:, 0] + 2.0 * A[:, 1], B[:, 0] + 2.0 * B[:, 1], AB[:, :, 0] + 2.0 * AB[:, :, 1],
+                                seed=0)
+        np.testing.assert_allclose(indices['ST'], [0.2, 0.8], atol=0.05)
+        np.testing.assert_allclose(indices['S1'], [0.2, 0.8], atol=0.1)
+        self.assertTrue(np.all(indices['S1_low'] < indices['S1']) and np.all(indices['S1'] < indices['S1_high']))
+
+    def test_sobol(self):
+        self.assertEqual(self.analysis.variables, ['depth', 'k'])
+        self.assertEqual(self.analysis.fixed_inputs['loss_m_air'], 0.01)
+        results = self.analysis.sobol(n=16, seed=0, n_boot=100)
+        self.assertEqual(len(results), 3 * 2)
+        self.assertEqual(self.analysis.calls, 16 * (2 + 2))
+
+        # the first 16 base samples are the same with n = 32, only the new ones are run
+        self.analysis.sobol(n=32, seed=0, n_boot=100)
+        self.assertEqual(self.analysis.calls, 32 * (2 + 2))
+
+    def test_morris(self):
+        results = self.analysis.morris(r=5, seed=0)
+        self.assertLessEqual(self.analysis.calls, 5 * (2 + 1))
+        rte = results[results.output == 'RTE'].set_index('variable')
+        self.assertTrue(np.all(rte['mu_star'] >= np.abs(rte['mu'])))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import os
+import tempfile
+import unittest
+import pandas as pd
+from caes import CAES
+from caes.sinks import output_sink, HDF5Sink
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+try:
+    import tables
+except ImportError:
+    tables = None
+
+
+class TestSinks(unittest.TestCase):
+
+    def setUp(self):
+        self.dirname = tempfile.mkdtemp()
+
+    def run_cycle(self, sink, filename):
+        inputs = CAES.get_default_inputs()
+        inputs['steps'] = 10
+        inputs['output_sink'] = sink
+        inputs['output_file'] = filename
+        inputs['output_chunk'] = 4
+        system = CAES(inputs=inputs)
+        system.single_cycle()
+        return system
+
+    def test_output_file_required(self):
+        for sink in ['parquet', 'hdf5']:
+            with self.assertRaises(ValueError):
+                output_sink(sink, '')
+
+    def test_output_file_type(self):
+        filename = os.path.join(self.dirname, 'results.h5')
+        open(filename, 'w').close()
+        with self.assertRaises(ValueError):
+            output_sink('parquet', filename)
+        with self.assertRaises(ValueError):
+            output_sink('hdf5', self.dirname)
+
+    # only the parts of the sink's own dataset are removed
+    def test_parquet_open_keeps_files(self):
+        filename = os.path.join(self.dirname, 'part-000000.parquet')
+        open(filename, 'w').close()
+        sink = output_sink('parquet', self.dirname)
+        sink.open(['m_air'])
+        self.assertTrue(os.path.exists(filename))
+        self.assertEqual(len(sink.read()), 0)
+
+    @unittest.skipIf(pyarrow is None, 'requires pyarrow')
+    def test_parquet(self):
+        system = self.run_cycle('memory', '')
+        sys_parquet = self.run_cycle('parquet', self.dirname)
+        data = sys_parquet.data
+        self.assertEqual(len(data), 2 * 10 + 1)
+        self.assertEqual(sys_parquet.sink.parts, 6)
+        pd.testing.assert_frame_equal(data, system.data, check_dtype=False)
+
+        # a second run replaces the dataset
+        sys_parquet = self.run_cycle('parquet', self.dirname)
+        self.assertEqual(len(sys_parquet.data), 2 * 10 + 1)
+
+    @unittest.skipIf(tables is None, 'requires pytables')
+    def test_hdf5(self):
+        system = self.run_cycle('memory', '')
+        sys_hdf5 = self.run_cycle('hdf5', os.path.join(self.dirname, 'results.h5'))
+        self.assertEqual(len(sys_hdf5.data), 2 * 10 + 1)
+        pd.testing.assert_frame_equal(sys_hdf5.data.reset_index(drop=True), system.data, check_dtype=False)
+
+    # messages longer than the column are truncated
+    @unittest.skipIf(tables is None, 'requires pytables')
+    def test_hdf5_msg_length(self):
+        sink = HDF5Sink(os.path.join(self.dirname, 'results.h5'), msg_length=10)
+        sink.open(['m_air', 'error_msg'])
+        sink.write(pd.DataFrame({'m_air': [1.0, 2.0], 'error_msg': ['', 'Error: first chunk']}))
+        sink.write(pd.DataFrame({'m_air': [3.0], 'error_msg': ['Error: a longer second chunk']}))
+        data = sink.read()
+        self.assertEqual(list(data['error_msg']), ['', 'Error: first chunk', 'Error: a longer se'])
+
+
+if __name__ == '__main__':
+    unittest.main()
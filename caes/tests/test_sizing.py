@@ -0,0 +1,70 @@
+import unittest
+import numpy as np
+import pandas as pd
+from caes import ICAES, size_system, WarmStarts
+
+
+class TestSizing(unittest.TestCase):
+
+    def test_size_system(self):
+        site_inputs = {'depth': 1402.35, 'h': 62.44, 'phi': 0.2292, 'k': 38.33}
+        results = size_system(target_MW=50.0, target_MWh=500.0, site_inputs=site_inputs, model=ICAES)
+        error = abs(results['kW_out_avg'] / 50.0e3 - 1.0) + abs(results['kWh_out'] / 500.0e3 - 1.0)
+        self.assertLessEqual(error, 1e-6)
+        self.assertLess(results['iterations'], 15)
+        self.assertEqual(results['errors'], 'false')
+        self.assertEqual(results['error_msg'], '')
+
+    def test_error_msg(self):
+        results = size_system(target_MW=50.0, target_MWh=500.0, site_inputs={'depth': -1000.0}, model=ICAES)
+        self.assertFalse(results['converged'])
+        self.assertEqual(results['errors'], 'true')
+        self.assertTrue(results['error_msg'].startswith('ValueError'))
+
+    def test_warm_starts(self):
+        warm_starts = WarmStarts()
+        site_inputs = {'depth': 1402.35, 'h': 62.44, 'phi': 0.2292, 'k': 38.33}
+        cold = size_system(target_MW=50.0, target_MWh=500.0, site_inputs=site_inputs, model=ICAES,
+                           warm_starts=warm_starts)
+        self.assertEqual(len(warm_starts), 1)
+
+        site_inputs = {'depth': 1380.0, 'h': 60.0, 'phi': 0.22, 'k': 40.0}  # neighbouring site
+        warm = size_system(target_MW=100.0, target_MWh=1000.0, site_inputs=site_inputs, model=ICAES,
+                           warm_starts=warm_starts)
+        self.assertTrue(warm['converged'])
+        self.assertLess(warm['iterations'], cold['iterations'])
+
+    def test_warm_starts_default_site(self):
+        # no site_inputs, the warm starts use the default inputs of the model
+        warm_starts = WarmStarts()
+        results = size_system(target_MW=50.0, target_MWh=500.0, model=ICAES, warm_starts=warm_starts)
+        self.assertTrue(results['converged'])
+        self.assertEqual(len(warm_starts), 1)
+        inputs = ICAES.get_default_inputs()
+        m_dot, r_f = warm_starts.guess(inputs, 50.0, 500.0)
+        self.assertAlmostEqual(m_dot, results['m_dot'])
+        self.assertAlmostEqual(r_f, results['r_f'])
+
+    def test_warm_starts_baseline_results(self):
+        # results saved before size_system was used: no converged column, errors only set for failed rows
+        df = pd.DataFrame({'depth_m': [1402.35, 1380.0, 1500.0, 1600.0, 1700.0],
+                           'thickness_m': [62.44, 60.0, 50.0, 40.0, 30.0],
+                           'porosity': [0.2292, 0.22, 0.2, 0.18, 0.16],
+                           'permeability_mD': [38.33, 40.0, 30.0, 20.0, 10.0],
+                           'capacity_MW': [50.0, 50.0, 50.0, 50.0, 50.0],
+                           'duration_hr': [10.0, 10.0, 10.0, 10.0, 10.0],
+                           'kW_out_avg': [50.0e3, 50.0e3, 40.0e3, np.nan, 50.0e3],
+                           'kWh_out': [500.0e3, 500.0e3, 400.0e3, np.nan, 500.0e3],
+                           'm_dot': [120.0, 125.0, 100.0, 10.0, np.nan],
+                           'r_f': [200.0, 210.0, 180.0, 10.0, np.nan],
+                           'errors': [np.nan, np.nan, True, np.nan, np.nan]})
+        warm_starts = WarmStarts()
+        warm_starts.add_results(df)
+        self.assertEqual(len(warm_starts), 2)
+        m_dot, r_f = warm_starts.guess({'depth': 1402.35, 'h': 62.44, 'phi': 0.2292, 'k': 38.33}, 50.0, 500.0)
+        self.assertAlmostEqual(m_dot, 120.0)
+        self.assertAlmostEqual(r_f, 200.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
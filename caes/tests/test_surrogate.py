@@ -0,0 +1,63 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+from caes import CAES, Surrogate
+from caes.sizing import size_system
+
+
+class TestSurrogate(unittest.TestCase):
+
+    def setUp(self):
+        self.surrogate = Surrogate(bounds={'depth': (1000.0, 1500.0), 'k': (20.0, 200.0)}, model=CAES,
+                                   fixed_inputs={'steps': 10})
+        self.surrogate.train(n=40, seed=0)
+
+    def test_predict(self):
+        df = self.surrogate.design(n=5, seed=1)
+        expected = self.surrogate.evaluate(df)
+        results = self.surrogate.predict(df)
+        self.assertTrue(results['surrogate'].all())
+        for output in self.surrogate.outputs:
+            self.assertLess(self.surrogate.errors[output], 1e-2)
+            np.testing.assert_allclose(results[output], expected[output], rtol=1e-2)
+
+    def test_fallback(self):
+        df = pd.DataFrame({'depth': [1200.0, 2000.0], 'k': [50.0, 50.0]})
+        results = self.surrogate.predict(df)
+        self.assertEqual(list(results['surrogate']), [True, False])
+        expected = self.surrogate.evaluate(df.iloc[1:])
+        self.assertEqual(results.loc[1, 'RTE'], expected.loc[1, 'RTE'])
+        self.assertTrue(np.isnan(self.surrogate.predict(df, fallback=False).loc[1, 'RTE']))
+
+    # sizing outputs are evaluated with size_system
+    def test_sizing_outputs(self):
+        df = pd.DataFrame({'depth': [1200.0, 2000.0], 'k': [50.0, 50.0]})
+        surrogate = Surrogate(bounds=self.surrogate.bounds, model=CAES, outputs=('RTE', 'm_dot', 'r_f'),
+                              fixed_inputs={'steps': 10})
+        with self.assertRaises(ValueError):
+            surrogate.evaluate(df)
+
+        surrogate = Surrogate(bounds=self.surrogate.bounds, model=CAES, outputs=('RTE', 'm_dot', 'r_f'),
+                              fixed_inputs={'steps': 10}, targets=(100.0, 1000.0))
+        surrogate.train(n=20, seed=0)
+        results = surrogate.predict(df)
+        self.assertEqual(list(results['surrogate']), [True, False])
+        expected = size_system(100.0, 1000.0, site_inputs={'depth': 2000.0, 'k': 50.0, 'steps': 10}, model=CAES)
+        for output in surrogate.outputs:
+            self.assertAlmostEqual(results.loc[1, output] / expected[output], 1.0, places=12)
+        np.testing.assert_allclose(results.loc[0, ['m_dot', 'r_f']].astype(float),
+                                   surrogate.evaluate(df.iloc[:1]).loc[0, ['m_dot', 'r_f']].astype(float), rtol=1e-2)
+
+    def test_save(self):
+        df = self.surrogate.design(n=5, seed=1)
+        filename = os.path.join(tempfile.mkdtemp(), 'surrogate.json')
+        self.surrogate.save(filename)
+        surrogate = Surrogate.load(filename)
+        self.assertEqual(surrogate.errors, self.surrogate.errors)
+        pd.testing.assert_frame_equal(surrogate.predict(df), self.surrogate.predict(df))
+
+
+if __name__ == '__main__':
+    unittest.main()
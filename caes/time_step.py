@@ -0,0 +1,55 @@
+import pandas as pd
+
+
+class TimeStep:
+    """
+    results of a single time step, passed between CAES.update and charge_perf/discharge_perf/update_storage_pressure
+
+    entries are the same as attributes_time_series and can be accessed as attributes (s.p0) or, for subclasses written
+    against the previous pandas Series interface, as items (s['p0'])
+
+    use time_step_class to create the class for a given set of attributes
+    """
+    __slots__ = ()
+
+    def __init__(self):
+        for entry in self.__slots__:
+            setattr(self, entry, 0.0)
+        self.error_msg = ''
+
+    def __getitem__(self, entry):
+        try:
+            return getattr(self, entry)
+        except AttributeError:
+            raise KeyError(entry)
+
+    def __setitem__(self, entry, value):
+        try:
+            setattr(self, entry, value)
+        except AttributeError:
+            raise KeyError(str(entry) + ' is not in attributes_time_series')
+
+    def to_series(self):
+        """
+        :return: pandas Series with one entry per attribute
+        """
+        return pd.Series({entry: getattr(self, entry) for entry in self.__slots__})
+
+    def update_from_series(self, s):
+        """
+        copies the entries of a pandas Series (e.g. returned by a subclass using the previous interface)
+        :param s: pandas Series
+        :return: self
+        """
+        for entry in s.index:
+            self[entry] = s[entry]
+        return self
+
+
+def time_step_class(attributes):
+    """
+    creates a TimeStep class with one slot per attribute
+    :param attributes: list of entries (e.g. attributes_time_series), must include 'error_msg'
+    :return: TimeStep subclass
+    """
+    return type('TimeStep', (TimeStep,), {'__slots__': tuple(attributes)})
@@ -1,9 +1,10 @@
-from CoolProp.CoolProp import PropsSI
+from CoolProp.CoolProp import PT_INPUTS
 from scipy.interpolate import interp1d
 from math import pi
 import pandas as pd
 import numpy as np
 import math
+from .fluid_properties import abstract_state
 
 
 def size_caes_trb(p_in=1.01325, t_in=400.0, t_out=20.0, p_out=1.01325, m_dot=2.2, RPM_low=10000, RPM_high=50000,
@@ -58,13 +59,15 @@ def size_caes_trb(p_in=1.01325, t_in=400.0, t_out=20.0, p_out=1.01325, m_dot=2.2
     # Constants and Fluid Properties
     g = 9.81  # m/s^2
     fluid = 'Air'
-    CP = PropsSI('CPMASS', "T", t_out, "P", p_out, fluid) / 1000.0  # KJ/Kg-K
-    CV = PropsSI('CVMASS', "T", t_out, "P", p_out, fluid) / 1000.0  # KJ/Kg-K
+    state = abstract_state(fluid)  # single flash for all properties
+    state.update(PT_INPUTS, p_out, t_out)
+    CP = state.cpmass() / 1000.0  # KJ/Kg-K
+    CV = state.cvmass() / 1000.0  # KJ/Kg-K
     kappa = CP / CV
-    MW = PropsSI('M', fluid) * 1000.0  # kg/kmol
-    R_bar = PropsSI('GAS_CONSTANT', fluid)  # kJ/kmol/K
+    MW = state.molar_mass() * 1000.0  # kg/kmol
+    R_bar = state.gas_constant()  # kJ/kmol/K
     R = R_bar / MW * 1000.0  # J/kg-K
-    D3 = PropsSI('D', 'T', t_out, 'P', p_out, fluid)  # Density (kg/m3)
+    D3 = state.rhomass()  # Density (kg/m3)
     V3 = m_dot * D3  # m3/s
 
     # Print-out values, if debugging
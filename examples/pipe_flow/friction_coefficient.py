@@ -17,42 +17,25 @@ m_dots = np.arange(0.0, 420, 20)  # flow rates [kg/s]
 epsilons = np.arange(0.002, 0.0061, 0.002) * 1.0e-3  # roughness [m]
 pressures = np.arange(10.0, 15.0, 1.0)  # pressures [MPa]
 
-# dataframe to store results
-attributes = ['T', 'p', 'epsilon', 'd', 'm_dot', 'rho', 'mu',  # inputs
-              'A', 'U', 'Re', 'f']  # results
-df = pd.DataFrame(columns=attributes)
-
-# perform parameter sweep
-for m_dot in m_dots:
-    for epsilon in epsilons:
-        for p in pressures:
-            # fluid properties, inputs are degrees K and Pa
-            rho = CP.PropsSI('D', 'T', T, 'P', p * 1e6, "Air.mix")  # density [kg/m3]
-            mu = CP.PropsSI('V', 'T', T, 'P', p * 1e6, "Air.mix")  # viscosity [Pa*s]
-
-            # velocity
-            A = pi / 4.0 * d ** 2.0  # pipe cross-sectional area [m^2]
-            U = m_dot / (rho * A)  # velocity [m/s]
-
-            # Reynolds number
-            Re = rho * d * abs(U) / mu
-
-            f = friction_coeff(Re=Re, epsilon=epsilon, d=d)
-
-            # save results
-            s = pd.Series(index=attributes)
-            s['T'] = T
-            s['p'] = p
-            s['epsilon'] = epsilon
-            s['d'] = d
-            s['m_dot'] = m_dot
-            s['rho'] = rho
-            s['mu'] = mu
-            s['A'] = A
-            s['U'] = U
-            s['Re'] = Re
-            s['f'] = f
-            df = df.append(s, ignore_index=True)
+# perform parameter sweep, all combinations as arrays
+m_dot, epsilon, p = [x.ravel() for x in np.meshgrid(m_dots, epsilons, pressures, indexing='ij')]
+
+# fluid properties, inputs are degrees K and Pa
+rho = CP.PropsSI('D', 'T', T, 'P', p * 1e6, "Air.mix")  # density [kg/m3]
+mu = CP.PropsSI('V', 'T', T, 'P', p * 1e6, "Air.mix")  # viscosity [Pa*s]
+
+# velocity
+A = pi / 4.0 * d ** 2.0  # pipe cross-sectional area [m^2]
+U = m_dot / (rho * A)  # velocity [m/s]
+
+# Reynolds number
+Re = rho * d * abs(U) / mu
+
+f = friction_coeff(Re=Re, epsilon=epsilon, d=d)
+
+# save results
+df = pd.DataFrame({'T': T, 'p': p, 'epsilon': epsilon, 'd': d, 'm_dot': m_dot, 'rho': rho, 'mu': mu,  # inputs
+                   'A': A, 'U': U, 'Re': Re, 'f': f})  # results
 
 # plot
 sns.set_context('paper')
@@ -18,38 +18,18 @@ p_fs = [12.0]  # [MPa]
 ks = [2.0, 5.0, 10.0, 50.0, 100.0]  # [mD] (range based on Sopher et al. 2019)
 r_fs = [100]  # [m]
 
-attributes = ['Q', 'p_f', 'r_f', 'r_w', 'k', 'h', 'mu', 'T', 'Z', 'm_dot', 'delta_p', 'rho']
-df = pd.DataFrame(columns=attributes)
+# perform parameter sweep, all combinations as arrays
+p_f, r_f, k, m_dot = [x.ravel() for x in np.meshgrid(p_fs, r_fs, ks, m_dots, indexing='ij')]
 
-for p_f in p_fs:
+rho = CP.PropsSI('D', 'T', T, 'P', p_f * 1e6, 'AIR.MIX')  # [kg/m3] inputs are degrees K and Pa
+mu = CP.PropsSI('V', 'T', T, 'P', p_f * 1e6, 'AIR.MIX') * 1000  # convert Pa*s (output) to cP
+Z = CP.PropsSI('Z', 'T', T, 'P', p_f * 1e6, 'AIR.MIX')
 
-    rho = CP.PropsSI('D', 'T', T, 'P', p_f * 1e6, 'AIR.MIX')  # [kg/m3] inputs are degrees K and Pa
-    mu = CP.PropsSI('V', 'T', T, 'P', p_f * 1e6, 'AIR.MIX') * 1000  # convert Pa*s (output) to cP
-    Z = CP.PropsSI('Z', 'T', T, 'P', p_f * 1e6, 'AIR.MIX')
+Q = m_dot / rho
+delta_p = aquifer_dp(Q=Q, p_f=p_f, r_f=r_f, r_w=r_w, k=k, h=h, mu=mu, T=T, Z=Z)
 
-    for r_f in r_fs:
-
-        for k in ks:
-            for m_dot in m_dots:
-                Q = m_dot / rho
-                delta_p = aquifer_dp(Q=Q, p_f=p_f, r_f=r_f, r_w=r_w, k=k, h=h, mu=mu, T=T, Z=Z)
-
-                s = pd.Series(index=attributes)
-                s['Q'] = Q
-                s['p_f'] = p_f
-                s['r_f'] = r_f
-                s['r_w'] = r_w
-                s['k'] = k
-                s['h'] = h
-                s['mu'] = mu
-                s['T'] = T
-                s['Z'] = Z
-
-                s['delta_p'] = delta_p
-                s['m_dot'] = m_dot
-                s['rho'] = rho
-
-                df = df.append(s, ignore_index=True)
+df = pd.DataFrame({'Q': Q, 'p_f': p_f, 'r_f': r_f, 'r_w': r_w, 'k': k, 'h': h, 'mu': mu, 'T': T, 'Z': Z,  # inputs
+                   'm_dot': m_dot, 'delta_p': delta_p, 'rho': rho})  # results
 
 # rename columns for plotting
 df['Mass flow [kg/s]'] = df['m_dot']
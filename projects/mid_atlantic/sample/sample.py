@@ -1,4 +1,4 @@
-from caes import ICAES2
+from caes import ICAES2, size_system
 import pandas as pd
 from joblib import Parallel, delayed, parallel_backend
 import time
@@ -9,8 +9,6 @@ import os
 # function to enable sizing for each entry in input file (XLSX_filename)
 # =====================
 def parameter_sweep(sweep_input, debug=True):
-    start = time.time()
-
     # convert inputs to model units
     kW_out = sweep_input['capacity_MW'] * 1e3
     kWh_out = sweep_input['capacity_MW'] * sweep_input['duration_hr'] * 1e3
@@ -24,72 +22,20 @@ def parameter_sweep(sweep_input, debug=True):
         print("Permeability (mD): " + str(sweep_input['permeability_mD']))
         print("Well radius (m)  : " + str(sweep_input['r_w']))
 
-    # allowable calculation error
-    error = 1e-6
-
-    # maximum number of iterations
-    count_max = 200
-
-    # initial guesses
-    m_dot = 10.0
-    r_f = 10.0
-
-    # initial results
-    kW_out_actual = 0.0
-    kWh_out_actual = 0.0
-
-    count = 0
-    while abs(kW_out_actual - kW_out) / kW_out + abs(kWh_out_actual - kWh_out) / kWh_out > error:
-        if debug:
-            print("\nIteration : " + str(count))
-            print("m_dot       : " + str(round(m_dot, 3)))
-            print("r_f         : " + str(round(r_f, 3)))
-
-        # create system
-        inputs = ICAES2.get_default_inputs()
-        # user inputs
-        inputs['depth'] = sweep_input['depth_m']  # porosity depth [m]
-        inputs['h'] = sweep_input['thickness_m']  # porosity thickness [m]
-        inputs['phi'] = sweep_input['porosity']  # formation porosity [-]
-        inputs['k'] = sweep_input['permeability_mD']  # formation permeability [mD]
-        inputs['r_w'] = sweep_input['r_w']  # well radius [m]
-
-        # machinery polytropic index
-        inputs['n_cmp1'] = sweep_input['n_cmp1']
-        inputs['n_exp1'] = sweep_input['n_exp1']
-
-        # current guess/iteration
-        inputs['m_dot'] = m_dot  # [kg/s]
-        inputs['r_f'] = r_f  # [m]
-        system = ICAES2(inputs=inputs)
-
-        # run single cycle and analyze
-        system.single_cycle()
-        results = system.analyze_performance()
-
-        # extract results of interest
-        kW_out_actual = results['kW_out_avg']
-        kWh_out_actual = results['kWh_out']
-
-        # update guesses
-        tau = 0.5  # solver time constant
-        m_dot = m_dot * (1.0 + tau * (kW_out - kW_out_actual) / kW_out)  # m_dot linearly linked to kW
-        r_f = r_f * (1.0 + tau ** 2 * (kWh_out - kWh_out_actual) / kWh_out_actual)  # r_f exponentially linked to kWh
-
-        count = count + 1
-        if count > count_max:  # sizing unsuccessful
-            results['errors'] = True
-            break
-
-        if debug:
-            print("MW_out_avg   : " + str(round(kW_out_actual / 1e3, 3)))
-            print("MWh_out      : " + str(round(kWh_out_actual / 1e3, 3)))
-
-    end = time.time()
-    results['solve_time'] = end - start
-    results['iterations'] = count
-    results['m_dot'] = m_dot
-    results['r_f'] = r_f
+    # site inputs
+    site_inputs = {}
+    site_inputs['depth'] = sweep_input['depth_m']  # porosity depth [m]
+    site_inputs['h'] = sweep_input['thickness_m']  # porosity thickness [m]
+    site_inputs['phi'] = sweep_input['porosity']  # formation porosity [-]
+    site_inputs['k'] = sweep_input['permeability_mD']  # formation permeability [mD]
+    site_inputs['r_w'] = sweep_input['r_w']  # well radius [m]
+    site_inputs['n_cmp1'] = sweep_input['n_cmp1']
+    site_inputs['n_exp1'] = sweep_input['n_exp1']
+
+    # size m_dot and r_f
+    results = size_system(target_MW=sweep_input['capacity_MW'],
+                          target_MWh=sweep_input['capacity_MW'] * sweep_input['duration_hr'],
+                          site_inputs=site_inputs, model=ICAES2, debug=debug)
 
     # print out RTE
     print(results['RTE'])
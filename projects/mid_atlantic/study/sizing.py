@@ -1,5 +1,6 @@
-from caes import ICAES2
+from caes import ICAES2, size_system, WarmStarts
 import pandas as pd
+import numpy as np
 from joblib import Parallel, delayed, parallel_backend
 import time
 import os
@@ -18,9 +19,7 @@ from datetime import datetime
 # =====================
 # function to enable sizing for each entry in input file (XLSX_filename)
 # =====================
-def parameter_sweep(sweep_input, debug=True):
-    start = time.time()
-
+def parameter_sweep(sweep_input, debug=True, warm_starts=None):
     # convert inputs to model units
     kW_out = sweep_input['capacity_MW'] * 1e3
     kWh_out = sweep_input['capacity_MW'] * sweep_input['duration_hr'] * 1e3
@@ -33,76 +32,20 @@ def parameter_sweep(sweep_input, debug=True):
         print("Porosity (-)     : " + str(sweep_input['porosity']))
         print("Permeability (mD): " + str(sweep_input['permeability_mD']))
 
-    # allowable calculation error
-    error = 1e-6
-
-    # maximum number of iterations
-    count_max = 200
-
-    # initial guesses
-    m_dot = 10.0
-    r_f = 10.0
-
-    # initial results
-    kW_out_actual = 0.0
-    kWh_out_actual = 0.0
-
-    count = 0
-    while abs(kW_out_actual - kW_out) / kW_out + abs(kWh_out_actual - kWh_out) / kWh_out > error:
-        if debug:
-            print("\nIteration : " + str(count))
-            print("m_dot       : " + str(round(m_dot, 3)))
-            print("r_f         : " + str(round(r_f, 3)))
-
-        # create system
-        inputs = ICAES2.get_default_inputs()
-        # user inputs
-        inputs['depth'] = sweep_input['depth_m']  # porosity depth [m]
-        inputs['h'] = sweep_input['thickness_m']  # porosity thickness [m]
-        inputs['phi'] = sweep_input['porosity']  # formation porosity [-]
-        inputs['k'] = sweep_input['permeability_mD']  # formation permeability [mD]
-
-        # machinery polytropic index
-        inputs['n_cmp1'] = sweep_input['n_cmp1']
-        inputs['n_exp1'] = sweep_input['n_exp1']
-
-        # current guess/iteration
-        inputs['m_dot'] = m_dot  # [kg/s]
-        inputs['r_f'] = r_f  # [m]
-        system = ICAES2(inputs=inputs)
-
-        # run single cycle and analyze
-        try:
-            system.single_cycle()
-            results = system.analyze_performance()
-        except:
-            results = pd.Series()
-            results['RTE'] = 0.0
-            break
-
-        # extract results of interest
-        kW_out_actual = results['kW_out_avg']
-        kWh_out_actual = results['kWh_out']
-
-        # update guesses
-        tau = 0.5  # solver time constant
-        m_dot = m_dot * (1.0 + tau * (kW_out - kW_out_actual) / kW_out)  # m_dot linearly linked to kW
-        r_f = r_f * (1.0 + tau ** 2 * (kWh_out - kWh_out_actual) / kWh_out_actual)  # r_f exponentially linked to kWh
-
-        count = count + 1
-        if count > count_max:  # sizing unsuccessful
-            results['errors'] = True
-            break
-
-        if debug:
-            print("MW_out_avg   : " + str(round(kW_out_actual / 1e3, 3)))
-            print("MWh_out      : " + str(round(kWh_out_actual / 1e3, 3)))
-
-    end = time.time()
-    results['solve_time'] = end - start
-    results['iterations'] = count
-    results['m_dot'] = m_dot
-    results['r_f'] = r_f
+    # site inputs
+    site_inputs = {}
+    site_inputs['depth'] = sweep_input['depth_m']  # porosity depth [m]
+    site_inputs['h'] = sweep_input['thickness_m']  # porosity thickness [m]
+    site_inputs['phi'] = sweep_input['porosity']  # formation porosity [-]
+    site_inputs['k'] = sweep_input['permeability_mD']  # formation permeability [mD]
+    site_inputs['n_cmp1'] = sweep_input['n_cmp1']
+    site_inputs['n_exp1'] = sweep_input['n_exp1']
+
+    # size m_dot and r_f
+    results = size_system(target_MW=sweep_input['capacity_MW'],
+                          target_MWh=sweep_input['capacity_MW'] * sweep_input['duration_hr'],
+                          site_inputs=site_inputs, model=ICAES2, warm_starts=warm_starts,
+                          debug=debug)
 
     # print out RTE
     print(results['RTE'])
@@ -112,6 +55,16 @@ def parameter_sweep(sweep_input, debug=True):
     return single_output
 
 
+# =====================
+# function to size a group of entries in sequence, each entry is warm started from the nearest entry already sized
+# =====================
+def group_sweep(sweep_inputs, warm_starts, debug=True):
+    output = []
+    for index in sweep_inputs.index:
+        output.append(parameter_sweep(sweep_inputs.loc[index], debug=debug, warm_starts=warm_starts))
+    return output
+
+
 # =====================
 # main program
 # =====================
@@ -163,13 +116,19 @@ if __name__ == '__main__':
     except:
         ncpus = ncpus  # otherwise default to this number of cores
 
-    # run each case using parallelization
+    # warm start from previous results, if available
+    if os.path.exists('study_results.csv'):
+        warm_starts = WarmStarts.from_csv('study_results.csv')
+    else:
+        warm_starts = WarmStarts()
+
+    # run each group of neighbouring cases using parallelization
+    groups = np.array_split(np.arange(n_cases), ncpus)
     with parallel_backend('multiprocessing', n_jobs=ncpus):
         output = Parallel(n_jobs=ncpus, verbose=5)(
-            delayed(parameter_sweep)(sweep_inputs.loc[index], debug=debug)
-            for index in
-            range(n_cases))
-    df = pd.DataFrame(output)
+            delayed(group_sweep)(sweep_inputs.loc[group], warm_starts, debug=debug)
+            for group in groups)
+    df = pd.DataFrame([single_output for group_output in output for single_output in group_output])
 
     # save results
     df.to_csv('study_results.csv')
@@ -1,10 +1,9 @@
-from caes import ICAES2, monteCarloInputs
+from caes import ICAES2, Sampler, Runner, default_inputs
+from caes.batch import performance_entries
 import pandas as pd
 import numpy as np
-from joblib import Parallel, delayed, parallel_backend
 import time
 import os
-from math import log
 from datetime import datetime
 
 
@@ -16,8 +15,8 @@ def parameter_sweep(sweep_input, debug=True):
 
     if sweep_input['m_dot'] > 0.0 and sweep_input['r_f'] > 0.0:
 
-        # create system
-        inputs = ICAES2.get_default_inputs()
+        # create system (default inputs are built once per worker process)
+        inputs = default_inputs(ICAES2).copy()
 
         # uncertainty parameters - general
         inputs['T_grad_m'] = sweep_input['T_grad_m']  # [C/km]
@@ -62,6 +61,14 @@ def parameter_sweep(sweep_input, debug=True):
     return single_output
 
 
+# =====================
+# function to run a chunk of entries (see caes.Runner)
+# =====================
+def sweep_chunk(sweep_inputs):
+    output = [parameter_sweep(sweep_inputs.loc[index], debug=False) for index in sweep_inputs.index]
+    return pd.DataFrame(output, index=sweep_inputs.index)
+
+
 # =====================
 # main program
 # =====================
@@ -76,7 +83,8 @@ if __name__ == '__main__':
     formations = ['MK1-3', 'LK1', 'UJ1']  # column name: "sheet_name"
     iterations = 100  # number of runs per location
     ncpus = 3  # default number of cpus to use
-    polytropic_index = 1.1
+    chunk = 100  # runs stored at once, a restarted job skips the stored runs
+    seed = 42  # random seed, the inputs do not depend on ncpus
 
     # ==============
     # begin program
@@ -93,8 +101,10 @@ if __name__ == '__main__':
     # replace nan with 0.0
     df = df.fillna(0.0)
 
-    # DataFrame to hold results
-    all_outputs = pd.DataFrame()
+    # results of each formation, runs are stored as they finish
+    all_outputs = []
+    runner = Runner(sweep_chunk, store='sqlite', filename='uncertainty_results.sqlite', chunk=chunk, n_jobs=ncpus,
+                    outputs=performance_entries + ['solve_time'])
 
     # ------------------
     # iterate through formations and save intermediate results
@@ -105,117 +115,52 @@ if __name__ == '__main__':
                  (df.loc[:, 'duration_hr'] == duration_hr) &
                  (df.loc[:, 'capacity_MW'] == capacity_MW)]
 
-        # create Monte Carlo simulation for each row in df2
-        mc_inputs = pd.DataFrame()
-        for ind in df2.index:
-            # access data for this row
-            row = df2.loc[ind, :]
-
-            # create dataframe to hold distributions for each row
-            df_row = pd.DataFrame(index=range(iterations))
-
-            # ------------------------
-            # apply distributions
-            # ------------------------
-
-            # temperature gradient (deg C /km) - Triangle
-            left = 16.0 / 1000.0  # convert to deg C / ,
-            mode = 23.0 / 1000.0
-            right = 24.0 / 1000.0
-            df_row.loc[:, 'T_grad_m'] = np.random.triangular(left, mode, right, size=iterations)
-
-            # aquifer pressure gradient (MPa / km) - Triangle
-            left = 9.42
-            mode = 10.0
-            right = 11.1
-            df_row.loc[:, 'p_hydro_grad'] = np.random.triangular(left, mode, right, size=iterations)
-
-            # fracture pressure gradient (MPa / km) - Uniform
-            low = 13.6
-            high = 15.8
-            df_row.loc[:, 'p_frac_grad'] = np.random.uniform(low=low, high=high, size=iterations)
-
-            # air leakage - Triangle
-            left = 0.0 / 100.0  # convert from % to fraction
-            mode = 3.5 / 100.0
-            right = 20.0 / 100.0
-            df_row.loc[:, 'loss_m_air'] = np.random.triangular(left, mode, right, size=iterations)
-
-            # depth
-            variation = 0.1
-            low = (1.0 - variation) * row['depth_m']
-            high = (1.0 + variation) * row['depth_m']
-            df_row.loc[:, 'depth_m'] = np.random.uniform(low=low, high=high, size=iterations)
-
-            # thickness
-            variation = 0.2
-            low = (1.0 - variation) * row['thickness_m']
-            high = (1.0 + variation) * row['thickness_m']
-            df_row.loc[:, 'thickness_m'] = np.random.uniform(low=low, high=high, size=iterations)
-
-            # porosity
-            mean = row['porosity']
-            sigma = 0.05 / 100.0  # convert from % to fraction
-            df_row.loc[:, 'porosity'] = np.random.normal(loc=mean, scale=sigma, size=iterations)
-
-            # permeability
-            mean = log(row['permeability_mD'])
-            sigma = 2.448
-            df_row.loc[:, 'permeability_mD'] = np.random.lognormal(mean=mean, sigma=sigma, size=iterations)
-
-            # ------------------------
-            # keep these parameters constant
-            # ------------------------
-            df_row.loc[:, 'm_dot'] = row['m_dot']
-            df_row.loc[:, 'r_f'] = row['r_f']
-            df_row.loc[:, 'X (m)'] = row['X (m)']
-            df_row.loc[:, 'Y (m)'] = row['Y (m)']
-            df_row.loc[:, 'sheet_name'] = row['sheet_name']
-            df_row.loc[:, 'duration_hr'] = row['duration_hr']
-            df_row.loc[:, 'capacity_MW'] = row['capacity_MW']
-
-            # ------------------------
-            # machinery polytropic index
-            # ------------------------
-            # air leakage - Triangle
-            left = 1.04
-            mode = 1.1
-            right = 1.21
-            polytropic_index = np.random.triangular(left, mode, right, size=iterations)
-
-            df_row.loc[:, 'n_cmp1'] = polytropic_index
-            df_row.loc[:, 'n_exp1'] = polytropic_index
-
-            # ------------------------
-            # store distributions
-            # ------------------------
-            mc_inputs = mc_inputs.append(df_row)
-
-        # reset index (appending messes up indices)
-        mc_inputs = mc_inputs.reset_index()
-
-        # count number of cases
-        n_cases = mc_inputs.shape[0]
+        # ------------------------
+        # distributions, site specific entries are set from each row of df2
+        # ------------------------
+        # temperature gradient (deg C / m) - Triangle, aquifer pressure gradient (MPa / km) - Triangle,
+        # fracture pressure gradient (MPa / km) - Uniform, air leakage (fraction) - Triangle,
+        # depth - Uniform (+/- 10%), thickness - Uniform (+/- 20%), porosity - Normal, permeability - LogNormal,
+        # machinery polytropic index - Triangle
+        distributions = pd.DataFrame(
+            [['triangle', 23.0 / 1000.0, 16.0 / 1000.0, 24.0 / 1000.0, np.nan],
+             ['triangle', 10.0, 9.42, 11.1, np.nan],
+             ['uniform', np.nan, 13.6, 15.8, np.nan],
+             ['triangle', 3.5 / 100.0, 0.0 / 100.0, 20.0 / 100.0, np.nan],
+             ['uniform', np.nan, np.nan, np.nan, np.nan],
+             ['uniform', np.nan, np.nan, np.nan, np.nan],
+             ['normal', np.nan, np.nan, np.nan, 0.05 / 100.0],
+             ['lognormal', np.nan, np.nan, np.nan, 2.448],
+             ['triangle', 1.1, 1.04, 1.21, np.nan]],
+            index=['T_grad_m', 'p_hydro_grad', 'p_frac_grad', 'loss_m_air', 'depth_m', 'thickness_m', 'porosity',
+                   'permeability_mD', 'n_cmp1'],
+            columns=['Distribution', 'Average', 'Low', 'High', 'Stdev'])
+        site_values = {'depth_m': {'Low': 0.9 * df2['depth_m'], 'High': 1.1 * df2['depth_m']},
+                       'thickness_m': {'Low': 0.8 * df2['thickness_m'], 'High': 1.2 * df2['thickness_m']},
+                       'porosity': {'Average': df2['porosity']},
+                       'permeability_mD': {'Average': np.log(df2['permeability_mD'])}}
+
+        # create Monte Carlo simulation for each row in df2, all rows at once (seeded by formation)
+        sampler = Sampler(distributions, seed=[seed, count])
+        mc_inputs = sampler.sample(iterations, sites=df2[['m_dot', 'r_f', 'X (m)', 'Y (m)', 'sheet_name',
+                                                          'duration_hr', 'capacity_MW']], site_values=site_values)
+        mc_inputs['n_exp1'] = mc_inputs['n_cmp1']  # same polytropic index for compression and expansion
 
         # save model inputs
         savename = 'uncertainty_inputs' + str(count) + '.csv'
         mc_inputs.to_csv(savename)
 
         # run using parallelization
-        with parallel_backend('multiprocessing', n_jobs=ncpus):
-            output = Parallel(n_jobs=ncpus, verbose=5)(
-                delayed(parameter_sweep)(mc_inputs.loc[index], debug=False)
-                for index in range(n_cases))
-        mc_outputs = pd.DataFrame(output)
+        mc_outputs = runner.run(mc_inputs)
 
         # save intermediate results
         savename = 'uncertainty_results' + str(count) + '.csv'
         mc_outputs.to_csv(savename)
         # group all outputs
-        all_outputs = all_outputs.append(mc_outputs)
+        all_outputs.append(mc_outputs)
 
     # save all results
-    all_outputs.to_csv('uncertainty_results_all.csv')
+    pd.concat(all_outputs, ignore_index=True).to_csv('uncertainty_results_all.csv')
 
     # save total study time
     end = time.time()
@@ -9,4 +9,5 @@ setup(name='caes',
       license='MIT',
       packages=['caes'],
       zip_safe=False,
-      install_requires=['CoolProp', 'pandas', 'numpy', 'seaborn', 'matplotlib', 'scipy', 'joblib'])
+      install_requires=['CoolProp', 'pandas', 'numpy', 'seaborn', 'matplotlib', 'scipy', 'joblib'],
+      extras_require={'parquet': ['pyarrow'], 'hdf5': ['tables']})